@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+"""Benchmark the transfers of Kay against local stand-ins.
+
+Each configuration runs in its own process, so the peak memory
+reported belongs to that configuration only. Items are stored in
+fakeredis, in the same process as the transfer, unless a Redis URL
+is given. Bulk requests are sent to a mock ES server running in a
+separate process, unless an ES URL is given.
+
+    python benchmarks/bench_transfer.py --items 20000 --item-sizes 512 4096
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import pickle
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis
+
+from arthur.common import Q_STORAGE_ITEMS
+
+import items
+import mock_es
+
+BACKENDS = ['redis2none', 'redis2es']
+ITEM_SIZES = [512, 4096]
+N_ITEMS = 20000
+FILL_CHUNK = 1000
+RESULT_TIMEOUT = 3600
+
+
+def run_config(config, result_queue):
+    """Fill the queue and transfer its items with a backend.
+
+    :param config: dict with the parameters of the configuration
+    :param result_queue: queue where the results are put
+    """
+    if not config['redis_url']:
+        import fakeredis
+
+        server = fakeredis.FakeServer()
+        redis.StrictRedis.from_url = staticmethod(
+            lambda url, **kwargs: fakeredis.FakeStrictRedis(server=server))
+
+    conn = redis.StrictRedis.from_url(config['redis_url'] or 'redis://')
+    n_bytes = fill_queue(conn, config)
+
+    backend = create_backend(config)
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    rss_before = _peak_rss()
+
+    start = time.time()
+    backend.transfer(keep_alive=False, queue_size=config['queue_size'])
+    elapsed = time.time() - start
+
+    stats = backend.stats
+    result = dict(config,
+                  read=stats['read'],
+                  written=stats['written'],
+                  failed=stats['failed'],
+                  seconds=elapsed,
+                  items_sec=stats['read'] / elapsed,
+                  mb_sec=n_bytes / elapsed / (1024 * 1024),
+                  peak_rss_mb=_peak_rss() / (1024 * 1024),
+                  rss_growth_mb=(_peak_rss() - rss_before) / (1024 * 1024))
+
+    result_queue.put(result)
+
+
+def fill_queue(conn, config):
+    """Store the synthetic items in the Redis queue.
+
+    :returns: the size in bytes of the pickled items
+    """
+    conn.delete(Q_STORAGE_ITEMS)
+
+    generator = items.generate_items(config['items_type'], config['items'],
+                                     config['item_size'])
+    n_bytes = 0
+
+    while True:
+        chunk = [pickle.dumps(item) for item in itertools.islice(generator, FILL_CHUNK)]
+        if not chunk:
+            break
+
+        conn.rpush(Q_STORAGE_ITEMS, *chunk)
+        n_bytes += sum(len(item) for item in chunk)
+
+    return n_bytes
+
+
+def create_backend(config):
+    redis_url = config['redis_url'] or 'redis://'
+
+    if config['backend'] == 'redis2none':
+        from kay.backends.redis2none import Redis2None
+
+        return Redis2None(redis_url,
+                          redis_decode_workers=config['decode_workers'])
+
+    from kay.backends.redis2es import Redis2Es
+
+    return Redis2Es(redis_url, config['es_url'], config['items_type'],
+                    es_index='bench-%s' % config['items_type'],
+                    es_index_alias='bench',
+                    es_bulk_concurrency=config['bulk_concurrency'],
+                    redis_decode_workers=config['decode_workers'])
+
+
+def _peak_rss():
+    # ru_maxrss is given in kilobytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run(args):
+    """Run every configuration and print the results"""
+
+    context = multiprocessing.get_context('spawn')
+
+    es_server = None
+    es_url = args.es_url
+    if 'redis2es' in args.backends and not es_url:
+        ready = context.Queue()
+        es_server = context.Process(target=mock_es.serve,
+                                    kwargs={'delay': args.es_delay, 'ready': ready},
+                                    daemon=True)
+        es_server.start()
+        es_url = ready.get(timeout=RESULT_TIMEOUT)
+
+    results = []
+    try:
+        for backend, items_type, item_size in itertools.product(args.backends, args.types,
+                                                                args.item_sizes):
+            config = {
+                'backend': backend,
+                'items_type': items_type,
+                'item_size': item_size,
+                'items': args.items,
+                'redis_url': args.redis_url,
+                'es_url': es_url,
+                'queue_size': args.queue_size,
+                'decode_workers': args.decode_workers,
+                'bulk_concurrency': args.bulk_concurrency
+            }
+
+            for _ in range(args.repeat):
+                result_queue = context.Queue()
+                process = context.Process(target=run_config, args=(config, result_queue))
+                process.start()
+                result = result_queue.get(timeout=RESULT_TIMEOUT)
+                process.join()
+
+                results.append(result)
+                print_result(result)
+    finally:
+        if es_server:
+            es_server.terminate()
+
+    if args.json:
+        with open(args.json, 'w') as fd:
+            json.dump(results, fd, indent=2)
+
+    return results
+
+
+def print_result(result):
+    print("%-10s %-9s %6d B %8d items %8.2f s %10.1f items/s %7.1f MB/s %8.1f MB peak %8.1f MB growth"
+          % (result['backend'], result['items_type'], result['item_size'], result['read'],
+             result['seconds'], result['items_sec'], result['mb_sec'],
+             result['peak_rss_mb'], result['rss_growth_mb']))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Kay transfers")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS,
+                        help="Backends to benchmark")
+    parser.add_argument('--types', nargs='+', choices=items.ITEM_TYPES, default=items.ITEM_TYPES,
+                        help="Types of the synthetic items")
+    parser.add_argument('--item-sizes', dest='item_sizes', nargs='+', type=int, default=ITEM_SIZES,
+                        help="Approximate sizes in bytes of the items")
+    parser.add_argument('--items', type=int, default=N_ITEMS,
+                        help="Number of items of each configuration")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="Number of runs of each configuration")
+    parser.add_argument('--redis-url', dest='redis_url',
+                        help="Redis server to use instead of fakeredis; its items queue is emptied")
+    parser.add_argument('--es-url', dest='es_url',
+                        help="ElasticSearch server to use instead of the mock one")
+    parser.add_argument('--es-delay', dest='es_delay', type=float, default=0,
+                        help="Seconds the mock ES server waits before answering a bulk")
+    parser.add_argument('--queue-size', dest='queue_size', type=int, default=10000,
+                        help="Max number of items waiting to be written")
+    parser.add_argument('--decode-workers', dest='decode_workers', type=int, default=0,
+                        help="Number of threads unpickling the items")
+    parser.add_argument('--bulk-concurrency', dest='bulk_concurrency', type=int, default=4,
+                        help="Max number of bulk requests in flight")
+    parser.add_argument('--json', help="File to store the results in JSON format")
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    run(parse_args())
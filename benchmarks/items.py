@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import hashlib
+import random
+import string
+import time
+
+PERCEVAL_TYPE = 'perceval'
+GRAAL_TYPE = 'graal'
+GALAHAD_TYPE = 'galahad'
+
+ITEM_TYPES = [PERCEVAL_TYPE, GRAAL_TYPE, GALAHAD_TYPE]
+
+BACKEND_VERSION = '0.1.0'
+TOOL_VERSION = '0.12.0'
+
+_TEXT = ''.join(random.Random(0).choices(string.ascii_letters + ' ', k=4096))
+
+
+def generate_items(items_type, n_items, item_size, seed=0):
+    """Generate synthetic items like the ones Arthur stores in Redis.
+
+    Items follow the layout of Perceval, Graal and Galahad items.
+    Their `data` field is filled with text until the item has about
+    `item_size` bytes.
+
+    :param items_type: type of the items (perceval, graal or galahad)
+    :param n_items: number of items to generate
+    :param item_size: approximate size in bytes of each item
+    :param seed: seed of the random generator
+    """
+    rnd = random.Random(seed)
+    make_data = DATA_GENERATORS[items_type]
+
+    now = time.time()
+
+    for i in range(n_items):
+        uuid = hashlib.sha1(('%s-%s-%s' % (items_type, seed, i)).encode('utf-8')).hexdigest()
+        updated_on = now - rnd.randint(0, 365 * 24 * 3600)
+
+        item = {
+            'backend_name': 'Git',
+            'backend_version': BACKEND_VERSION,
+            items_type + '_version': TOOL_VERSION,
+            'timestamp': now,
+            'origin': 'https://github.com/chaoss/grimoirelab-%s' % rnd.choice(['perceval', 'kay', 'graal']),
+            'uuid': uuid,
+            'updated_on': updated_on,
+            'category': 'commit',
+            'tag': 'https://github.com/chaoss/grimoirelab',
+            'data': make_data(rnd, item_size)
+        }
+
+        if items_type == GALAHAD_TYPE:
+            item['perceval_uuid'] = uuid
+
+        yield item
+
+
+def _text(rnd, size):
+    size = max(size, 1)
+    text = _TEXT * (size // len(_TEXT) + 1)
+    start = rnd.randrange(len(_TEXT))
+
+    return (text + text)[start:start + size]
+
+
+def _perceval_data(rnd, size):
+    message_size = max(size - 400, 16)
+
+    return {
+        'commit': _text(rnd, 40),
+        'Author': 'John Smith <jsmith@example.com>',
+        'AuthorDate': 'Tue Aug 14 14:30:13 2012 -0300',
+        'Commit': 'John Smith <jsmith@example.com>',
+        'CommitDate': 'Tue Aug 14 14:30:13 2012 -0300',
+        'message': _text(rnd, message_size),
+        'files': [{'file': 'kay/backend.py', 'added': '10', 'removed': '2',
+                   'action': 'M', 'modes': ['100644', '100644']}],
+        'parents': [_text(rnd, 40)],
+        'refs': []
+    }
+
+
+def _graal_data(rnd, size):
+    n_funcs = max((size - 400) // 60, 1)
+
+    return {
+        'commit': _text(rnd, 40),
+        'analyzer': 'lizard_file',
+        'analysis': [{
+            'file_path': 'kay/backends/connectors/elasticsearch.py',
+            'ccn': rnd.randint(1, 100),
+            'avg_ccn': rnd.random() * 10,
+            'loc': rnd.randint(10, 1000),
+            'num_funs': n_funcs,
+            'funs': [{'name': _text(rnd, 20), 'ccn': rnd.randint(1, 10),
+                      'start': rnd.randint(1, 500), 'end': rnd.randint(500, 1000)}
+                     for _ in range(n_funcs)]
+        }]
+    }
+
+
+def _galahad_data(rnd, size):
+    n_deps = max((size - 400) // 28, 1)
+
+    return {
+        'commit': _text(rnd, 40),
+        'dependencies': ['%s==%s.%s' % (_text(rnd, 16), rnd.randint(0, 9), rnd.randint(0, 9))
+                         for _ in range(n_deps)]
+    }
+
+
+DATA_GENERATORS = {
+    PERCEVAL_TYPE: _perceval_data,
+    GRAAL_TYPE: _graal_data,
+    GALAHAD_TYPE: _galahad_data
+}
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import argparse
+import gzip
+import json
+import threading
+import time
+import uuid
+
+from http.server import (BaseHTTPRequestHandler,
+                         ThreadingHTTPServer)
+
+BULK_ITEM_RESPONSE = b'{"index":{"status":201}}'
+
+
+class MockES(ThreadingHTTPServer):
+    """Minimal stand-in of the ElasticSearch HTTP API.
+
+    It answers the requests sent by `ESConnector`: index and alias
+    creation, refreshes and bulk requests. Bulk items are counted
+    and discarded, so the server keeps a constant memory footprint.
+
+    Tests may record the items (`record`) and inject failures: every
+    bulk request is answered with `status` when it is set, bulks
+    larger than `max_bytes` are rejected as too large, and the items
+    whose id is in `item_status` are rejected with the next status
+    of their list.
+
+    :param port: port to listen on; 0 to pick a free one
+    :param delay: seconds to wait before answering a bulk request
+    :param record: keep the items written and the requests received
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, delay=0, record=False):
+        super().__init__(('127.0.0.1', port), _MockESHandler)
+        self.delay = delay
+        self.record = record
+        self.indices = set()
+        self.n_items = 0
+        self.n_bulks = 0
+        self.status = None
+        self.max_bytes = 0
+        self.item_status = {}
+        self.docs = {}
+        self.requests = []
+        self.settings = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://%s:%s' % self.server_address
+
+
+class _MockESHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        index = self.__path()
+        self.__send(200 if index in self.server.indices else 404)
+
+    def do_GET(self):
+        path = self.__path()
+        self.__log('GET', path)
+
+        if path.endswith('_count'):
+            index = path.split('/')[0]
+            n_docs = sum(1 for doc_index, _ in self.server.docs if doc_index == index)
+            self.__send(200, {'count': n_docs})
+        elif path.endswith('_settings'):
+            index = path.split('/')[0]
+            settings = self.server.settings.get(index, {})
+            self.__send(200, {index: {'settings': {'index': settings}}})
+        else:
+            self.__send(200, {'n_items': self.server.n_items, 'n_bulks': self.server.n_bulks})
+
+    def do_PUT(self):
+        body = self.__read_body()
+        path = self.__path()
+        self.__log('PUT', path)
+
+        if path.endswith('_settings'):
+            index = path.split('/')[0]
+            self.server.settings.setdefault(index, {}).update(json.loads(body)['index'])
+        else:
+            self.server.indices.add(path)
+            self.server.settings[path] = {'uuid': uuid.uuid4().hex}
+
+        self.__send(200, {'acknowledged': True})
+
+    def do_POST(self):
+        body = self.__read_body()
+        path = self.__path()
+        self.__log('POST', path)
+
+        if not path.endswith('_bulk'):
+            self.__send(200, {'acknowledged': True, '_shards': {}})
+            return
+
+        if self.server.status:
+            self.__send(self.server.status, {'error': 'injected', 'status': self.server.status})
+            return
+
+        if self.server.max_bytes and len(body) > self.server.max_bytes:
+            self.__send(413, {'error': 'request too large', 'status': 413})
+            return
+
+        # Every item is made of an action line and a source line
+        n_items = body.count(b'\n', 0, len(body) - 1) // 2 + 1
+
+        with self.server.lock:
+            self.server.n_items += n_items
+            self.server.n_bulks += 1
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        if self.server.record or self.server.item_status:
+            data = self.__index(body)
+        else:
+            data = (b'{"took":1,"errors":false,"items":['
+                    + b','.join([BULK_ITEM_RESPONSE] * n_items) + b']}')
+
+        self.__send(200, data=data)
+
+    def __index(self, body):
+        """Store the items of a bulk, failing the ones set to fail"""
+
+        lines = body.splitlines()
+        results = []
+
+        for action, source in zip(lines[::2], lines[1::2]):
+            meta = json.loads(action)['index']
+
+            with self.server.lock:
+                statuses = self.server.item_status.get(meta['_id'])
+                status = statuses.pop(0) if statuses else 201
+
+                if status < 300 and self.server.record:
+                    self.server.docs[(meta['_index'], meta['_id'])] = json.loads(source)
+
+            result = {'_index': meta['_index'], '_id': meta['_id'], 'status': status}
+            if status >= 300:
+                result['error'] = {'type': 'injected', 'reason': 'injected'}
+            results.append({'index': result})
+
+        response = {'took': 1, 'errors': any(r['index']['status'] >= 300 for r in results),
+                    'items': results}
+
+        return json.dumps(response).encode('utf-8')
+
+    def __log(self, method, path):
+        if self.server.record:
+            with self.server.lock:
+                self.server.requests.append((method, path))
+
+    def log_message(self, format, *args):
+        pass
+
+    def __path(self):
+        return self.path.split('?')[0].strip('/')
+
+    def __read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+
+        return body
+
+    def __send(self, status, obj=None, data=None):
+        if data is None:
+            data = json.dumps(obj).encode('utf-8') if obj is not None else b''
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+
+def serve(port=0, delay=0, ready=None):
+    """Run a mock ES server until the process is terminated.
+
+    :param port: port to listen on
+    :param delay: seconds to wait before answering a bulk request
+    :param ready: queue where the URL of the server is put once
+        it is listening
+    """
+    server = MockES(port=port, delay=delay)
+
+    if ready:
+        ready.put(server.url)
+
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock ElasticSearch bulk server")
+    parser.add_argument('--port', type=int, default=9200,
+                        help="Port to listen on")
+    parser.add_argument('--delay', type=float, default=0,
+                        help="Seconds to wait before answering a bulk request")
+    args = parser.parse_args()
+
+    print("Mock ES listening on port %s" % args.port)
+    serve(args.port, args.delay)
+
+
+if __name__ == '__main__':
+    main()
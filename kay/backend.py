@@ -24,9 +24,16 @@ import asyncio
 import importlib
 import logging
 import pkgutil
-import time
+import signal
 
+from kay import metrics
 from kay.connector import Connector
+from kay.profiler import PROFILER
+from kay.spill import (SpillQueue,
+                       SPILL_MAX_BYTES)
+from kay.transforms import (TransformQueue,
+                            parse_transform)
+from kay.workers import WorkerPool
 
 from grimoirelab_toolkit.introspect import find_signature_parameters
 
@@ -35,52 +42,165 @@ logger = logging.getLogger(__name__)
 
 KEEP_ALIVE = True
 DELAY_TIME = 0
+EMPTY_READ_DELAY = 1
+QUEUE_SIZE = 10000
+WORKERS = 1
+METRICS_PORT = None
+SPILL_PATH = None
 
 
 class Backend:
     """Backend class to transfer data from a source to a target storage.
 
+    Data is read from the source and written to the target concurrently.
+    Both connectors are linked by a bounded queue, so the source is
+    paused when the target is not able to keep its pace. Optionally,
+    the items exceeding the queue are spilled to disk, so the source
+    keeps being drained while the target is slow or down.
+
+    Transforms (see `kay.transforms`) may be applied to the items
+    read, in batches, before they reach the target.
+
+    Backends whose storages cannot be shared by several worker
+    processes (e.g., files) must set `parallel` to `False`.
+
     :param source_conn: a Connector object to interact with the source storage
     :param target_conn: a Connector object to interact with the target storage
     """
 
     version = '0.1.0'
+    parallel = True
 
     def __init__(self, source_conn, target_conn):
         self.source_conn = source_conn
         self.target_conn = target_conn
+        self.__aborted = False
 
-    def transfer(self, keep_alive=KEEP_ALIVE, delay=DELAY_TIME):
+    @property
+    def stats(self):
+        """Counters of the items processed by the source and target connectors"""
+
+        return self.source_conn.stats + self.target_conn.stats
+
+    def transfer(self, keep_alive=KEEP_ALIVE, delay=DELAY_TIME, queue_size=QUEUE_SIZE,
+                 metrics_port=METRICS_PORT, spill_path=SPILL_PATH,
+                 spill_max_bytes=SPILL_MAX_BYTES, transforms=None):
         """Transfer the data from the source to the target storages.
 
         :param keep_alive: a flag to keeps listening to the source storage
         :param delay: the number of seconds to sleep between queue listenings
+        :param queue_size: max number of items waiting to be written
+        :param metrics_port: port where the metrics of the transfer are
+            served in Prometheus text format; when not set, metrics are
+            not served
+        :param spill_path: directory where the items exceeding the
+            queue are spilled; when not set, items are not spilled
+        :param spill_max_bytes: max size of the items spilled to disk
+        :param transforms: list of transforms applied to the items
+            read, in order
         """
-
-        data_queue = asyncio.Queue()
         loop = asyncio.get_event_loop()
 
-        while True:
-            try:
-                loop.create_task(self.source_conn.read(data_queue))
-                loop.run_until_complete(self.target_conn.write(data_queue))
+        if spill_path:
+            data_queue = SpillQueue(queue_size, spill_path, max_bytes=spill_max_bytes)
+        else:
+            data_queue = asyncio.Queue(maxsize=queue_size)
+
+        # Items keep being spilled while the target is down
+        self.target_conn.wait_outages = bool(spill_path)
+        self.source_conn.follow = keep_alive
+
+        metrics.QUEUE_DEPTH.set_function(data_queue.qsize)
+
+        metrics_server = None
+        if metrics_port is not None:
+            metrics_server = metrics.MetricsServer(metrics_port)
+            metrics_server.start()
+
+        source_queue = TransformQueue(data_queue, transforms) if transforms else data_queue
+
+        reader = loop.create_task(self.__read(source_queue, keep_alive, delay))
+        writer = loop.create_task(self.__write(data_queue, reader))
+
+        # On Ctrl-C, stop reading and write the data already read
+        loop.add_signal_handler(signal.SIGINT, self.__stop, reader, writer)
+
+        try:
+            loop.run_until_complete(self.__run(reader, writer))
+        finally:
+            loop.remove_signal_handler(signal.SIGINT)
+
+            if metrics_server:
+                metrics_server.stop()
+
+            if spill_path:
+                # Items not written are redelivered by reliable sources
+                data_queue.close()
+
+            self.source_conn.close()
+            self.target_conn.close()
+
+        if data_queue.qsize() != 0:
+            logger.warning("%s items have been lost before closing the transfer", data_queue.qsize())
+
+        loop.close()
+
+    @staticmethod
+    def __stop(reader, writer):
+        """Stop the reader or, when it is already stopped, the writer"""
+
+        if not reader.done():
+            logger.info("Stopping the transfer, writing the data already read")
+            reader.cancel()
+        else:
+            logger.warning("Stopping the transfer without writing the data already read")
+            writer.cancel()
+
+    async def __read(self, data_queue, keep_alive, delay):
+        """Read from the source storage until the transfer ends.
+
+        Without `delay`, the source is read again as soon as a reading
+        ends, unless nothing was read; in that case, the reader rests
+        `EMPTY_READ_DELAY` seconds, so empty sources are not polled in
+        a busy loop.
+        """
+        try:
+            while True:
+                n_read = self.source_conn.stats['read']
+                await self.source_conn.read(data_queue)
 
                 if not keep_alive:
                     break
 
                 if delay:
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
+                elif self.source_conn.stats['read'] == n_read:
+                    await asyncio.sleep(EMPTY_READ_DELAY)
+        except asyncio.CancelledError:
+            if self.__aborted:
+                raise
 
-            except KeyboardInterrupt:
-                if data_queue.qsize() != 0:
-                    data_queue.put(Connector.READ_DONE)
-                    loop.run_until_complete(self.target_conn.write(data_queue))
-                break
+            # Let the writer know that no more data will be read
+            await data_queue.put(Connector.READ_DONE)
 
-        if data_queue.qsize() != 0:
-            logger.warning("%s items have been lost before closing the transfer", data_queue.qsize)
+    async def __write(self, data_queue, reader):
+        """Write to the target storage the data of every reading"""
 
-        loop.close()
+        while not (reader.done() and data_queue.empty()):
+            await self.target_conn.write(data_queue)
+
+    async def __run(self, reader, writer):
+        """Run reader and writer, stopping both when any of them fails"""
+
+        try:
+            await asyncio.gather(reader, writer)
+        except Exception:
+            self.__aborted = True
+
+            for task in (reader, writer):
+                task.cancel()
+            await asyncio.wait({reader, writer})
+            raise
 
 
 class BackendCommandArgumentParser:
@@ -96,6 +216,29 @@ class BackendCommandArgumentParser:
         group.add_argument('--delay', dest='delay',
                            type=int, default=DELAY_TIME,
                            help="Rest time between queue listenings")
+        group.add_argument('--queue-size', dest='queue_size',
+                           type=int, default=QUEUE_SIZE,
+                           help="Max number of items waiting to be written")
+        group.add_argument('--workers', dest='workers',
+                           type=int, default=WORKERS,
+                           help="Number of worker processes sharing the transfer")
+        group.add_argument('--metrics-port', dest='metrics_port',
+                           type=int, default=METRICS_PORT,
+                           help="Port to serve the metrics in Prometheus format; "
+                                "each worker uses the port plus its id")
+        group.add_argument('--spill-path', dest='spill_path',
+                           default=SPILL_PATH,
+                           help="Directory to spill the items exceeding the queue size")
+        group.add_argument('--spill-max-bytes', dest='spill_max_bytes',
+                           type=int, default=SPILL_MAX_BYTES,
+                           help="Max bytes of the items spilled to disk")
+        group.add_argument('--transform', dest='transforms',
+                           action='append', type=parse_transform,
+                           help="Transform applied to the items read, given as name:arg; "
+                                "prune:<fields>, project:<fields>, truncate:<length>, "
+                                "category:<patterns>, origin:<patterns>, "
+                                "exclude-category:<patterns> or exclude-origin:<patterns>. "
+                                "It can be repeated, transforms are applied in order")
 
     def parse(self, *args):
         """Parse a list of arguments.
@@ -113,6 +256,9 @@ class BackendCommandArgumentParser:
         if not parsed_args.keep_alive and (parsed_args.delay > 0):
             raise AttributeError("no keep-alive and delay > 0 parameters are incompatible")
 
+        if parsed_args.workers < 1:
+            raise AttributeError("workers must be greater than 0")
+
         return parsed_args
 
 
@@ -137,14 +283,24 @@ class BackendCommand:
         parser = self.setup_cmd_parser()
         self.parsed_args = parser.parse(*args)
 
+        if self.parsed_args.workers > 1 and not self.BACKEND.parallel:
+            raise AttributeError("workers > 1 not supported by backend %s" % self.BACKEND.__name__)
+
     def run(self):
         """Execute backend.
 
         This method runs the backend to transfer items from a source
-        data storage to a target one.
+        data storage to a target one. When more than one worker is
+        set, the transfer runs on a pool of worker processes.
         """
         backend_args = vars(self.parsed_args)
-        transfer(self.BACKEND, backend_args)
+        workers = backend_args.pop('workers', WORKERS)
+
+        if workers > 1:
+            pool = WorkerPool(self.BACKEND, backend_args, workers)
+            pool.run()
+        else:
+            transfer(self.BACKEND, backend_args)
 
     @staticmethod
     def setup_cmd_parser():
@@ -154,6 +310,9 @@ class BackendCommand:
 def transfer(backend_class, backend_args):
     """Transfer items from a data storage to another one.
 
+    When the profiler is enabled, a summary with the throughput and
+    the timings of each stage is logged at the end of the transfer.
+
     :param backend_class: backend class to transfer items
     :param backend_args: dict of arguments needed to init the backend
     """
@@ -164,7 +323,40 @@ def transfer(backend_class, backend_args):
 
     transfer_args = find_signature_parameters(backend.transfer,
                                               backend_args)
-    backend.transfer(**transfer_args)
+
+    if not PROFILER.enabled:
+        backend.transfer(**transfer_args)
+        return
+
+    PROFILER.start()
+    try:
+        backend.transfer(**transfer_args)
+    finally:
+        PROFILER.stop()
+        logger.info(PROFILER.summary(backend.stats))
+
+
+def find_backend(name, top_package):
+    """Find a backend and its command by name.
+
+    When `name` is in the registry of `top_package` (its `BACKENDS`
+    dict), only the module of that backend is imported. Otherwise,
+    every backend under `top_package` is looked up with `find_backends`.
+
+    :param name: name of the backend
+    :param top_package: package storing backends
+
+    :returns: a tuple with the `Backend` and the `BackendCommand`
+        classes of the backend; `None` values when it is not found
+    """
+    registry = getattr(top_package, 'BACKENDS', {})
+
+    if name in registry:
+        backends, commands = _import_backends([registry[name]])
+    else:
+        backends, commands = find_backends(top_package)
+
+    return backends.get(name), commands.get(name)
 
 
 def find_backends(top_package):
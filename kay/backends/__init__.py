@@ -24,3 +24,13 @@ __import__('pkg_resources').declare_namespace(__name__)
 from .._version import __version__
 
 __version__ = __version__
+
+# Modules of the backends shipped with Kay, so a backend can be
+# run by importing only its own module and connectors
+BACKENDS = {
+    'file2es': 'kay.backends.file2es',
+    'file2none': 'kay.backends.file2none',
+    'redis2es': 'kay.backends.redis2es',
+    'redis2file': 'kay.backends.redis2file',
+    'redis2none': 'kay.backends.redis2none'
+}
@@ -19,25 +19,83 @@
 # Authors:
 #     Valerio Cosentino <valcos@bitergia.com>
 
+import asyncio
+import collections
+import datetime
 import json
 import logging
+import socket
+import threading
+import time
 import urllib3
 urllib3.disable_warnings()
 
+from concurrent.futures import ThreadPoolExecutor
+
 from elasticsearch import Elasticsearch
-from elasticsearch import helpers
+from elasticsearch.exceptions import (ConnectionError,
+                                      RequestError,
+                                      TransportError)
+from urllib3.connection import HTTPConnection
 
-from grimoirelab_toolkit.datetime import (datetime_utcnow,
-                                          datetime_to_str)
-from kay.connector import (Connector,
+from kay import metrics
+from kay.profiler import (PROFILER,
+                          STAGE_BULK_BUILD,
+                          STAGE_ES_REQUEST,
+                          STAGE_REFRESH)
+from kay.connector import (Checkpoint,
+                           Connector,
                            ConnectorCommand)
+from kay.dedup import (DEDUP_CACHE_SIZE,
+                       DEDUP_PERSIST_SIZE,
+                       DEDUP_PERSIST_TTL)
 from kay.errors import ElasticError
 
-ES_BULK_SIZE = 100
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ES_BULK_SIZE = 1000
+ES_BULK_BYTES = 5 * 1024 * 1024
+ES_BULK_MIN_BYTES = 256 * 1024
+ES_BULK_MAX_BYTES = 50 * 1024 * 1024
+ES_BULK_LATENCY = 5
+ES_BULK_GROWTH = 1.25
+ES_BULK_SHRINK = 0.5
 ES_TIMEOUT = 3600
 ES_MAX_RETRIES = 50
 ES_RETRY_ON_TIMEOUT = True
 ES_VERIFY_CERTS = False
+ES_BULK_CONCURRENCY = 4
+ES_REFRESH_INTERVAL = 30
+ES_ITEM_MAX_RETRIES = 5
+ES_RETRY_BACKOFF = 1
+ES_RETRY_MAX_BACKOFF = 60
+ES_PARTITION_MAX_DOCS = 0
+ES_HTTP_COMPRESS = False
+ES_KEEPALIVE_IDLE = 0
+ES_KEEPALIVE_INTERVAL = 10
+ES_KEEPALIVE_COUNT = 6
+ES_VERSION_SCALE = 1000000
+ES_THROTTLE = False
+ES_MAX_DOCS_RATE = 0
+ES_MAX_BYTES_RATE = 0
+ES_THROTTLE_POOL_QUEUE = 0
+ES_THROTTLE_POOL_INTERVAL = 10
+ES_THROTTLE_WINDOW = 10
+ES_THROTTLE_DECREASE = 0.7
+ES_THROTTLE_INCREASE = 0.1
+ES_THROTTLE_MIN_RATE = 10
+ES_BACKFILL = False
+
+# Index settings speeding up bulk loads; the translog is not fsynced on
+# every request, so a node crash may lose the last seconds of the load
+BACKFILL_SETTINGS = {
+    'number_of_replicas': 0,
+    'refresh_interval': '-1',
+    'translog.durability': 'async'
+}
 
 logger = logging.getLogger(__name__)
 
@@ -184,6 +242,7 @@ GRAAL_MAPPING = """
 PERCEVAL_TYPE = 'perceval'
 GALAHAD_TYPE = 'galahad'
 GRAAL_TYPE = 'graal'
+AUTO_TYPE = 'auto'
 
 SUPPORTED_MAPPINGS = {
     PERCEVAL_TYPE: PERCEVAL_MAPPING,
@@ -194,49 +253,737 @@ SUPPORTED_MAPPINGS = {
 ALIAS_RAW = 'raw-items'
 ALIAS_ENRICH = 'enrich-items'
 
+REFRESH_NONE = 'none'
+REFRESH_END = 'end'
+REFRESH_INTERVAL = 'interval'
+REFRESH_WAIT_FOR = 'wait_for'
+
+REFRESH_POLICIES = [REFRESH_NONE, REFRESH_END, REFRESH_INTERVAL, REFRESH_WAIT_FOR]
+
+PARTITION_NONE = 'none'
+PARTITION_DAILY = 'daily'
+PARTITION_WEEKLY = 'weekly'
+PARTITION_MONTHLY = 'monthly'
+
+PARTITIONS = [PARTITION_NONE, PARTITION_DAILY, PARTITION_WEEKLY, PARTITION_MONTHLY]
+
+PARTITION_BY_WALLCLOCK = 'wallclock'
+PARTITION_BY_UPDATED_ON = 'updated_on'
+PARTITION_BY_TIMESTAMP = 'timestamp'
+
+PARTITION_FIELDS = [PARTITION_BY_WALLCLOCK, PARTITION_BY_UPDATED_ON, PARTITION_BY_TIMESTAMP]
+
+HTTP_CONFLICT = 409
+HTTP_PAYLOAD_TOO_LARGE = 413
+HTTP_TOO_MANY_REQUESTS = 429
+
+# Connection errors and timeouts have no HTTP status
+STATUS_CONNECTION_ERROR = 'N/A'
+
+ES_RETRY_STATUSES = [STATUS_CONNECTION_ERROR, 408, HTTP_TOO_MANY_REQUESTS, 502, 503, 504]
+ES_OUTAGE_STATUSES = [STATUS_CONNECTION_ERROR, 408, 500, 502, 503, 504]
+
+
+class BulkSizer:
+    """Decide when a bulk request is ready to be sent.
+
+    A bulk is full when it reaches `max_items` items or `target_bytes`
+    bytes. The target grows while ElasticSearch processes the bulks
+    faster than `target_latency` seconds and shrinks when they take
+    longer, when they are rejected (429) or when they are too
+    large (413). The target never goes over `max_bytes`.
+
+    :param max_items: max number of items of a bulk
+    :param target_bytes: initial size in bytes of a bulk
+    :param max_bytes: max size in bytes of a bulk
+    :param target_latency: expected number of seconds to process a bulk
+    """
+    def __init__(self, max_items=ES_BULK_SIZE, target_bytes=ES_BULK_BYTES,
+                 max_bytes=ES_BULK_MAX_BYTES, target_latency=ES_BULK_LATENCY):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.min_bytes = min(ES_BULK_MIN_BYTES, max_bytes)
+        self.target_bytes = min(target_bytes, max_bytes)
+        self.target_latency = target_latency
+        self._lock = threading.Lock()
+
+    def is_full(self, n_items, n_bytes):
+        """Check whether a bulk with the given items and bytes is full"""
+
+        return n_items >= self.max_items or n_bytes >= self.target_bytes
+
+    def update(self, latency):
+        """Adapt the target to the time spent processing a bulk"""
+
+        if latency > self.target_latency:
+            self.__resize(self.target_bytes * ES_BULK_SHRINK)
+        elif latency < self.target_latency / 2:
+            self.__resize(self.target_bytes * ES_BULK_GROWTH)
+
+    def throttle(self):
+        """Reduce the target after ElasticSearch rejected a bulk"""
+
+        self.__resize(self.target_bytes * ES_BULK_SHRINK)
+
+    def reject(self, n_bytes):
+        """Reduce the max size after a bulk of `n_bytes` was too large"""
+
+        with self._lock:
+            self.max_bytes = max(self.min_bytes, min(self.max_bytes, n_bytes // 2))
+
+        self.__resize(self.target_bytes)
+
+    def __resize(self, n_bytes):
+        with self._lock:
+            target = int(max(self.min_bytes, min(self.max_bytes, n_bytes)))
+
+            if target != self.target_bytes:
+                logger.debug("Bulk target size set from %s to %s bytes",
+                             self.target_bytes, target)
+                self.target_bytes = target
+
+
+class Throttler:
+    """Pace the bulk requests sent to ElasticSearch.
+
+    Bulks are paced by token buckets of documents and bytes per
+    second, so they never go over `max_docs_rate` and `max_bytes_rate`
+    (when set). In `adaptive` mode, the documents rate follows the
+    pressure of the cluster with an AIMD policy: it is cut down to a
+    fraction of the measured throughput when a bulk is rejected (429),
+    takes longer than `target_latency` seconds, or when the queue of
+    the write thread pool of any node goes over `max_pool_queue`
+    items. Otherwise, it increases every second by a tenth of the
+    rate set after the last cut, up to twice the measured throughput.
+    The writer is kept just under the saturation of the cluster.
+
+    :param max_docs_rate: max number of documents per second; 0 for no limit
+    :param max_bytes_rate: max number of bytes per second; 0 for no limit
+    :param adaptive: adapt the documents rate to the cluster pressure
+    :param target_latency: max seconds to process a bulk without pressure
+    :param max_pool_queue: max items in the write thread pool queues
+        without pressure; 0 to not check them
+    :param pool_queue: function returning the largest write queue
+        of the nodes of the cluster
+    """
+    def __init__(self, max_docs_rate=ES_MAX_DOCS_RATE, max_bytes_rate=ES_MAX_BYTES_RATE,
+                 adaptive=ES_THROTTLE, target_latency=ES_BULK_LATENCY,
+                 max_pool_queue=ES_THROTTLE_POOL_QUEUE, pool_queue=None):
+        self.max_docs_rate = max_docs_rate
+        self.max_bytes_rate = max_bytes_rate
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.max_pool_queue = max_pool_queue
+        self.pool_queue = pool_queue
+        self.docs_rate = max_docs_rate
+        self.step = 0
+        self.docs_available = 0
+        self.bytes_available = 0
+        self.last_decrease = 0
+        self.last_update = 0
+        self.last_pool_check = 0
+        self.written = collections.deque()
+        self._lock = threading.Lock()
+
+    def acquire(self, n_docs, n_bytes):
+        """Wait until a bulk with the given documents and bytes can be sent"""
+
+        with self._lock:
+            now = time.time()
+            wait = 0
+
+            # Each bucket stores when its tokens are available again,
+            # allowing bursts of up to a second of tokens
+            if self.docs_rate:
+                start = max(self.docs_available, now - 1)
+                self.docs_available = start + n_docs / self.docs_rate
+                wait = max(wait, start - now)
+
+            if self.max_bytes_rate:
+                start = max(self.bytes_available, now - 1)
+                self.bytes_available = start + n_bytes / self.max_bytes_rate
+                wait = max(wait, start - now)
+
+        if wait > 0:
+            metrics.THROTTLE_SECONDS.inc(wait)
+            time.sleep(wait)
+
+    def update(self, n_docs, latency, rejected=False):
+        """Adapt the documents rate to the result of a bulk.
+
+        :param n_docs: number of documents of the bulk
+        :param latency: seconds spent processing the bulk
+        :param rejected: whether ElasticSearch rejected any document
+        """
+        if not self.adaptive:
+            return
+
+        pressure = rejected or latency > self.target_latency or self.__is_pool_busy()
+
+        with self._lock:
+            now = time.time()
+            self.written.append((now, n_docs))
+
+            while self.written[0][0] < now - ES_THROTTLE_WINDOW:
+                self.written.popleft()
+
+            elapsed = now - self.last_update
+            self.last_update = now
+
+            if pressure:
+                # Bulks sent before the last decrease report the
+                # pressure that caused it, do not react to them again
+                if now - latency < self.last_decrease:
+                    return
+
+                rate = self.__throughput(now) * ES_THROTTLE_DECREASE
+                if self.docs_rate:
+                    rate = min(rate, self.docs_rate * ES_THROTTLE_DECREASE)
+
+                self.docs_rate = max(ES_THROTTLE_MIN_RATE, rate)
+                self.step = self.docs_rate * ES_THROTTLE_INCREASE
+                self.last_decrease = now
+                logger.info("Cluster under pressure, writing at most %.1f docs/sec",
+                            self.docs_rate)
+            elif self.step:
+                # Do not grow beyond what the writer is able to use
+                limit = 2 * self.__throughput(now)
+                if self.max_docs_rate:
+                    limit = min(limit, self.max_docs_rate)
+
+                if self.docs_rate < limit:
+                    self.docs_rate = min(self.docs_rate + self.step * elapsed, limit)
+
+            metrics.THROTTLE_RATE.set(self.docs_rate)
+
+    def __throughput(self, now):
+        """Documents written per second during the last window"""
+
+        elapsed = max(now - self.written[0][0], 1)
+        return sum(n_docs for _, n_docs in self.written) / elapsed
+
+    def __is_pool_busy(self):
+        """Check the write thread pool queues every few seconds"""
+
+        if not self.max_pool_queue or not self.pool_queue:
+            return False
+
+        with self._lock:
+            now = time.time()
+            if now - self.last_pool_check < ES_THROTTLE_POOL_INTERVAL:
+                return False
+            self.last_pool_check = now
+
+        try:
+            return self.pool_queue() > self.max_pool_queue
+        except TransportError as e:
+            logger.debug("Thread pool stats not available: %s", e)
+            return False
+
+
+class BulkBody:
+    """Body of a bulk request in NDJSON format.
+
+    The action and the source of each item are encoded once, when the
+    item is added, and appended to a byte buffer that is sent as it
+    is to ElasticSearch. Items with `updated_on` are indexed with it
+    as their external version (`external_gte`), so an older version
+    of an item never replaces a newer one. The positions of the items in the buffer are
+    kept, together with their indexes, to build new bodies with a
+    subset of them (e.g., to retry the ones that failed).
+
+    :param dumps: function to encode an object to JSON bytes
+    """
+    def __init__(self, dumps):
+        self.dumps = dumps
+        self.buffer = bytearray()
+        self.items = []
+        self.indexes = []
+        self.offsets = []
+        self.build_time = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def nbytes(self):
+        return len(self.buffer)
+
+    def add(self, index, item):
+        """Add an item to index in `index`"""
+
+        start = time.time()
+
+        action = b'{"index":{"_index":' + self.dumps(index) \
+            + b',"_type":"items","_id":' + self.dumps(item['uuid'])
+
+        version = item.get('updated_on')
+        if isinstance(version, (int, float)):
+            action += b',"version":%d,"version_type":"external_gte"' \
+                % int(round(version * ES_VERSION_SCALE))
+
+        self.append(action + b'}}\n' + self.dumps(item) + b'\n', item, index)
+        self.build_time += time.time() - start
+
+    def append(self, lines, item, index):
+        """Append the already encoded lines of an item to index in `index`"""
+
+        self.offsets.append(len(self.buffer))
+        self.buffer += lines
+        self.items.append(item)
+        self.indexes.append(index)
+
+    def lines(self, position):
+        """Get the encoded lines of the item in `position`"""
+
+        start = self.offsets[position]
+        end = self.offsets[position + 1] if position + 1 < len(self.offsets) else len(self.buffer)
+
+        return self.buffer[start:end]
+
+    def subset(self, positions):
+        """Build a new body with the items in `positions`"""
+
+        body = BulkBody(self.dumps)
+
+        for position in positions:
+            body.append(self.lines(position), self.items[position], self.indexes[position])
+
+        return body
+
+    def split(self):
+        """Split the body in two halves"""
+
+        half = len(self) // 2
+
+        return self.subset(range(half)), self.subset(range(half, len(self)))
+
+
+class IndexRouter:
+    """Route items to time-partitioned indexes.
+
+    Items are assigned to daily, weekly or monthly partitions of the
+    index `base`, according to the current time (`wallclock`) or to
+    the value of one of their fields (`updated_on` or `timestamp`).
+    Items without a valid value fall back to the current time.
+
+    When `max_docs` is set, a partition rolls over to a new index,
+    named with a generation suffix, once it stores that many items.
+
+    Indexes are opened the first time an item is routed to them by
+    calling `open_index`, which must create the index when needed
+    and return the number of items it already stores. As opening an
+    index may block, `opens_index` tells in advance which items will
+    trigger it.
+
+    :param base: name of the index without the partition suffix
+    :param open_index: function called with the name of each new index
+    :param partition: partitioning interval
+    :param field: source of the time used to partition the items
+    :param max_docs: max number of items of an index; 0 for no limit
+    """
+    def __init__(self, base, open_index, partition=PARTITION_DAILY,
+                 field=PARTITION_BY_WALLCLOCK, max_docs=ES_PARTITION_MAX_DOCS):
+        self.base = base
+        self.open_index = open_index
+        self.partition = partition
+        self.field = field
+        self.max_docs = max_docs
+        self.indices = {}
+        self.current = {}
+        self.__period = None
+
+    def route(self, item):
+        """Get the index where `item` must be stored"""
+
+        name = self.__partition(item)
+        index = self.current.get(name)
+
+        if not index:
+            index = self.__open(name, 1)
+
+        if self.max_docs:
+            if self.indices[index] >= self.max_docs:
+                index = self.__open(name, self.__generation(name, index) + 1)
+            self.indices[index] += 1
+
+        return index
+
+    def opens_index(self, item):
+        """Check whether routing `item` requires opening an index"""
+
+        index = self.current.get(self.__partition(item))
+
+        if not index:
+            return True
+
+        return bool(self.max_docs) and self.indices[index] >= self.max_docs
+
+    def __partition(self, item):
+        """Get the name of the partition of `item`"""
+
+        period = self.__period
+        moment = self.__moment(item)
+
+        if not period or not (period[0] <= moment < period[1]):
+            period = self.__period = self.__period_of(moment)
+
+        return period[2]
+
+    def __open(self, name, generation):
+        """Open the first index of the partition `name` with room for items"""
+
+        while True:
+            index = name if generation == 1 else '%s-%06d' % (name, generation)
+            n_docs = self.open_index(index)
+
+            if not self.max_docs or n_docs < self.max_docs:
+                break
+
+            generation += 1
+
+        self.indices[index] = n_docs
+        self.current[name] = index
+
+        logger.info("Writing items to index %s", index)
+
+        return index
+
+    @staticmethod
+    def __generation(name, index):
+        return 1 if index == name else int(index[len(name) + 1:])
+
+    def __moment(self, item):
+        if self.field != PARTITION_BY_WALLCLOCK:
+            value = item.get(self.field)
+
+            if isinstance(value, (int, float)):
+                return value
+
+        return time.time()
+
+    def __period_of(self, moment):
+        """Get the bounds and the name of the partition of `moment`"""
+
+        if self.partition == PARTITION_NONE:
+            return float('-inf'), float('inf'), self.base
+
+        dt = datetime.datetime.fromtimestamp(moment, tz=datetime.timezone.utc)
+        start = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        if self.partition == PARTITION_DAILY:
+            end = start + datetime.timedelta(days=1)
+            suffix = start.strftime('%Y%m%d')
+        elif self.partition == PARTITION_WEEKLY:
+            start -= datetime.timedelta(days=start.weekday())
+            end = start + datetime.timedelta(weeks=1)
+            suffix = start.strftime('%Gw%V')
+        else:
+            start = start.replace(day=1)
+            end = (start + datetime.timedelta(days=32)).replace(day=1)
+            suffix = start.strftime('%Y%m')
+
+        return start.timestamp(), end.timestamp(), self.base + '_' + suffix
+
+
+class AckTracker:
+    """Acknowledge checkpoints once the bulks preceding them are written.
+
+    Bulk requests may finish in any order, so a checkpoint is
+    acknowledged only when every bulk sent before it, including the
+    one being filled when the checkpoint arrived, has been written.
+    """
+    def __init__(self):
+        self.sent = 0
+        self.written = 0
+        self.finished = set()
+        self.checkpoints = collections.deque()
+
+    def add_bulk(self):
+        """Register a new bulk request and return its id"""
+
+        self.sent += 1
+        return self.sent
+
+    def add_checkpoint(self, checkpoint, filling=False):
+        """Register a checkpoint.
+
+        :param checkpoint: checkpoint to acknowledge
+        :param filling: whether there is a bulk being filled with
+            items that precede the checkpoint
+        """
+        last_bulk = self.sent + 1 if filling else self.sent
+        self.checkpoints.append((last_bulk, checkpoint))
+        self.__ack()
+
+    def bulk_written(self, bulk_id):
+        """Mark the bulk `bulk_id` as written"""
+
+        self.finished.add(bulk_id)
+
+        while self.written + 1 in self.finished:
+            self.written += 1
+            self.finished.remove(self.written)
+
+        self.__ack()
+
+    def __ack(self):
+        while self.checkpoints and self.checkpoints[0][0] <= self.written:
+            _, checkpoint = self.checkpoints.popleft()
+            checkpoint.ack()
+
 
 class ESConnector(Connector):
+    """Connector to write items to an ElasticSearch index.
+
+    Bulk requests are sent from a pool of threads, so the event loop
+    is not blocked while ElasticSearch processes them. At most
+    `es_bulk_concurrency` bulk requests are in flight at the same time.
+    Since they may finish in any order, items are versioned with their
+    `updated_on` (see `BulkBody`); writes of a version older than the
+    stored one are rejected by ElasticSearch and counted as skipped.
+
+    The index is refreshed according to `es_refresh`: never (`none`),
+    once at the end of each transfer cycle (`end`), at most every
+    `es_refresh_interval` seconds (`interval`) or waiting for the
+    refresh of the last bulk of each cycle (`wait_for`). Only the
+    indexes written since the previous refresh are refreshed.
 
+    Items rejected with a temporary error (e.g., 429, a timeout or a
+    connection error) are retried up to `es_item_max_retries` times
+    with exponential backoff. Items that still fail, or that are
+    rejected with a permanent error (e.g., a mapping error or a
+    document larger than the max body size), are passed with their
+    errors to `dead_letter`, a function receiving a list of (item,
+    error) pairs; when it is not set, they are logged and dropped.
+    When a whole bulk request fails (e.g., ES is down or the
+    credentials are wrong), `ElasticError` is raised once its retries
+    are over, so the items are not acknowledged and the source
+    storage keeps them. When `wait_outages` is set,
+    items rejected because ES is unavailable (i.e., connection errors,
+    timeouts and 5xx) are retried with a capped backoff until they are
+    written or the connector is closed, without using their retries.
+
+    Bulk bodies are gzip-compressed when `es_http_compress` is set.
+    Each thread sending bulks keeps its own connection alive in a
+    pool of `es_pool_maxsize` connections, by default one more than
+    the bulk concurrency. When `es_keepalive_idle` is set, TCP
+    keep-alive probes are sent on connections idle for that many
+    seconds, so firewalls do not drop them between bulks.
+
+    Bulks are paced to at most `es_max_docs_rate` documents and
+    `es_max_bytes_rate` bytes per second. With `es_throttle`, the
+    rate adapts to the pressure of the cluster: rejections, slow
+    bulks and, when `es_throttle_pool_queue` is set, busy write
+    thread pools (see `Throttler`).
+
+    In `es_backfill` mode, every index written is tuned for bulk loads
+    (see `BACKFILL_SETTINGS`) and the index is not refreshed during
+    the transfer. When the connector is closed, the settings of the
+    indexes are restored and they are refreshed once. Indexes already
+    tuned when they are opened (e.g., by another worker) are restored
+    by whoever tuned them.
+
+    When `es_items_type` is `auto`, the type of each item is detected
+    from its version key (e.g., `graal_version`). Items of each type
+    are written to their own indexes, named after the index or alias
+    plus the type (e.g., `raw-items-graal`), with the mapping of the
+    type. Bulks may mix items of several types.
+
+    When `dedup` is set (see `kay.dedup.DedupCache`), duplicated items
+    of a bulk are collapsed and the items whose version was already
+    written to their index are skipped. Versions are remembered by the
+    uuid ES assigns to each index, so the ones of a deleted index do
+    not apply to the index recreated with its name.
+
+    Items are written to the partitions of `es_index` (by default,
+    the alias of the items type) set by `es_partition`, based on
+    `es_partition_field` and rolling over every `es_partition_max_docs`
+    items (see `IndexRouter`). When `es_partition` is not set, items
+    are partitioned daily unless `es_index` is given. Every index is
+    created with the mapping of the items type and added to the alias.
+    """
     def __init__(self, es_url, es_items_type, es_index=None, es_index_alias=None,
                  es_timeout=ES_TIMEOUT, es_max_retries=ES_MAX_RETRIES,
-                 es_retry_on_timeout=ES_RETRY_ON_TIMEOUT, es_verify_certs=ES_VERIFY_CERTS):
+                 es_retry_on_timeout=ES_RETRY_ON_TIMEOUT, es_verify_certs=ES_VERIFY_CERTS,
+                 es_bulk_concurrency=ES_BULK_CONCURRENCY, es_bulk_size=ES_BULK_SIZE,
+                 es_bulk_bytes=ES_BULK_BYTES, es_bulk_max_bytes=ES_BULK_MAX_BYTES,
+                 es_bulk_latency=ES_BULK_LATENCY, es_refresh=REFRESH_END,
+                 es_refresh_interval=ES_REFRESH_INTERVAL, es_item_max_retries=ES_ITEM_MAX_RETRIES,
+                 es_retry_backoff=ES_RETRY_BACKOFF, es_partition=None,
+                 es_partition_field=PARTITION_BY_WALLCLOCK,
+                 es_partition_max_docs=ES_PARTITION_MAX_DOCS, es_http_compress=ES_HTTP_COMPRESS,
+                 es_pool_maxsize=None, es_keepalive_idle=ES_KEEPALIVE_IDLE,
+                 es_throttle=ES_THROTTLE, es_max_docs_rate=ES_MAX_DOCS_RATE,
+                 es_max_bytes_rate=ES_MAX_BYTES_RATE,
+                 es_throttle_pool_queue=ES_THROTTLE_POOL_QUEUE, es_backfill=ES_BACKFILL,
+                 dead_letter=None, dedup=None):
         super().__init__("elasticsearch")
+        pool_maxsize = es_pool_maxsize if es_pool_maxsize else es_bulk_concurrency + 1
         self.conn = Elasticsearch([es_url], timeout=es_timeout, max_retries=es_max_retries,
-                                  retry_on_timeout=es_retry_on_timeout, verify_certs=es_verify_certs)
+                                  retry_on_timeout=es_retry_on_timeout, verify_certs=es_verify_certs,
+                                  http_compress=es_http_compress, maxsize=pool_maxsize)
+        if es_keepalive_idle:
+            self.__enable_tcp_keepalive(es_keepalive_idle)
         self.url = es_url
         self.items_type = es_items_type
-        self.index = es_index if es_index else self.get_index(es_items_type)
-        self.alias = es_index_alias if es_index_alias else self.get_alias(es_items_type)
+        self.index = es_index
+        self.alias = es_index_alias
 
-        if es_items_type not in SUPPORTED_MAPPINGS.keys():
+        if es_items_type not in SUPPORTED_MAPPINGS.keys() and es_items_type != AUTO_TYPE:
             logger.warning("Items mapping %s unknown, setting default mapping", es_items_type)
 
-        self.items_mapping = SUPPORTED_MAPPINGS[es_items_type]
+        self.bulk_concurrency = es_bulk_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=es_bulk_concurrency)
+        self.bulk_sizer = BulkSizer(max_items=es_bulk_size, target_bytes=es_bulk_bytes,
+                                    max_bytes=es_bulk_max_bytes, target_latency=es_bulk_latency)
+        self.throttler = None
+        if es_throttle or es_max_docs_rate or es_max_bytes_rate:
+            self.throttler = Throttler(max_docs_rate=es_max_docs_rate,
+                                       max_bytes_rate=es_max_bytes_rate,
+                                       adaptive=es_throttle, target_latency=es_bulk_latency,
+                                       max_pool_queue=es_throttle_pool_queue,
+                                       pool_queue=self.pool_queue)
+        self.serializer = self.conn.transport.serializer
+        self.dumps = self.__orjson_dumps if orjson else self.__json_dumps
+
+        self.refresh_policy = REFRESH_NONE if es_backfill else es_refresh
+        self.refresh_interval = es_refresh_interval
+        self.last_refresh = time.time()
+        self.unrefreshed = set()
+        self._refresh_lock = threading.Lock()
+
+        self.item_max_retries = es_item_max_retries
+        self.retry_backoff = es_retry_backoff
+        self.closed = threading.Event()
+        self.dead_letter = dead_letter
+        self.dedup = dedup
+        self.index_uuids = {}
 
-        self.create_index()
-        self.create_alias()
+        if not es_partition:
+            es_partition = PARTITION_NONE if es_index else PARTITION_DAILY
 
-    def create_index(self):
+        self.partition = es_partition
+        self.partition_field = es_partition_field
+        self.partition_max_docs = es_partition_max_docs
+        self.routers = {}
+
+        self.backfill = es_backfill
+        self.backfill_settings = {}
+
+    def route(self, item):
+        """Get the index where `item` must be stored"""
+
+        items_type = self.items_type
+        if items_type == AUTO_TYPE:
+            items_type = detect_items_type(item)
+
+        router = self.routers.get(items_type)
+        if not router:
+            router = self.__add_router(items_type)
+
+        return router.route(item)
+
+    def opens_index(self, item):
+        """Check whether routing `item` requires calls to ES"""
+
+        items_type = self.items_type
+        if items_type == AUTO_TYPE:
+            items_type = detect_items_type(item)
+
+        router = self.routers.get(items_type)
+
+        return not router or router.opens_index(item)
+
+    def __add_router(self, items_type):
+        """Create the router of the indexes of `items_type`"""
+
+        alias = self.alias if self.alias else self.get_alias(items_type)
+        base = self.index if self.index else self.get_alias(items_type)
+
+        # Types sharing an alias must not share their indexes
+        if self.items_type == AUTO_TYPE:
+            base += '-' + items_type
+
+        mapping = SUPPORTED_MAPPINGS.get(items_type, DEFAULT_MAPPING % 'items')
+
+        router = IndexRouter(base, lambda index: self.open_index(index, mapping, alias),
+                             partition=self.partition, field=self.partition_field,
+                             max_docs=self.partition_max_docs)
+
+        self.routers[items_type] = router
+
+        return router
+
+    def __enable_tcp_keepalive(self, idle):
+        """Send TCP keep-alive probes on the connections to ES"""
+
+        options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+        # Probe timings can only be set on some platforms (e.g., Linux)
+        if hasattr(socket, 'TCP_KEEPIDLE'):
+            options += [(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle),
+                        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, ES_KEEPALIVE_INTERVAL),
+                        (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, ES_KEEPALIVE_COUNT)]
+
+        for connection in self.conn.transport.connection_pool.connections:
+            conn_kw = connection.pool.conn_kw
+            conn_kw['socket_options'] = conn_kw.get('socket_options',
+                                                    HTTPConnection.default_socket_options) + options
+
+    def open_index(self, index, mapping, alias):
+        """Create the index and its alias when needed.
+
+        :returns: the number of items stored in the index, only when
+            the partitions have a max number of items; 0 otherwise
+        """
+        self.create_index(index, mapping)
+        self.create_alias(index, alias)
+
+        if self.dedup:
+            response = self.conn.indices.get_settings(index=index)
+            settings = next(iter(response.values()))['settings']['index']
+            self.index_uuids[index] = settings.get('uuid', index)
+
+        if self.backfill:
+            self.tune_for_backfill(index)
+
+        if not self.partition_max_docs:
+            return 0
+
+        # Items written before a restart may not be searchable yet
+        self.conn.indices.refresh(index=index)
+
+        return self.conn.count(index=index).get('count', 0)
+
+    def create_index(self, index, mapping):
         """Create index if not exists"""
 
-        mapping = json.loads(self.items_mapping)
+        mapping = json.loads(mapping)
 
-        if self.conn.indices.exists(index=self.index):
-            logger.warning("Index %s already exists!", self.index)
+        if self.conn.indices.exists(index=index):
+            logger.warning("Index %s already exists!", index)
             return
 
-        res = self.conn.indices.create(index=self.index, body=mapping)
+        try:
+            res = self.conn.indices.create(index=index, body=mapping)
+        except RequestError as e:
+            # Another process may have created the index in the meanwhile
+            if e.error != 'resource_already_exists_exception':
+                raise
+            logger.warning("Index %s already exists!", index)
+            return
 
         if not res['acknowledged']:
             raise ElasticError(cause="Index not created")
 
-    def create_alias(self):
+    def create_alias(self, index, alias):
         """Create alias for index"""
 
         res = self.conn.indices.update_aliases(
             {
                 "actions": [
-                    {"add": {"index": self.index, "alias": self.alias}}
+                    {"add": {"index": index, "alias": alias}}
                 ]
             }
         )
@@ -244,35 +991,218 @@ class ESConnector(Connector):
         if not res['acknowledged']:
             raise ElasticError(cause="Alias not created")
 
+    def tune_for_backfill(self, index):
+        """Record the settings of the index and tune it for bulk loads"""
+
+        response = self.conn.indices.get_settings(index=index)
+        settings = next(iter(response.values()))['settings']['index']
+
+        original = {name: _get_setting(settings, name) for name in BACKFILL_SETTINGS}
+
+        if all(str(original[name]) == str(value) for name, value in BACKFILL_SETTINGS.items()):
+            logger.warning("Index %s already tuned for backfill, its settings "
+                           "will not be restored by this transfer", index)
+            return
+
+        self.conn.indices.put_settings(index=index, body={'index': BACKFILL_SETTINGS})
+        self.backfill_settings[index] = original
+
+        logger.info("Index %s tuned for backfill, original settings %s", index, original)
+
+    def close(self):
+        """Stop the retries and restore the settings of the indexes tuned for backfill"""
+
+        self.closed.set()
+
+        if not self.backfill:
+            return
+
+        for index, settings in list(self.backfill_settings.items()):
+            try:
+                self.conn.indices.put_settings(index=index, body={'index': settings})
+            except TransportError as e:
+                logger.error("Settings of index %s not restored, set them to %s. Error %s",
+                             index, settings, e)
+                continue
+
+            del self.backfill_settings[index]
+            logger.info("Index %s settings restored", index)
+
+        self.refresh()
+
     async def write(self, data_queue):
         """Write data to ElasticSearch"""
 
-        items = []
+        pending = {}
+        tracker = AckTracker()
+
+        try:
+            await self.__write_cycle(data_queue, pending, tracker)
+        except BaseException:
+            # Bulks in flight cannot be cancelled, collect their results
+            self.__abandon(pending)
+            raise
+
+        data_queue.task_done()
+
+    async def __write_cycle(self, data_queue, pending, tracker):
+        """Write the items read until the end of the reading.
+
+        :param data_queue: queue with the items read
+        :param pending: dict of bulk requests in flight and their ids,
+            updated as bulks are sent and finished
+        :param tracker: tracker of the checkpoints to acknowledge
+        """
+        body = BulkBody(self.dumps)
+        written = False
         while True:
             item = await data_queue.get()
 
             if item == Connector.READ_DONE:
                 break
 
-            items.append(item)
+            if isinstance(item, Checkpoint):
+                tracker.add_checkpoint(item, filling=bool(body))
+                data_queue.task_done()
+                continue
+
+            if self.opens_index(item):
+                # Opening an index makes blocking calls to ES
+                loop = asyncio.get_event_loop()
+                index = await loop.run_in_executor(self.executor, self.route, item)
+            else:
+                index = self.route(item)
+
+            body.add(index, item)
             data_queue.task_done()
 
-            if len(items) == ES_BULK_SIZE:
-                self.__process_items(items)
-                items.clear()
+            if self.bulk_sizer.is_full(len(body), body.nbytes):
+                pending = await self.__submit(body, pending, tracker)
+                body = BulkBody(self.dumps)
+                written = True
 
-        if items:
-            self.__process_items(items)
-            items.clear()
+        if body:
+            refresh = None
 
-        data_queue.task_done()
+            if self.refresh_policy == REFRESH_WAIT_FOR:
+                # Make sure the last bulk is the last one to be processed
+                if pending:
+                    pending = await self.__wait(pending, tracker, asyncio.ALL_COMPLETED)
+                refresh = REFRESH_WAIT_FOR
+
+            pending = await self.__submit(body, pending, tracker, refresh=refresh)
+            written = True
+
+        if pending:
+            await self.__wait(pending, tracker, asyncio.ALL_COMPLETED)
+
+        # With `wait_for`, the last bulk refreshes the index, unless
+        # the cycle ended right after sending a full bulk
+        refresh_now = self.refresh_policy == REFRESH_END or \
+            (self.refresh_policy == REFRESH_WAIT_FOR and not body)
+
+        if written and refresh_now:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(self.executor, self.refresh)
+
+    def pool_queue(self):
+        """Get the largest queue of the write thread pools of the cluster"""
+
+        stats = self.conn.nodes.stats(metric='thread_pool')
+
+        queues = [0]
+        for node in stats.get('nodes', {}).values():
+            pools = node.get('thread_pool', {})
+            # The pool was named `bulk` before ElasticSearch 6.3
+            pool = pools.get('write', pools.get('bulk', {}))
+            queues.append(pool.get('queue', 0))
+
+        return max(queues)
+
+    def refresh(self):
+        """Refresh the indexes written since the last refresh"""
+
+        start = time.time()
+        with self._refresh_lock:
+            self.last_refresh = start
+            indexes, self.unrefreshed = self.unrefreshed, set()
+
+        if not indexes:
+            return
+
+        try:
+            self.conn.indices.refresh(index=','.join(sorted(indexes)))
+        except Exception:
+            # Refresh them next time
+            with self._refresh_lock:
+                self.unrefreshed |= indexes
+            raise
+
+        PROFILER.record(STAGE_REFRESH, time.time() - start)
+
+    async def __submit(self, body, pending, tracker, refresh=None):
+        """Send a bulk request without blocking the event loop.
+
+        When the max number of concurrent bulk requests is reached,
+        the method waits for any of them to finish before sending
+        the new one.
+
+        :param body: bulk body with the items to write
+        :param pending: dict of bulk requests in flight and their ids
+        :param tracker: tracker of the checkpoints to acknowledge
+        :param refresh: refresh parameter of the bulk request
+
+        :returns: the updated dict of bulk requests in flight
+        """
+        PROFILER.record(STAGE_BULK_BUILD, body.build_time)
+
+        if len(pending) >= self.bulk_concurrency:
+            pending = await self.__wait(pending, tracker, asyncio.FIRST_COMPLETED)
+
+        loop = asyncio.get_event_loop()
+        future = loop.run_in_executor(self.executor, self.__process_items,
+                                      body, refresh)
+        pending[future] = tracker.add_bulk()
+
+        return pending
+
+    async def __wait(self, pending, tracker, return_when):
+        """Wait for bulk requests to finish and check their results"""
+
+        done, _ = await asyncio.wait(pending, return_when=return_when)
+
+        for future in done:
+            # Raise the error of any failed bulk request
+            n_written, n_skipped, failed = future.result()
+            self.stats['written'] += n_written
+            metrics.ITEMS_WRITTEN.inc(n_written)
+
+            if n_skipped:
+                self.stats['skipped'] += n_skipped
+                metrics.ITEMS_SKIPPED.inc(n_skipped)
+
+            if failed:
+                self.stats['failed'] += len(failed)
+                metrics.ITEMS_FAILED.inc(len(failed))
+                self.__reject(failed)
+
+            tracker.bulk_written(pending.pop(future))
+
+        return pending
 
     @staticmethod
-    def get_index(items_type):
-        current_time = datetime_utcnow()
-        str_time = datetime_to_str(current_time, '%Y%m%d')
+    def __abandon(pending):
+        """Retrieve the results of the bulks in flight when writing aborts"""
 
-        return ESConnector.get_alias(items_type) + '_' + str_time
+        def retrieve(future):
+            if not future.cancelled() and future.exception():
+                logger.debug("Bulk in flight failed: %s", future.exception())
+
+        for future in pending:
+            if future.done():
+                retrieve(future)
+            else:
+                future.add_done_callback(retrieve)
 
     @staticmethod
     def get_alias(items_type):
@@ -281,31 +1211,242 @@ class ESConnector(Connector):
         else:
             return ALIAS_ENRICH
 
-    def __process_items(self, items):
-        digest_items = []
+    def __process_items(self, body, refresh):
+        n_skipped = 0
 
-        for item in items:
-            es_item = {
-                '_index': self.index,
-                '_type': 'items',
-                '_id': item['uuid'],
-                '_source': item
-            }
+        if self.dedup:
+            positions = self.dedup.filter(body.items, self.__dedup_scopes(body))
+            n_skipped = len(body) - len(positions)
 
-            digest_items.append(es_item)
+            if n_skipped:
+                body = body.subset(positions)
 
-        self.__write_to_es(digest_items)
+        failed, stale = self.__write_to_es(body, refresh) if body else ([], [])
+        n_skipped += len(stale)
 
-    def __write_to_es(self, items):
+        rejected = {id(item) for item, _ in failed} | {id(item) for item in stale}
+        written = [position for position, item in enumerate(body.items)
+                   if id(item) not in rejected]
 
-        index = self.index
+        with self._refresh_lock:
+            self.unrefreshed.update(body.indexes[position] for position in written)
 
-        errors = helpers.bulk(self.conn, items)[1]
-        self.conn.indices.refresh(index=index)
+        if self.dedup:
+            scopes = self.__dedup_scopes(body)
+
+            self.dedup.mark([body.items[position] for position in written],
+                            [scopes[position] for position in written])
+
+        if self.refresh_policy == REFRESH_INTERVAL and self.__is_refresh_due():
+            self.refresh()
+
+        return len(body) - len(failed) - len(stale), n_skipped, failed
+
+    def __dedup_scopes(self, body):
+        return [self.index_uuids.get(index, index) for index in body.indexes]
+
+    def __orjson_dumps(self, obj):
+        return orjson.dumps(obj, default=self.serializer.default,
+                            option=orjson.OPT_NON_STR_KEYS)
+
+    def __json_dumps(self, obj):
+        return json.dumps(obj, default=self.serializer.default,
+                          ensure_ascii=False).encode('utf-8')
+
+    def __is_refresh_due(self):
+        with self._refresh_lock:
+            if time.time() - self.last_refresh < self.refresh_interval:
+                return False
+
+            # Prevent concurrent bulks from refreshing the index too
+            self.last_refresh = time.time()
+            return True
+
+    def __write_to_es(self, body, refresh=None):
+        """Write the items retrying the ones that fail temporarily.
+
+        Items rejected with a retryable status are sent again, waiting
+        an exponential backoff between attempts, up to `item_max_retries`
+        times. When `wait_outages` is set, items rejected because ES is
+        unavailable are sent again until they are written.
+
+        :returns: a tuple with a list of (item, error) pairs with the
+            items that could not be written, and a list with the items
+            not written because a newer version is already stored
+
+        :raises ElasticError: when the whole bulk request keeps failing
+        """
+        failed = []
+        stale = []
+        attempt = 0
+        outages = 0
+
+        while True:
+            try:
+                results = self.__bulk(body, refresh)
+                bulk_error = None
+            except TransportError as e:
+                # The whole bulk failed, so every item shares its error
+                bulk_error = e
+                status = STATUS_CONNECTION_ERROR if isinstance(e, ConnectionError) else e.status_code
+                results = [(False, {'index': {'status': status, 'error': str(e)}})] * len(body)
+
+            retries = []
+            waiting = []
+            for position, (ok, result) in enumerate(results):
+                if ok:
+                    continue
+
+                error = next(iter(result.values()))
+                status = error.get('status')
+
+                if status == HTTP_CONFLICT:
+                    stale.append(body.items[position])
+                elif self.wait_outages and status in ES_OUTAGE_STATUSES:
+                    waiting.append(position)
+                elif status in ES_RETRY_STATUSES and attempt < self.item_max_retries:
+                    retries.append(position)
+                elif bulk_error:
+                    # Items are not to blame, keep them in the source storage
+                    raise ElasticError(cause="Bulk of %s items not written (%s). Error %s"
+                                       % (len(body), self.url, bulk_error))
+                else:
+                    failed.append((body.items[position], error))
+
+            if not retries and not waiting:
+                break
+
+            metrics.ITEMS_RETRIED.inc(len(retries) + len(waiting))
+
+            # Outages do not use the retries of the items
+            attempt += 1 if retries else 0
+            outages = outages + 1 if waiting else 0
+            backoff = min(self.retry_backoff * 2 ** (max(attempt, outages) - 1),
+                          ES_RETRY_MAX_BACKOFF)
+
+            if waiting:
+                logger.warning("ES unavailable, %s items waiting %s seconds to be written",
+                               len(waiting), backoff)
+            if retries:
+                logger.warning("%s items not written, retrying in %s seconds (%s/%s)",
+                               len(retries), backoff, attempt, self.item_max_retries)
+
+            if self.closed.wait(backoff):
+                raise ElasticError(cause="Connector closed with %s items not written"
+                                   % (len(retries) + len(waiting)))
+
+            body = body.subset(sorted(retries + waiting))
+
+        return failed, stale
+
+    def __bulk(self, body, refresh=None):
+        """Send a bulk request, splitting it when it is too large.
 
-        if errors:
-            raise ElasticError(cause="Lost items from Arthur to ES (%s). Error %s"
-                                     % (self.url, errors[0]))
+        A single item too large for a bulk request is rejected as any
+        other item; errors of the whole request are raised.
+
+        :returns: a list with the (ok, result) pair of each item
+
+        :raises TransportError: when the bulk request fails
+        """
+        bulk_args = {'refresh': refresh} if refresh else {}
+
+        if self.throttler:
+            self.throttler.acquire(len(body), body.nbytes)
+
+        start = time.time()
+        try:
+            response = self.conn.bulk(body=bytes(body.buffer), **bulk_args)
+        except TransportError as e:
+            if e.status_code == HTTP_PAYLOAD_TOO_LARGE:
+                if len(body) == 1:
+                    error = {'index': {'status': e.status_code, 'error': str(e)}}
+                    return [(False, error)]
+
+                logger.warning("Bulk of %s bytes too large, splitting it", body.nbytes)
+                self.bulk_sizer.reject(body.nbytes)
+
+                first, second = body.split()
+                results = self.__bulk(first)
+                results.extend(self.__bulk(second, refresh))
+                return results
+
+            if e.status_code == HTTP_TOO_MANY_REQUESTS:
+                self.bulk_sizer.throttle()
+
+                if self.throttler:
+                    self.throttler.update(len(body), time.time() - start, rejected=True)
+
+            raise
+
+        latency = time.time() - start
+        metrics.BULK_LATENCY.observe(latency)
+        PROFILER.record(STAGE_ES_REQUEST, latency)
+        metrics.BULK_SIZE.observe(len(body))
+        metrics.BYTES_WRITTEN.inc(body.nbytes)
+
+        results = [(200 <= self.__error_status(result) < 300, result)
+                   for result in response['items']]
+
+        rejected = any(self.__error_status(result) == HTTP_TOO_MANY_REQUESTS
+                       for ok, result in results if not ok)
+
+        if rejected:
+            self.bulk_sizer.throttle()
+        else:
+            self.bulk_sizer.update(latency)
+
+        if self.throttler:
+            self.throttler.update(len(body), latency, rejected=rejected)
+
+        return results
+
+    def __reject(self, failed):
+        """Send the items that could not be written to the dead letter queue"""
+
+        for item, error in failed:
+            logger.debug("Item %s not written. Error %s", item.get('uuid'), error)
+
+        if not self.dead_letter:
+            logger.error("%s items lost from Arthur to ES (%s). Error %s",
+                         len(failed), self.url, failed[0][1])
+            return
+
+        logger.warning("%s items not written to ES (%s), moved to the dead letter queue",
+                       len(failed), self.url)
+        self.dead_letter(failed)
+
+    @staticmethod
+    def __error_status(error):
+        """Get the HTTP status of a failed bulk action"""
+
+        return next(iter(error.values())).get('status')
+
+
+def _get_setting(settings, name):
+    """Get a setting given by its dotted name from nested settings"""
+
+    if name in settings:
+        return settings[name]
+
+    for key in name.split('.'):
+        if not isinstance(settings, dict) or key not in settings:
+            return None
+        settings = settings[key]
+
+    return settings
+
+
+def detect_items_type(item):
+    """Guess the type of an item from the version key of its tool.
+
+    Items without a known version key are considered Perceval items.
+    """
+    for items_type in (GRAAL_TYPE, GALAHAD_TYPE, PERCEVAL_TYPE):
+        if items_type + '_version' in item:
+            return items_type
+
+    return PERCEVAL_TYPE
 
 
 class ESConnectorCommand(ConnectorCommand):
@@ -333,7 +1474,88 @@ class ESConnectorCommand(ConnectorCommand):
                            default=ES_VERIFY_CERTS,
                            action='store_true',
                            help="Enable verify certs")
+        group.add_argument('--es-bulk-concurrency', dest='es_bulk_concurrency',
+                           type=int, default=ES_BULK_CONCURRENCY,
+                           help="Max number of bulk requests in flight")
+        group.add_argument('--es-bulk-size', dest='es_bulk_size',
+                           type=int, default=ES_BULK_SIZE,
+                           help="Max number of items of a bulk request")
+        group.add_argument('--es-bulk-bytes', dest='es_bulk_bytes',
+                           type=int, default=ES_BULK_BYTES,
+                           help="Initial target size in bytes of a bulk request")
+        group.add_argument('--es-bulk-max-bytes', dest='es_bulk_max_bytes',
+                           type=int, default=ES_BULK_MAX_BYTES,
+                           help="Max size in bytes of a bulk request")
+        group.add_argument('--es-bulk-latency', dest='es_bulk_latency',
+                           type=float, default=ES_BULK_LATENCY,
+                           help="Target seconds to process a bulk request")
+        group.add_argument('--es-refresh', dest='es_refresh',
+                           choices=REFRESH_POLICIES, default=REFRESH_END,
+                           help="Policy to refresh the index")
+        group.add_argument('--es-refresh-interval', dest='es_refresh_interval',
+                           type=float, default=ES_REFRESH_INTERVAL,
+                           help="Seconds between refreshes with the interval policy")
+        group.add_argument('--es-item-max-retries', dest='es_item_max_retries',
+                           type=int, default=ES_ITEM_MAX_RETRIES,
+                           help="Max number of retries of items rejected temporarily")
+        group.add_argument('--es-retry-backoff', dest='es_retry_backoff',
+                           type=float, default=ES_RETRY_BACKOFF,
+                           help="Seconds to wait before the first retry of rejected items")
+        group.add_argument('--es-partition', dest='es_partition',
+                           choices=PARTITIONS,
+                           help="Interval to partition the index; daily by default "
+                                "unless an index is set")
+        group.add_argument('--es-partition-field', dest='es_partition_field',
+                           choices=PARTITION_FIELDS, default=PARTITION_BY_WALLCLOCK,
+                           help="Time used to partition the items")
+        group.add_argument('--es-partition-max-docs', dest='es_partition_max_docs',
+                           type=int, default=ES_PARTITION_MAX_DOCS,
+                           help="Max number of items of an index before rolling over")
+        group.add_argument('--es-dedup', dest='es_dedup',
+                           action='store_true',
+                           help="Skip the items whose version was already written")
+        group.add_argument('--es-dedup-cache-size', dest='es_dedup_cache_size',
+                           type=int, default=DEDUP_CACHE_SIZE,
+                           help="Max number of items remembered by the dedup cache")
+        group.add_argument('--es-dedup-persist', dest='es_dedup_persist',
+                           action='store_true',
+                           help="Store the versions of the items written in the source storage")
+        group.add_argument('--es-dedup-persist-size', dest='es_dedup_persist_size',
+                           type=int, default=DEDUP_PERSIST_SIZE,
+                           help="Max number of versions stored in the source storage")
+        group.add_argument('--es-dedup-persist-ttl', dest='es_dedup_persist_ttl',
+                           type=int, default=DEDUP_PERSIST_TTL,
+                           help="Seconds to keep the versions stored in the source storage")
+        group.add_argument('--es-http-compress', dest='es_http_compress',
+                           action='store_true', default=ES_HTTP_COMPRESS,
+                           help="Compress the bulk requests with gzip")
+        group.add_argument('--es-pool-maxsize', dest='es_pool_maxsize',
+                           type=int,
+                           help="Max number of connections kept alive; "
+                                "by default, the bulk concurrency plus one")
+        group.add_argument('--es-keepalive-idle', dest='es_keepalive_idle',
+                           type=int, default=ES_KEEPALIVE_IDLE,
+                           help="Seconds a connection is idle before sending TCP keep-alive "
+                                "probes; 0 to disable them")
+        group.add_argument('--es-throttle', dest='es_throttle',
+                           action='store_true', default=ES_THROTTLE,
+                           help="Adapt the writing rate to the pressure of the cluster")
+        group.add_argument('--es-max-docs-rate', dest='es_max_docs_rate',
+                           type=float, default=ES_MAX_DOCS_RATE,
+                           help="Max number of documents written per second; 0 for no limit")
+        group.add_argument('--es-max-bytes-rate', dest='es_max_bytes_rate',
+                           type=float, default=ES_MAX_BYTES_RATE,
+                           help="Max number of bytes written per second; 0 for no limit")
+        group.add_argument('--es-throttle-pool-queue', dest='es_throttle_pool_queue',
+                           type=int, default=ES_THROTTLE_POOL_QUEUE,
+                           help="Max items queued in the write thread pool of any node "
+                                "before throttling; 0 to not check them")
+        group.add_argument('--es-backfill', dest='es_backfill',
+                           action='store_true', default=ES_BACKFILL,
+                           help="Tune the indexes for bulk loads (no replicas, no refresh, "
+                                "async translog) and restore them at the end")
         group.add_argument('--es-url', dest='es_url', help="ES url")
         group.add_argument('--es-items-type', dest='es_items_type',
-                           choices=[PERCEVAL_TYPE, GRAAL_TYPE, GALAHAD_TYPE],
-                           help="Set the type of items to insert")
+                           choices=[PERCEVAL_TYPE, GRAAL_TYPE, GALAHAD_TYPE, AUTO_TYPE],
+                           help="Set the type of items to insert; auto to detect "
+                                "the type of each item and write it to its own index")
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import asyncio
+import gzip
+import io
+import json
+import logging
+import os
+
+from kay import metrics
+from kay.connector import (Checkpoint,
+                           Connector,
+                           ConnectorCommand)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FILE_CHUNK_SIZE = 1000
+FILE_BUFFER_SIZE = 1024 * 1024
+FILE_RESUME = False
+
+COMPRESSION_AUTO = 'auto'
+COMPRESSION_NONE = 'none'
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+
+COMPRESSIONS = [COMPRESSION_AUTO, COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD]
+
+EXTENSIONS = {
+    '.gz': COMPRESSION_GZIP,
+    '.gzip': COMPRESSION_GZIP,
+    '.zst': COMPRESSION_ZSTD,
+    '.zstd': COMPRESSION_ZSTD
+}
+
+OFFSET_SUFFIX = '.offset'
+
+logger = logging.getLogger(__name__)
+
+
+class FileConnector(Connector):
+    """Connector to read and write items in NDJSON files.
+
+    Each line of the file stores an item in JSON. Files can be
+    compressed with gzip or zstd (the latter requires the `zstandard`
+    package); by default, the compression is guessed from the file
+    extension.
+
+    As a source, the file is read in chunks of at most `chunk_size`
+    items through a buffered reader, in a separate thread. When the
+    reading is kept alive, each reading continues from the position
+    where the previous one stopped, following the lines appended to
+    the file; a last line without end of line is read only when the
+    file is not followed, as it may still be being written. In `resume` mode, each chunk is followed by a checkpoint
+    in the data queue; once acknowledged, the offset of the chunk end
+    (in uncompressed bytes) is stored in `offset_path`, and a new
+    transfer starts reading from that offset.
+
+    As a target, items are appended to the file. Checkpoints are
+    acknowledged once the items preceding them are flushed to disk.
+    Each writing appends a complete gzip member or zstd frame, so the
+    file is valid after every transfer cycle.
+
+    :param file_path: path of the file
+    :param compression: compression of the file
+    :param chunk_size: max number of items read or written at once
+    :param resume: resume the reading from the last offset acknowledged
+    :param offset_path: path of the file storing the offset; by
+        default, the file path plus `.offset`
+    """
+    def __init__(self, file_path, compression=COMPRESSION_AUTO, chunk_size=FILE_CHUNK_SIZE,
+                 resume=FILE_RESUME, offset_path=None):
+        super().__init__(file_path)
+        self.path = file_path
+        self.compression = self.__guess_compression(file_path) \
+            if compression == COMPRESSION_AUTO else compression
+        self.chunk_size = chunk_size
+        self.resume = resume
+        self.offset_path = offset_path if offset_path else file_path + OFFSET_SUFFIX
+        self.reader = None
+        self.fd = None
+        self.offset = 0
+        self.partial = b''
+
+        if self.compression == COMPRESSION_ZSTD and not zstandard:
+            raise ValueError("zstandard package is required to use zstd files")
+
+        self.loads = orjson.loads if orjson else json.loads
+        self.dumps = self.__orjson_dumps if orjson else self.__json_dumps
+
+    async def read(self, data_queue):
+        """Read items from the file"""
+
+        loop = asyncio.get_event_loop()
+
+        if not self.reader:
+            self.reader = await loop.run_in_executor(None, self.__open_reader)
+
+        while True:
+            items, n_bytes = await loop.run_in_executor(None, self.__read_chunk)
+
+            if not items:
+                break
+
+            self.offset += n_bytes
+            self.stats['read'] += len(items)
+            metrics.ITEMS_READ.inc(len(items))
+            metrics.BYTES_READ.inc(n_bytes)
+
+            for item in items:
+                await data_queue.put(item)
+
+            if self.resume:
+                await data_queue.put(Checkpoint(self.__save_offset, self.offset))
+
+        await data_queue.put(Connector.READ_DONE)
+
+    async def write(self, data_queue):
+        """Append items to the file"""
+
+        loop = asyncio.get_event_loop()
+
+        # The file is opened on the first item, so readings without
+        # items do not append empty compressed members
+        writer = fd = None
+
+        lines = []
+        while True:
+            item = await data_queue.get()
+
+            if item == Connector.READ_DONE:
+                break
+
+            if isinstance(item, Checkpoint):
+                if writer:
+                    await loop.run_in_executor(None, self.__write_lines, writer, lines)
+                    await loop.run_in_executor(None, self.__sync, writer, fd)
+                    lines = []
+                item.ack()
+            else:
+                lines.append(self.dumps(item))
+
+                if not writer:
+                    writer, fd = await loop.run_in_executor(None, self.__open_writer)
+
+                if len(lines) >= self.chunk_size:
+                    await loop.run_in_executor(None, self.__write_lines, writer, lines)
+                    lines = []
+
+            data_queue.task_done()
+
+        if writer:
+            await loop.run_in_executor(None, self.__write_lines, writer, lines)
+            await loop.run_in_executor(None, self.__close_writer, writer, fd)
+
+        data_queue.task_done()
+
+    def close(self):
+        """Close the file read"""
+
+        if self.partial:
+            logger.warning("Last line of %s not read, its end of line is missing", self.path)
+            self.partial = b''
+
+        if self.reader:
+            self.reader.close()
+            # Compressed readers do not close the file they wrap
+            self.fd.close()
+            self.reader = None
+            self.fd = None
+
+    def __open_reader(self):
+        """Open the file for reading, skipping the data already read"""
+
+        fd = open(self.path, 'rb', buffering=FILE_BUFFER_SIZE)
+        self.fd = fd
+
+        if self.compression == COMPRESSION_GZIP:
+            reader = gzip.GzipFile(fileobj=fd, mode='rb')
+        elif self.compression == COMPRESSION_ZSTD:
+            stream = zstandard.ZstdDecompressor().stream_reader(fd, read_across_frames=True)
+            reader = io.BufferedReader(stream, buffer_size=FILE_BUFFER_SIZE)
+        else:
+            reader = fd
+
+        if self.resume and os.path.exists(self.offset_path):
+            with open(self.offset_path) as offset_fd:
+                self.offset = int(offset_fd.read().strip() or 0)
+
+            self.__skip(reader, self.offset)
+            logger.info("Resuming the reading of %s from offset %s", self.path, self.offset)
+
+        return reader
+
+    def __open_writer(self):
+        """Open the file for appending.
+
+        :returns: a tuple with the stream to write and the file
+        """
+        fd = open(self.path, 'ab', buffering=FILE_BUFFER_SIZE)
+
+        if self.compression == COMPRESSION_GZIP:
+            writer = gzip.GzipFile(fileobj=fd, mode='ab')
+        elif self.compression == COMPRESSION_ZSTD:
+            writer = zstandard.ZstdCompressor().stream_writer(fd, closefd=False)
+        else:
+            writer = fd
+
+        return writer, fd
+
+    def __skip(self, reader, n_bytes):
+        """Skip the first `n_bytes` of uncompressed data"""
+
+        if self.compression == COMPRESSION_NONE:
+            reader.seek(n_bytes)
+            return
+
+        # Compressed streams must be decompressed up to the offset
+        while n_bytes > 0:
+            data = reader.read(min(n_bytes, FILE_BUFFER_SIZE))
+            if not data:
+                break
+            n_bytes -= len(data)
+
+    def __read_chunk(self):
+        """Read and decode the next chunk of complete lines.
+
+        :returns: a tuple with the items and the number of bytes read
+        """
+        items = []
+        n_bytes = 0
+
+        while len(items) < self.chunk_size:
+            line = self.partial + self.reader.readline()
+            self.partial = b''
+
+            if not line:
+                break
+
+            if not line.endswith(b'\n') and self.follow:
+                # Keep a partial line until the rest of it is written
+                self.partial = line
+                break
+
+            n_bytes += len(line)
+
+            if line.strip():
+                items.append(self.loads(line))
+
+        return items, n_bytes
+
+    def __write_lines(self, writer, lines):
+        if not lines:
+            return
+
+        writer.write(b''.join(lines))
+        self.stats['written'] += len(lines)
+        metrics.ITEMS_WRITTEN.inc(len(lines))
+        metrics.BYTES_WRITTEN.inc(sum(len(line) for line in lines))
+
+    @staticmethod
+    def __sync(writer, fd):
+        """Flush the data written to disk"""
+
+        writer.flush()
+        fd.flush()
+        os.fsync(fd.fileno())
+
+    def __close_writer(self, writer, fd):
+        if writer is not fd:
+            # Write the end of the gzip member or zstd frame
+            writer.close()
+
+        self.__sync(fd, fd)
+        fd.close()
+
+    def __save_offset(self, offset):
+        """Store the offset of the data acknowledged"""
+
+        tmp_path = self.offset_path + '.tmp'
+
+        with open(tmp_path, 'w') as fd:
+            fd.write(str(offset))
+
+        os.replace(tmp_path, self.offset_path)
+
+    @staticmethod
+    def __guess_compression(path):
+        _, extension = os.path.splitext(path)
+        return EXTENSIONS.get(extension, COMPRESSION_NONE)
+
+    @staticmethod
+    def __orjson_dumps(item):
+        return orjson.dumps(item, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+
+    @staticmethod
+    def __json_dumps(item):
+        return json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+class FileConnectorCommand(ConnectorCommand):
+    """Class to initialize FileConnector from the command line."""
+
+    BACKEND = FileConnector
+
+    @staticmethod
+    def fill_argument_group(group):
+        """Fill the FileConnector group argument."""
+
+        group.add_argument('--file-path', dest='file_path', required=True,
+                           help="Path of the NDJSON file")
+        group.add_argument('--file-compression', dest='file_compression',
+                           choices=COMPRESSIONS, default=COMPRESSION_AUTO,
+                           help="Compression of the file (default: guessed from the extension)")
+        group.add_argument('--file-chunk-size', dest='file_chunk_size',
+                           type=int, default=FILE_CHUNK_SIZE,
+                           help="Max number of items read or written at once")
+        group.add_argument('--file-resume', dest='file_resume',
+                           action='store_true', default=FILE_RESUME,
+                           help="Resume the reading from the offset of the last items stored")
+        group.add_argument('--file-offset-path', dest='file_offset_path',
+                           help="File storing the offset (default: the file path plus .offset)")
@@ -21,7 +21,9 @@
 
 import logging
 
-from kay.connector import (Connector,
+from kay import metrics
+from kay.connector import (Checkpoint,
+                           Connector,
                            ConnectorCommand)
 
 logger = logging.getLogger(__name__)
@@ -35,14 +37,33 @@ class NoneConnector(Connector):
     async def write(self, data_queue):
         """Write data to ElasticSearch"""
 
+        written = 0
+
         while True:
             item = await data_queue.get()
 
             if item == Connector.READ_DONE:
                 break
 
+            if isinstance(item, Checkpoint):
+                self.__count(written)
+                written = 0
+                item.ack()
+            else:
+                written += 1
+
+        self.__count(written)
         data_queue.task_done()
 
+    def __count(self, written):
+        """Update the stats and metrics once per cycle"""
+
+        if not written:
+            return
+
+        self.stats['written'] += written
+        metrics.ITEMS_WRITTEN.inc(written)
+
 
 class NoneConnectorCommand(ConnectorCommand):
     """Class to initialize ESConnector from the command line."""
@@ -19,39 +19,438 @@
 # Authors:
 #     Valerio Cosentino <valcos@bitergia.com>
 
+import argparse
+import asyncio
 import logging
+import os
 import pickle
+import socket
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
 
 import redis
 
 from arthur.common import Q_STORAGE_ITEMS
 
-from kay.connector import (Connector,
+from kay import metrics
+from kay.profiler import (PROFILER,
+                          STAGE_REDIS_FETCH,
+                          STAGE_UNPICKLE)
+from kay.connector import (Checkpoint,
+                           Connector,
                            ConnectorCommand)
 
+REDIS_CHUNK_SIZE = 1000
+REDIS_WAIT_TIMEOUT = 5
+REDIS_RELIABLE = False
+REDIS_HEARTBEAT_TTL = 300
+REDIS_HEARTBEAT_INTERVAL = 60
+REDIS_DECODE_WORKERS = 0
+REDIS_DECODE_UNORDERED = False
+
+PROCESSING_SUFFIX = ':processing:'
+Q_DEAD_LETTER = Q_STORAGE_ITEMS + ':dead'
+Q_CONSUMER = Q_STORAGE_ITEMS + ':consumer:'
+Q_WRITTEN = Q_STORAGE_ITEMS + ':written'
+
+DEFAULT_QUEUES = [(Q_STORAGE_ITEMS, 1)]
+
+# Move a chunk of items from the head of KEYS[1] to the tail of KEYS[2]
+MOVE_CHUNK_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, ARGV[1] - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    for i = 1, #items, 1000 do
+        redis.call('RPUSH', KEYS[2], unpack(items, i, math.min(i + 999, #items)))
+    end
+end
+return items
+"""
+
+# Move back every item of KEYS[1] to the head of KEYS[2], keeping their order
+REQUEUE_SCRIPT = """
+local n = 0
+while redis.call('RPOPLPUSH', KEYS[1], KEYS[2]) do
+    n = n + 1
+end
+return n
+"""
+
 logger = logging.getLogger(__name__)
 
 
 class RedisConnector(Connector):
-    def __init__(self, redis_url):
+    """Connector to read items from Redis queues.
+
+    Items are popped from the queue in chunks of at most `chunk_size`
+    elements, so the memory needed to read the queue does not depend
+    on its length.
+
+    Several queues can be read, each one with a weight. Chunks are
+    popped from them with smooth weighted round robin: out of every
+    `sum(weights)` chunks, each non-empty queue gets as many as its
+    weight, interleaved. Thus, items pushed to a queue with a high
+    weight are not delayed by a long queue with a low weight.
+
+    When `wait_timeout` is set, a reading on empty queues blocks
+    (BLPOP) until an item is pushed or the timeout expires, instead
+    of returning immediately. In reliable mode, only the queue with
+    the highest weight is waited on (BLMOVE); as BLMOVE needs Redis
+    6.2, older servers are polled every `wait_timeout` seconds instead.
+    The blocking call runs in its own thread, which cannot be
+    interrupted: when the reading is cancelled, the item popped by
+    the call is pushed back to the head of its queue.
+
+    In `reliable` mode, chunks are atomically moved to a processing
+    list of the queue owned by the consumer `consumer_id`. Each chunk is followed
+    by a checkpoint in the data queue, and its items are removed from
+    the processing list only when the checkpoint is acknowledged by
+    the target. On start, the processing lists of this consumer and
+    of any consumer whose heartbeat expired are moved back to the
+    queue, so the items not written by a failed transfer are read
+    again. The heartbeat is refreshed by a background thread until
+    the connector is closed, so a consumer whose target is stalled
+    is not taken for a failed one; the same thread keeps recovering
+    the lists of the consumers whose heartbeat expires meanwhile.
+    Consumers must not share their id, so by default it is made of
+    the host name and the process id.
+
+    :param redis_url: URL of the Redis server
+    :param queues: list of (name, weight) pairs of the queues to read;
+        by default, the items queue of Arthur
+    :param chunk_size: max number of items popped from the queue at once
+    :param wait_timeout: seconds to wait for items when the queue is empty
+    :param reliable: keep the items until the target acknowledges them
+    :param consumer_id: identifier of the consumer in reliable mode;
+        by default, the host name and the process id
+    :param dead_letter_queue: name of the queue storing the items that
+        could not be written to the target
+    :param decode_workers: number of threads unpickling the items of
+        each chunk; when 0, items are unpickled in the event loop
+    :param decode_unordered: put the items in the data queue as soon
+        as their batch is unpickled, regardless of their order
+    :param worker_id: identifier of the worker process when several
+        processes share the queue; it is appended to the consumer id
+    """
+    def __init__(self, redis_url, chunk_size=REDIS_CHUNK_SIZE, wait_timeout=REDIS_WAIT_TIMEOUT,
+                 reliable=REDIS_RELIABLE, consumer_id=None, dead_letter_queue=Q_DEAD_LETTER,
+                 decode_workers=REDIS_DECODE_WORKERS, decode_unordered=REDIS_DECODE_UNORDERED,
+                 worker_id=None, queues=None):
         super().__init__("redis")
         self.url = redis_url
+        self.chunk_size = chunk_size
+        self.wait_timeout = wait_timeout
+        self.reliable = reliable
+        self.consumer_id = consumer_id if consumer_id else '%s-%s' % (socket.gethostname(),
+                                                                      os.getpid())
+        if worker_id is not None:
+            self.consumer_id += '-' + str(worker_id)
+        self.dead_letter_queue = dead_letter_queue
+        self.decode_workers = decode_workers
+        self.decode_unordered = decode_unordered
+        self.decoder = ThreadPoolExecutor(max_workers=decode_workers) if decode_workers else None
+        self.waiter = ThreadPoolExecutor(max_workers=1)
+        self.blocking_move = True
         self.conn = redis.StrictRedis.from_url(redis_url)
 
+        self.queues = queues if queues else DEFAULT_QUEUES
+        self.weights = dict(self.queues)
+        self.credits = {queue: 0 for queue in self.weights}
+
+        metrics.SOURCE_LENGTH.set_function(self.__length)
+
+        if self.reliable:
+            self.processing = {queue: queue + PROCESSING_SUFFIX + self.consumer_id
+                               for queue in self.weights}
+            self.heartbeat = Q_CONSUMER + self.consumer_id
+            self.move_chunk = self.conn.register_script(MOVE_CHUNK_SCRIPT)
+            self.requeue = self.conn.register_script(REQUEUE_SCRIPT)
+            self.recover()
+
+            self.stopped = threading.Event()
+            self.beater = threading.Thread(target=self.__keep_beating,
+                                           name='kay-heartbeat', daemon=True)
+            self.beater.start()
+
     async def read(self, data_queue):
         """Read data from Redis queue"""
 
-        pipe = self.conn.pipeline()
-        pipe.lrange(Q_STORAGE_ITEMS, 0, -1)
-        pipe.ltrim(Q_STORAGE_ITEMS, 1, 0)
-        items = pipe.execute()[0]
+        queue, items = self.__pop_chunk()
+
+        if not items and self.wait_timeout:
+            queue, items = await self.__wait_items()
+
+        while items:
+            self.stats['read'] += len(items)
+            metrics.ITEMS_READ.inc(len(items))
+            metrics.BYTES_READ.inc(sum(len(item) for item in items))
 
-        for item in items:
-            item = pickle.loads(item)
-            await data_queue.put(item)
+            if self.decoder:
+                await self.__decode(items, data_queue)
+            else:
+                for item in _decode_batch(items):
+                    await data_queue.put(item)
+
+            if self.reliable:
+                await data_queue.put(Checkpoint(self.__ack, queue, len(items)))
+
+            # Give the writer the chance to consume the chunk
+            # before the next one is popped from the queue
+            await asyncio.sleep(0)
+
+            queue, items = self.__pop_chunk()
 
         await data_queue.put(Connector.READ_DONE)
 
+    async def __decode(self, items, data_queue):
+        """Unpickle a chunk of items in the pool of decoding threads.
+
+        The chunk is split in one batch per worker. Items are put in
+        the data queue following the order of the chunk, unless
+        `decode_unordered` is set.
+        """
+        loop = asyncio.get_event_loop()
+        batch_size = -(-len(items) // self.decode_workers)
+
+        futures = [loop.run_in_executor(self.decoder, _decode_batch, items[i:i + batch_size])
+                   for i in range(0, len(items), batch_size)]
+
+        if self.decode_unordered:
+            futures = asyncio.as_completed(futures)
+
+        for future in futures:
+            for item in await future:
+                await data_queue.put(item)
+
+    def dead_letter(self, failed):
+        """Push the items that could not be written to the dead letter queue.
+
+        Each entry of the queue is a pickled dict with the `item` and
+        the `error` returned by the target.
+
+        :param failed: list of (item, error) pairs
+        """
+        pipe = self.conn.pipeline()
+
+        for item, error in failed:
+            entry = {'item': item, 'error': error}
+            pipe.rpush(self.dead_letter_queue, pickle.dumps(entry))
+
+        pipe.execute()
+
+    def recover(self, own=True):
+        """Move back to the queue the items of orphaned processing lists.
+
+        A processing list is orphaned when it belongs to this consumer
+        or when the heartbeat of its consumer has expired.
+
+        :param own: recover the lists of this consumer too
+        """
+        for queue in self.weights:
+            prefix = queue + PROCESSING_SUFFIX
+
+            for key in self.conn.scan_iter(match=prefix + '*'):
+                key = key.decode('utf-8')
+                consumer_id = key[len(prefix):]
+
+                if consumer_id == self.consumer_id:
+                    if not own:
+                        continue
+                elif self.conn.exists(Q_CONSUMER + consumer_id):
+                    continue
+
+                n_items = self.requeue(keys=[key, queue])
+
+                if n_items:
+                    logger.warning("%s items of consumer %s moved back to the queue %s",
+                                   n_items, consumer_id, queue)
+
+        self.__beat()
+
+    def close(self):
+        """Stop refreshing the heartbeat and release the waiting thread"""
+
+        self.waiter.shutdown(wait=False)
+
+        if self.reliable:
+            self.stopped.set()
+
+    def __beat(self):
+        """Signal that this consumer is alive"""
+
+        self.conn.set(self.heartbeat, 1, ex=REDIS_HEARTBEAT_TTL)
+
+    def __keep_beating(self):
+        """Refresh the heartbeat regardless of the progress of the transfer.
+
+        The lists of the consumers that failed since the start are
+        recovered too, as their processes may never be restarted.
+        """
+        while not self.stopped.wait(REDIS_HEARTBEAT_INTERVAL):
+            try:
+                self.recover(own=False)
+            except redis.RedisError as e:
+                logger.warning("Heartbeat of consumer %s not refreshed: %s", self.consumer_id, e)
+
+    def __ack(self, queue, n_items):
+        """Remove the first `n_items` from the processing list of `queue`"""
+
+        self.conn.ltrim(self.processing[queue], n_items, -1)
+        self.__beat()
+
+    def __pop_chunk(self):
+        """Pop a chunk of items from the next non-empty queue.
+
+        :returns: a tuple with the queue and its items; the items
+            list is empty when every queue is empty
+        """
+        empty = set()
+
+        while len(empty) < len(self.weights):
+            queue = self.__next_queue(empty)
+            items = self.__pop_queue_chunk(queue)
+
+            if items:
+                return queue, items
+
+            empty.add(queue)
+
+        return None, []
+
+    def __next_queue(self, skip):
+        """Choose the next queue with smooth weighted round robin"""
+
+        total = 0
+        chosen = None
+
+        for queue, weight in self.weights.items():
+            if queue in skip:
+                continue
+
+            self.credits[queue] += weight
+            total += weight
+
+            if chosen is None or self.credits[queue] > self.credits[chosen]:
+                chosen = queue
+
+        self.credits[chosen] -= total
+
+        return chosen
+
+    def __pop_queue_chunk(self, queue):
+        """Atomically pop a chunk of items from the head of `queue`"""
+
+        start = time.time()
+
+        if self.reliable:
+            self.__beat()
+            items = self.move_chunk(keys=[queue, self.processing[queue]],
+                                    args=[self.chunk_size])
+        else:
+            pipe = self.conn.pipeline()
+            pipe.lrange(queue, 0, self.chunk_size - 1)
+            pipe.ltrim(queue, self.chunk_size, -1)
+            items = pipe.execute()[0]
+
+        latency = time.time() - start
+        metrics.READ_LATENCY.observe(latency)
+        PROFILER.record(STAGE_REDIS_FETCH, latency)
+
+        return items
+
+    def __length(self):
+        """Get the number of items pending in the queues"""
+
+        pipe = self.conn.pipeline()
+        for queue in self.weights:
+            pipe.llen(queue)
+
+        return sum(pipe.execute())
+
+    async def __wait_items(self):
+        """Wait until an item is pushed to the queue or the timeout expires.
+
+        The blocking pop runs in a separate thread, so the event loop
+        keeps serving the writer in the meanwhile.
+        """
+        queues = sorted(self.weights, key=self.weights.get, reverse=True)
+
+        if self.reliable and not self.blocking_move:
+            await asyncio.sleep(self.wait_timeout)
+            return self.__pop_chunk()
+
+        if self.reliable:
+            wait = self.waiter.submit(self.__blocking_move, queues[0])
+        else:
+            wait = self.waiter.submit(self.conn.blpop, queues, self.wait_timeout)
+
+        try:
+            popped = await asyncio.wrap_future(wait)
+        except asyncio.CancelledError:
+            wait.add_done_callback(self.__give_back)
+            raise
+
+        return (popped[0].decode('utf-8'), [popped[1]]) if popped else (None, [])
+
+    def __blocking_move(self, queue):
+        """Wait for an item of `queue` and move it to the processing list"""
+
+        try:
+            item = self.conn.blmove(queue, self.processing[queue], self.wait_timeout,
+                                    'LEFT', 'RIGHT')
+        except redis.ResponseError as e:
+            logger.warning("Blocking reads not supported (Redis 6.2 needed), polling every "
+                           "%s seconds instead. Error %s", self.wait_timeout, e)
+            self.blocking_move = False
+            return None
+
+        return (queue.encode('utf-8'), item) if item else None
+
+    def __give_back(self, wait):
+        """Push back the item popped by a cancelled wait"""
+
+        if wait.cancelled() or wait.exception() or not wait.result():
+            return
+
+        queue, item = wait.result()
+        queue = queue.decode('utf-8')
+
+        if self.reliable:
+            self.conn.rpoplpush(self.processing[queue], queue)
+        else:
+            self.conn.lpush(queue, item)
+
+        logger.debug("Item popped by a cancelled wait pushed back to %s", queue)
+
+
+def parse_queue(value):
+    """Parse a queue given as `name` or `name=weight`"""
+
+    name, _, weight = value.rpartition('=')
+
+    if not name:
+        return weight, 1
+
+    try:
+        weight = int(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid weight %s of queue %s" % (weight, name))
+
+    if weight < 1:
+        raise argparse.ArgumentTypeError("weight of queue %s must be greater than 0" % name)
+
+    return name, weight
+
+
+def _decode_batch(items):
+    start = time.time()
+    items = [pickle.loads(item) for item in items]
+    PROFILER.record(STAGE_UNPICKLE, time.time() - start)
+
+    return items
+
 
 class RedisConnectorCommand(ConnectorCommand):
     """Class to initialize RedisConnector from the command line."""
@@ -63,3 +462,26 @@ class RedisConnectorCommand(ConnectorCommand):
         """Fill the RedisConnector group argument."""
 
         group.add_argument('--redis-url', dest='redis_url', help="Redis URL")
+        group.add_argument('--redis-queues', dest='redis_queues',
+                           nargs='+', type=parse_queue,
+                           help="Queues to read, as name=weight (default: %s)" % Q_STORAGE_ITEMS)
+        group.add_argument('--redis-chunk-size', dest='redis_chunk_size',
+                           type=int, default=REDIS_CHUNK_SIZE,
+                           help="Max number of items popped from the queue at once")
+        group.add_argument('--redis-wait-timeout', dest='redis_wait_timeout',
+                           type=int, default=REDIS_WAIT_TIMEOUT,
+                           help="Seconds to block waiting for items on an empty queue")
+        group.add_argument('--redis-reliable', dest='redis_reliable',
+                           action='store_true', default=REDIS_RELIABLE,
+                           help="Remove items from Redis only once they are written")
+        group.add_argument('--redis-consumer-id', dest='redis_consumer_id',
+                           help="Consumer identifier in reliable mode (default: host name and process id)")
+        group.add_argument('--redis-dead-letter-queue', dest='redis_dead_letter_queue',
+                           default=Q_DEAD_LETTER,
+                           help="Queue storing the items that could not be written")
+        group.add_argument('--redis-decode-workers', dest='redis_decode_workers',
+                           type=int, default=REDIS_DECODE_WORKERS,
+                           help="Number of threads unpickling items (0 to unpickle in the event loop)")
+        group.add_argument('--redis-decode-unordered', dest='redis_decode_unordered',
+                           action='store_true', default=REDIS_DECODE_UNORDERED,
+                           help="Do not keep the queue order when unpickling in threads")
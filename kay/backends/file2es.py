@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+
+
+import logging
+
+from kay.backend import (Backend,
+                         BackendCommand,
+                         BackendCommandArgumentParser)
+from kay.backends.connectors.file import (FileConnector,
+                                          FileConnectorCommand,
+                                          COMPRESSION_AUTO,
+                                          FILE_CHUNK_SIZE,
+                                          FILE_RESUME)
+from kay.backends.connectors.elasticsearch import (ESConnector,
+                                                   ESConnectorCommand,
+                                                   ES_TIMEOUT,
+                                                   ES_MAX_RETRIES,
+                                                   ES_RETRY_ON_TIMEOUT,
+                                                   ES_VERIFY_CERTS,
+                                                   ES_BULK_CONCURRENCY,
+                                                   ES_BULK_SIZE,
+                                                   ES_BULK_BYTES,
+                                                   ES_BULK_MAX_BYTES,
+                                                   ES_BULK_LATENCY,
+                                                   ES_REFRESH_INTERVAL,
+                                                   ES_ITEM_MAX_RETRIES,
+                                                   ES_RETRY_BACKOFF,
+                                                   ES_PARTITION_MAX_DOCS,
+                                                   ES_HTTP_COMPRESS,
+                                                   ES_KEEPALIVE_IDLE,
+                                                   ES_THROTTLE,
+                                                   ES_MAX_DOCS_RATE,
+                                                   ES_MAX_BYTES_RATE,
+                                                   ES_THROTTLE_POOL_QUEUE,
+                                                   ES_BACKFILL,
+                                                   PARTITION_BY_WALLCLOCK,
+                                                   REFRESH_END)
+from kay.dedup import (DedupCache,
+                       DEDUP_CACHE_SIZE)
+
+logger = logging.getLogger(__name__)
+
+
+class File2Es(Backend):
+    """Backend class to transfer data from a NDJSON file to an ES index."""
+
+    version = '0.1.0'
+    parallel = False
+
+    def __init__(self, file_path, es_url, es_items_type, es_index=None, es_index_alias=None,
+                 es_timeout=ES_TIMEOUT, es_max_retries=ES_MAX_RETRIES,
+                 es_retry_on_timeout=ES_RETRY_ON_TIMEOUT, es_verify_certs=ES_VERIFY_CERTS,
+                 es_bulk_concurrency=ES_BULK_CONCURRENCY, es_bulk_size=ES_BULK_SIZE,
+                 es_bulk_bytes=ES_BULK_BYTES, es_bulk_max_bytes=ES_BULK_MAX_BYTES,
+                 es_bulk_latency=ES_BULK_LATENCY, es_refresh=REFRESH_END,
+                 es_refresh_interval=ES_REFRESH_INTERVAL, es_item_max_retries=ES_ITEM_MAX_RETRIES,
+                 es_retry_backoff=ES_RETRY_BACKOFF, es_partition=None,
+                 es_partition_field=PARTITION_BY_WALLCLOCK,
+                 es_partition_max_docs=ES_PARTITION_MAX_DOCS, es_dedup=False,
+                 es_dedup_cache_size=DEDUP_CACHE_SIZE,
+                 es_http_compress=ES_HTTP_COMPRESS, es_pool_maxsize=None,
+                 es_keepalive_idle=ES_KEEPALIVE_IDLE, es_throttle=ES_THROTTLE,
+                 es_max_docs_rate=ES_MAX_DOCS_RATE, es_max_bytes_rate=ES_MAX_BYTES_RATE,
+                 es_throttle_pool_queue=ES_THROTTLE_POOL_QUEUE, es_backfill=ES_BACKFILL,
+                 file_compression=COMPRESSION_AUTO, file_chunk_size=FILE_CHUNK_SIZE,
+                 file_resume=FILE_RESUME, file_offset_path=None):
+
+        file = FileConnector(file_path, compression=file_compression,
+                             chunk_size=file_chunk_size, resume=file_resume,
+                             offset_path=file_offset_path)
+
+        dedup = DedupCache(max_size=es_dedup_cache_size) if es_dedup else None
+
+        es = ESConnector(es_url, es_items_type, es_index=es_index, es_index_alias=es_index_alias,
+                         es_timeout=es_timeout, es_max_retries=es_max_retries,
+                         es_retry_on_timeout=es_retry_on_timeout, es_verify_certs=es_verify_certs,
+                         es_bulk_concurrency=es_bulk_concurrency, es_bulk_size=es_bulk_size,
+                         es_bulk_bytes=es_bulk_bytes, es_bulk_max_bytes=es_bulk_max_bytes,
+                         es_bulk_latency=es_bulk_latency, es_refresh=es_refresh,
+                         es_refresh_interval=es_refresh_interval,
+                         es_item_max_retries=es_item_max_retries,
+                         es_retry_backoff=es_retry_backoff, es_partition=es_partition,
+                         es_partition_field=es_partition_field,
+                         es_partition_max_docs=es_partition_max_docs,
+                         es_http_compress=es_http_compress, es_pool_maxsize=es_pool_maxsize,
+                         es_keepalive_idle=es_keepalive_idle, es_throttle=es_throttle,
+                         es_max_docs_rate=es_max_docs_rate, es_max_bytes_rate=es_max_bytes_rate,
+                         es_throttle_pool_queue=es_throttle_pool_queue, es_backfill=es_backfill,
+                         dedup=dedup)
+
+        super().__init__(file, es)
+
+
+class File2EsCommand(BackendCommand):
+    """Class to run File2Es backend from the command line."""
+
+    BACKEND = File2Es
+
+    @staticmethod
+    def setup_cmd_parser():
+        """Returns the File2Es argument parser."""
+
+        parser = BackendCommandArgumentParser()
+
+        file = parser.parser.add_argument_group('File arguments')
+        FileConnectorCommand.fill_argument_group(file)
+
+        es = parser.parser.add_argument_group("ES arguments")
+        ESConnectorCommand.fill_argument_group(es)
+
+        return parser
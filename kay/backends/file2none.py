@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+
+
+
+
+import logging
+
+from kay.backend import (Backend,
+                         BackendCommand,
+                         BackendCommandArgumentParser)
+from kay.backends.connectors.file import (FileConnector,
+                                          FileConnectorCommand,
+                                          COMPRESSION_AUTO,
+                                          FILE_CHUNK_SIZE,
+                                          FILE_RESUME)
+from kay.backends.connectors.none import (NoneConnector,
+                                          NoneConnectorCommand)
+
+logger = logging.getLogger(__name__)
+
+
+class File2None(Backend):
+    """Backend class to read a NDJSON file with no target."""
+
+    version = '0.1.0'
+    parallel = False
+
+    def __init__(self, file_path, file_compression=COMPRESSION_AUTO,
+                 file_chunk_size=FILE_CHUNK_SIZE, file_resume=FILE_RESUME,
+                 file_offset_path=None):
+
+        file = FileConnector(file_path, compression=file_compression,
+                             chunk_size=file_chunk_size, resume=file_resume,
+                             offset_path=file_offset_path)
+        none = NoneConnector()
+
+        super().__init__(file, none)
+
+
+class File2NoneCommand(BackendCommand):
+    """Class to run File2None backend from the command line."""
+
+    BACKEND = File2None
+
+    @staticmethod
+    def setup_cmd_parser():
+        """Returns the File2None argument parser."""
+
+        parser = BackendCommandArgumentParser()
+
+        file = parser.parser.add_argument_group('File arguments')
+        FileConnectorCommand.fill_argument_group(file)
+
+        return parser
@@ -26,13 +26,43 @@ from kay.backend import (Backend,
                          BackendCommand,
                          BackendCommandArgumentParser)
 from kay.backends.connectors.redis import (RedisConnector,
-                                           RedisConnectorCommand)
+                                           RedisConnectorCommand,
+                                           REDIS_CHUNK_SIZE,
+                                           REDIS_WAIT_TIMEOUT,
+                                           REDIS_RELIABLE,
+                                           REDIS_DECODE_WORKERS,
+                                           REDIS_DECODE_UNORDERED,
+                                           Q_DEAD_LETTER,
+                                           Q_WRITTEN)
 from kay.backends.connectors.elasticsearch import (ESConnector,
                                                    ESConnectorCommand,
                                                    ES_TIMEOUT,
                                                    ES_MAX_RETRIES,
                                                    ES_RETRY_ON_TIMEOUT,
-                                                   ES_VERIFY_CERTS)
+                                                   ES_VERIFY_CERTS,
+                                                   ES_BULK_CONCURRENCY,
+                                                   ES_BULK_SIZE,
+                                                   ES_BULK_BYTES,
+                                                   ES_BULK_MAX_BYTES,
+                                                   ES_BULK_LATENCY,
+                                                   ES_REFRESH_INTERVAL,
+                                                   ES_ITEM_MAX_RETRIES,
+                                                   ES_RETRY_BACKOFF,
+                                                   ES_PARTITION_MAX_DOCS,
+                                                   ES_HTTP_COMPRESS,
+                                                   ES_KEEPALIVE_IDLE,
+                                                   ES_THROTTLE,
+                                                   ES_MAX_DOCS_RATE,
+                                                   ES_MAX_BYTES_RATE,
+                                                   ES_THROTTLE_POOL_QUEUE,
+                                                   ES_BACKFILL,
+                                                   PARTITION_BY_WALLCLOCK,
+                                                   REFRESH_END)
+from kay.dedup import (DedupCache,
+                       DEDUP_CACHE_SIZE,
+                       DEDUP_PERSIST_SIZE,
+                       DEDUP_PERSIST_TTL,
+                       dedup_key)
 
 logger = logging.getLogger(__name__)
 
@@ -44,12 +74,61 @@ class Redis2Es(Backend):
 
     def __init__(self, redis_url, es_url, es_items_type, es_index=None, es_index_alias=None,
                  es_timeout=ES_TIMEOUT, es_max_retries=ES_MAX_RETRIES,
-                 es_retry_on_timeout=ES_RETRY_ON_TIMEOUT, es_verify_certs=ES_VERIFY_CERTS):
+                 es_retry_on_timeout=ES_RETRY_ON_TIMEOUT, es_verify_certs=ES_VERIFY_CERTS,
+                 es_bulk_concurrency=ES_BULK_CONCURRENCY, es_bulk_size=ES_BULK_SIZE,
+                 es_bulk_bytes=ES_BULK_BYTES, es_bulk_max_bytes=ES_BULK_MAX_BYTES,
+                 es_bulk_latency=ES_BULK_LATENCY, es_refresh=REFRESH_END,
+                 es_refresh_interval=ES_REFRESH_INTERVAL, es_item_max_retries=ES_ITEM_MAX_RETRIES,
+                 es_retry_backoff=ES_RETRY_BACKOFF, es_partition=None,
+                 es_partition_field=PARTITION_BY_WALLCLOCK,
+                 es_partition_max_docs=ES_PARTITION_MAX_DOCS, es_dedup=False,
+                 es_dedup_cache_size=DEDUP_CACHE_SIZE, es_dedup_persist=False,
+                 es_dedup_persist_size=DEDUP_PERSIST_SIZE,
+                 es_dedup_persist_ttl=DEDUP_PERSIST_TTL,
+                 es_http_compress=ES_HTTP_COMPRESS, es_pool_maxsize=None,
+                 es_keepalive_idle=ES_KEEPALIVE_IDLE, es_throttle=ES_THROTTLE,
+                 es_max_docs_rate=ES_MAX_DOCS_RATE, es_max_bytes_rate=ES_MAX_BYTES_RATE,
+                 es_throttle_pool_queue=ES_THROTTLE_POOL_QUEUE, es_backfill=ES_BACKFILL,
+                 redis_chunk_size=REDIS_CHUNK_SIZE,
+                 redis_wait_timeout=REDIS_WAIT_TIMEOUT, redis_reliable=REDIS_RELIABLE,
+                 redis_consumer_id=None, redis_dead_letter_queue=Q_DEAD_LETTER,
+                 redis_decode_workers=REDIS_DECODE_WORKERS,
+                 redis_decode_unordered=REDIS_DECODE_UNORDERED, redis_queues=None,
+                 worker_id=None):
+
+        redis = RedisConnector(redis_url, chunk_size=redis_chunk_size,
+                               wait_timeout=redis_wait_timeout, reliable=redis_reliable,
+                               consumer_id=redis_consumer_id,
+                               dead_letter_queue=redis_dead_letter_queue,
+                               decode_workers=redis_decode_workers,
+                               decode_unordered=redis_decode_unordered,
+                               worker_id=worker_id, queues=redis_queues)
+
+        dedup = None
+        if es_dedup:
+            dedup = DedupCache(max_size=es_dedup_cache_size,
+                               conn=redis.conn if es_dedup_persist else None,
+                               key=dedup_key(Q_WRITTEN, es_url, es_items_type,
+                                             es_index, es_index_alias),
+                               persist_size=es_dedup_persist_size,
+                               persist_ttl=es_dedup_persist_ttl)
 
-        redis = RedisConnector(redis_url)
         es = ESConnector(es_url, es_items_type, es_index=es_index, es_index_alias=es_index_alias,
                          es_timeout=es_timeout, es_max_retries=es_max_retries,
-                         es_retry_on_timeout=es_retry_on_timeout, es_verify_certs=es_verify_certs)
+                         es_retry_on_timeout=es_retry_on_timeout, es_verify_certs=es_verify_certs,
+                         es_bulk_concurrency=es_bulk_concurrency, es_bulk_size=es_bulk_size,
+                         es_bulk_bytes=es_bulk_bytes, es_bulk_max_bytes=es_bulk_max_bytes,
+                         es_bulk_latency=es_bulk_latency, es_refresh=es_refresh,
+                         es_refresh_interval=es_refresh_interval,
+                         es_item_max_retries=es_item_max_retries,
+                         es_retry_backoff=es_retry_backoff, es_partition=es_partition,
+                         es_partition_field=es_partition_field,
+                         es_partition_max_docs=es_partition_max_docs,
+                         es_http_compress=es_http_compress, es_pool_maxsize=es_pool_maxsize,
+                         es_keepalive_idle=es_keepalive_idle, es_throttle=es_throttle,
+                         es_max_docs_rate=es_max_docs_rate, es_max_bytes_rate=es_max_bytes_rate,
+                         es_throttle_pool_queue=es_throttle_pool_queue, es_backfill=es_backfill,
+                         dead_letter=redis.dead_letter, dedup=dedup)
 
         super().__init__(redis, es)
 
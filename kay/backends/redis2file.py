@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+
+
+
+
+import logging
+
+from kay.backend import (Backend,
+                         BackendCommand,
+                         BackendCommandArgumentParser)
+from kay.backends.connectors.redis import (RedisConnector,
+                                           RedisConnectorCommand,
+                                           REDIS_CHUNK_SIZE,
+                                           REDIS_WAIT_TIMEOUT,
+                                           REDIS_RELIABLE,
+                                           REDIS_DECODE_WORKERS,
+                                           REDIS_DECODE_UNORDERED)
+from kay.backends.connectors.file import (FileConnector,
+                                          FileConnectorCommand,
+                                          COMPRESSION_AUTO,
+                                          FILE_CHUNK_SIZE)
+
+logger = logging.getLogger(__name__)
+
+
+class Redis2File(Backend):
+    """Backend class to archive the items of a redis queue in a NDJSON file."""
+
+    version = '0.1.0'
+    parallel = False
+
+    def __init__(self, redis_url, file_path, file_compression=COMPRESSION_AUTO,
+                 file_chunk_size=FILE_CHUNK_SIZE, redis_chunk_size=REDIS_CHUNK_SIZE,
+                 redis_wait_timeout=REDIS_WAIT_TIMEOUT, redis_reliable=REDIS_RELIABLE,
+                 redis_consumer_id=None, redis_decode_workers=REDIS_DECODE_WORKERS,
+                 redis_decode_unordered=REDIS_DECODE_UNORDERED, redis_queues=None,
+                 worker_id=None):
+
+        redis = RedisConnector(redis_url, chunk_size=redis_chunk_size,
+                               wait_timeout=redis_wait_timeout, reliable=redis_reliable,
+                               consumer_id=redis_consumer_id,
+                               decode_workers=redis_decode_workers,
+                               decode_unordered=redis_decode_unordered,
+                               worker_id=worker_id, queues=redis_queues)
+        file = FileConnector(file_path, compression=file_compression,
+                             chunk_size=file_chunk_size)
+
+        super().__init__(redis, file)
+
+
+class Redis2FileCommand(BackendCommand):
+    """Class to run Redis2File backend from the command line."""
+
+    BACKEND = Redis2File
+
+    @staticmethod
+    def setup_cmd_parser():
+        """Returns the Redis2File argument parser."""
+
+        parser = BackendCommandArgumentParser()
+
+        redis = parser.parser.add_argument_group('Redis arguments')
+        RedisConnectorCommand.fill_argument_group(redis)
+
+        file = parser.parser.add_argument_group('File arguments')
+        FileConnectorCommand.fill_argument_group(file)
+
+        return parser
@@ -26,7 +26,12 @@ from kay.backend import (Backend,
                          BackendCommand,
                          BackendCommandArgumentParser)
 from kay.backends.connectors.redis import (RedisConnector,
-                                           RedisConnectorCommand)
+                                           RedisConnectorCommand,
+                                           REDIS_CHUNK_SIZE,
+                                           REDIS_WAIT_TIMEOUT,
+                                           REDIS_RELIABLE,
+                                           REDIS_DECODE_WORKERS,
+                                           REDIS_DECODE_UNORDERED)
 from kay.backends.connectors.none import (NoneConnector,
                                           NoneConnectorCommand)
 
@@ -38,9 +43,18 @@ class Redis2None(Backend):
 
     version = '0.1.0'
 
-    def __init__(self, redis_url):
-
-        redis = RedisConnector(redis_url)
+    def __init__(self, redis_url, redis_chunk_size=REDIS_CHUNK_SIZE,
+                 redis_wait_timeout=REDIS_WAIT_TIMEOUT, redis_reliable=REDIS_RELIABLE,
+                 redis_consumer_id=None, redis_decode_workers=REDIS_DECODE_WORKERS,
+                 redis_decode_unordered=REDIS_DECODE_UNORDERED, redis_queues=None,
+                 worker_id=None):
+
+        redis = RedisConnector(redis_url, chunk_size=redis_chunk_size,
+                               wait_timeout=redis_wait_timeout, reliable=redis_reliable,
+                               consumer_id=redis_consumer_id,
+                               decode_workers=redis_decode_workers,
+                               decode_unordered=redis_decode_unordered,
+                               worker_id=worker_id, queues=redis_queues)
         none = NoneConnector()
 
         super().__init__(redis, none)
@@ -19,6 +19,8 @@
 # Authors:
 #     Valerio Cosentino <valcos@bitergia.com>
 
+import collections
+
 
 class Connector:
     """Abstract class for connectors.
@@ -26,12 +28,49 @@ class Connector:
     Base class to connect to data storages, which can span from Redis servers
     and ElasticSearch to generators and files.
 
+    Connectors count the items they process in `stats`.
+
+    When `wait_outages` is set (e.g., when the items read are buffered
+    to disk), target connectors keep waiting for their storage while
+    it is unavailable, instead of failing. When `follow` is set (i.e.,
+    the transfer is kept alive), source connectors expect more data to
+    be added to their storage after each reading.
+
     :param source: path of the data source (e.g., http link, file path)
     """
     READ_DONE = "read_done"
 
     def __init__(self, source):
         self.source = source
+        self.stats = collections.Counter()
+        self.wait_outages = False
+        self.follow = False
+
+    def close(self):
+        """Release the resources of the connector at the end of a transfer"""
+
+        pass
+
+
+class Checkpoint:
+    """Marker to acknowledge the data read by a source connector.
+
+    Source connectors put checkpoints in the data queue right after
+    the items they cover. Target connectors call `ack` once every item
+    placed before a checkpoint has been stored, so the source storage
+    can safely forget them.
+
+    :param callback: function called when the checkpoint is acknowledged
+    :param args: arguments passed to `callback`
+    """
+    def __init__(self, callback, *args):
+        self.callback = callback
+        self.args = args
+
+    def ack(self):
+        """Acknowledge the items preceding this checkpoint"""
+
+        self.callback(*self.args)
 
 
 class ConnectorCommand:
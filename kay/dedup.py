@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import collections
+import threading
+import urllib.parse
+
+DEDUP_CACHE_SIZE = 1000000
+DEDUP_PERSIST_SIZE = 10000000
+DEDUP_PERSIST_TTL = 30 * 24 * 60 * 60
+
+
+def dedup_key(prefix, url, *targets):
+    """Build the Redis key of the versions written to a target.
+
+    The key is scoped by the host and port of `url`, leaving out its
+    credentials, and by the names in `targets` (e.g., index and alias),
+    so different clusters and indexes do not share their versions.
+    """
+    url = urllib.parse.urlsplit(url)
+    location = '%s:%s' % (url.hostname, url.port) if url.port else url.hostname
+
+    return ':'.join([prefix, location] + [target for target in targets if target])
+
+
+class DedupCache:
+    """Remember the version of the items already written.
+
+    Items are identified by their `uuid` and versioned by their
+    `updated_on`, so an item whose version was already written can be
+    skipped. Versions may be scoped (e.g., by the index where the item
+    is written), so the version written to a scope does not apply to
+    the others. The versions are kept in a LRU cache of at most `max_size`
+    items. When a Redis connection is given, they are also stored in
+    the hash `key`, so they survive restarts and are shared among
+    processes; the hash is only read for the items missing in the cache.
+
+    The persisted versions are split in generations, each one stored in
+    its own hash (`key:<generation>`). Once the current generation holds
+    half of `persist_size` items a new one is started, and the one
+    before the previous is deleted. Only the current and the previous
+    generations are read, and every hash expires after `persist_ttl`
+    seconds without writes.
+
+    :param max_size: max number of items of the cache
+    :param conn: Redis connection to persist the versions
+    :param key: prefix of the Redis hashes storing the versions
+    :param persist_size: max number of items persisted
+    :param persist_ttl: seconds to keep the persisted versions
+    """
+    def __init__(self, max_size=DEDUP_CACHE_SIZE, conn=None, key=None,
+                 persist_size=DEDUP_PERSIST_SIZE, persist_ttl=DEDUP_PERSIST_TTL):
+        self.max_size = max_size
+        self.conn = conn
+        self.key = key
+        self.persist_size = persist_size
+        self.persist_ttl = persist_ttl
+        self.cache = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def filter(self, items, scopes=None):
+        """Select the items that must be written.
+
+        Duplicates in `items` are collapsed into the occurrence with
+        the highest version (the last one, on ties or when any of them
+        has no version), and items whose version was already written
+        are dropped.
+
+        :param items: list of items
+        :param scopes: list with the scope of each item, if any
+
+        :returns: the sorted positions of the items to write
+        """
+        fields = self.__fields(items, scopes)
+
+        latest = {}
+        for position, item in enumerate(items):
+            kept = latest.get(fields[position])
+
+            if kept is None or not self.__is_older(item, items[kept]):
+                latest[fields[position]] = position
+
+        selected = []
+        unknown = []
+
+        with self.lock:
+            for field, position in latest.items():
+                version = items[position].get('updated_on')
+                written = self.cache.get(field)
+
+                if version is None or (written is not None and written != version):
+                    selected.append(position)
+                elif written is None:
+                    unknown.append(position)
+                else:
+                    self.cache.move_to_end(field)
+
+        if unknown and self.conn:
+            names = [fields[position] for position in unknown]
+            generation = self.__generation()
+
+            pipe = self.conn.pipeline(transaction=False)
+            pipe.hmget(self.__hash(generation), names)
+            pipe.hmget(self.__hash(generation - 1), names)
+            current, previous = pipe.execute()
+
+            for position, written, older in zip(unknown, current, previous):
+                version = items[position]['updated_on']
+                written = written if written is not None else older
+
+                if written is not None and float(written) == version:
+                    self.__add([(fields[position], version)])
+                else:
+                    selected.append(position)
+        else:
+            selected.extend(unknown)
+
+        return sorted(selected)
+
+    def mark(self, items, scopes=None):
+        """Remember the version of the items written.
+
+        :param items: list of items
+        :param scopes: list with the scope of each item, if any
+        """
+        versions = [(field, item['updated_on'])
+                    for field, item in zip(self.__fields(items, scopes), items)
+                    if item.get('updated_on') is not None]
+
+        self.__add(versions)
+
+        if self.conn and versions:
+            generation = self.__generation()
+            name = self.__hash(generation)
+
+            pipe = self.conn.pipeline(transaction=False)
+            pipe.hset(name, mapping={field: repr(version) for field, version in versions})
+            pipe.expire(name, self.persist_ttl)
+            pipe.expire(self.__generation_key, self.persist_ttl)
+            pipe.hlen(name)
+            n_items = pipe.execute()[-1]
+
+            if n_items >= self.persist_size // 2:
+                self.__rotate(generation)
+
+    @staticmethod
+    def __fields(items, scopes):
+        """Identify each item by its scope, when given, plus its uuid"""
+
+        if scopes is None:
+            return [item['uuid'] for item in items]
+
+        return ['%s:%s' % (scope, item['uuid']) for scope, item in zip(scopes, items)]
+
+    @staticmethod
+    def __is_older(item, other):
+        version, other_version = item.get('updated_on'), other.get('updated_on')
+
+        return version is not None and other_version is not None and version < other_version
+
+    @property
+    def __generation_key(self):
+        return self.key + ':generation'
+
+    def __generation(self):
+        return int(self.conn.get(self.__generation_key) or 0)
+
+    def __hash(self, generation):
+        return '%s:%d' % (self.key, generation)
+
+    def __rotate(self, generation):
+        """Start a new generation unless another process already did"""
+
+        def rotate(pipe):
+            if int(pipe.get(self.__generation_key) or 0) != generation:
+                return
+
+            pipe.multi()
+            pipe.set(self.__generation_key, generation + 1, ex=self.persist_ttl)
+            pipe.delete(self.__hash(generation - 1))
+
+        self.conn.transaction(rotate, self.__generation_key)
+
+    def __add(self, versions):
+        with self.lock:
+            for field, version in versions:
+                self.cache[field] = version
+                self.cache.move_to_end(field)
+
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
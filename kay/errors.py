@@ -41,3 +41,9 @@ class ElasticError(BaseError):
     """Generic error for elastic error"""
 
     message = "%(cause)s"
+
+
+class WorkerError(BaseError):
+    """Error raised when a worker keeps failing"""
+
+    message = "worker %(worker_id)s failed %(failures)s times in a row"
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import bisect
+import logging
+import threading
+
+from http.server import (BaseHTTPRequestHandler,
+                         ThreadingHTTPServer)
+
+logger = logging.getLogger(__name__)
+
+
+METRICS_HOST = '127.0.0.1'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Metric:
+    """Abstract class for metrics.
+
+    Metrics are updated once per chunk or bulk, not per item, so
+    keeping them costs a lock acquisition on the hot path.
+
+    :param name: name of the metric
+    :param documentation: description of the metric
+    """
+    TYPE = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.lock = threading.Lock()
+
+    def expose(self):
+        """Get the metric in Prometheus text format"""
+
+        lines = ["# HELP %s %s" % (self.name, self.documentation),
+                 "# TYPE %s %s" % (self.name, self.TYPE)]
+        lines.extend("%s %s" % (name, _format(value)) for name, value in self.samples())
+
+        return '\n'.join(lines)
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Metric whose value only increases"""
+
+    TYPE = 'counter'
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self):
+        return [(self.name, self.value)]
+
+
+class Gauge(Metric):
+    """Metric whose value goes up and down.
+
+    The value can be set directly or computed by a function each
+    time the metric is exposed.
+    """
+    TYPE = 'gauge'
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        self.function = function
+
+    def samples(self):
+        value = self.value
+
+        if self.function:
+            try:
+                value = self.function()
+            except Exception as e:
+                logger.debug("Gauge %s not available: %s", self.name, e)
+                return []
+
+        return [(self.name, value)]
+
+
+class Histogram(Metric):
+    """Metric that counts observations in cumulative buckets.
+
+    :param buckets: sorted upper bounds of the buckets
+    """
+    TYPE = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        position = bisect.bisect_left(self.buckets, value)
+
+        with self.lock:
+            self.counts[position] += 1
+            self.sum += value
+
+    def samples(self):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+
+        samples = []
+        accumulated = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            accumulated += count
+            samples.append(('%s_bucket{le="%s"}' % (self.name, bound), accumulated))
+
+        samples.append((self.name + '_sum', total))
+        samples.append((self.name + '_count', accumulated))
+
+        return samples
+
+
+class Registry:
+    """Collection of the metrics exposed by Kay"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self):
+        """Get every metric in Prometheus text format"""
+
+        return '\n'.join(metric.expose() for metric in self.metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+ITEMS_READ = REGISTRY.register(
+    Counter('kay_items_read_total', "Items read from the source storage"))
+BYTES_READ = REGISTRY.register(
+    Counter('kay_bytes_read_total', "Bytes read from the source storage"))
+ITEMS_WRITTEN = REGISTRY.register(
+    Counter('kay_items_written_total', "Items written to the target storage"))
+ITEMS_FAILED = REGISTRY.register(
+    Counter('kay_items_failed_total', "Items that could not be written to the target storage"))
+ITEMS_SKIPPED = REGISTRY.register(
+    Counter('kay_items_skipped_total', "Items not written because they were already stored"))
+ITEMS_FILTERED = REGISTRY.register(
+    Counter('kay_items_filtered_total', "Items dropped by the transforms"))
+BYTES_WRITTEN = REGISTRY.register(
+    Counter('kay_bytes_written_total', "Bytes sent to the target storage"))
+ITEMS_RETRIED = REGISTRY.register(
+    Counter('kay_items_retried_total', "Items whose writing was retried"))
+READ_LATENCY = REGISTRY.register(
+    Histogram('kay_read_latency_seconds', "Time to read a chunk from the source storage"))
+BULK_LATENCY = REGISTRY.register(
+    Histogram('kay_bulk_latency_seconds', "Time to send a bulk to the target storage"))
+BULK_SIZE = REGISTRY.register(
+    Histogram('kay_bulk_size_items', "Number of items of the bulks", buckets=SIZE_BUCKETS))
+QUEUE_DEPTH = REGISTRY.register(
+    Gauge('kay_queue_depth', "Items waiting in the queue between reader and writer"))
+SOURCE_LENGTH = REGISTRY.register(
+    Gauge('kay_source_queue_length', "Items pending in the source queue"))
+ITEMS_SPILLED = REGISTRY.register(
+    Counter('kay_items_spilled_total', "Items spilled to disk because the queue was full"))
+SPILL_BYTES = REGISTRY.register(
+    Gauge('kay_spill_bytes', "Bytes of the items waiting on disk"))
+THROTTLE_RATE = REGISTRY.register(
+    Gauge('kay_throttle_docs_rate', "Max documents per second written to the target storage"))
+THROTTLE_SECONDS = REGISTRY.register(
+    Counter('kay_throttle_seconds_total', "Seconds the writing was paused by the throttler"))
+
+
+class MetricsServer:
+    """HTTP server exposing the metrics in Prometheus text format.
+
+    The server runs in a daemon thread, so it does not interfere
+    with the transfer.
+
+    :param port: port to listen on
+    :param host: address to listen on
+    :param registry: metrics to expose
+    """
+    def __init__(self, port, host=METRICS_HOST, registry=REGISTRY):
+        handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry})
+
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       name='kay-metrics', daemon=True)
+
+    def start(self):
+        self.thread.start()
+        logger.info("Metrics available at http://%s:%s/metrics", *self.httpd.server_address)
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        body = self.registry.expose().encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _format(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import cProfile
+import collections
+import resource
+import threading
+import time
+import tracemalloc
+
+STAGE_REDIS_FETCH = 'redis fetch'
+STAGE_UNPICKLE = 'unpickle'
+STAGE_TRANSFORM = 'transform'
+STAGE_BULK_BUILD = 'bulk build'
+STAGE_ES_REQUEST = 'es request'
+STAGE_REFRESH = 'refresh'
+
+STAGES = [STAGE_REDIS_FETCH, STAGE_UNPICKLE, STAGE_TRANSFORM,
+          STAGE_BULK_BUILD, STAGE_ES_REQUEST, STAGE_REFRESH]
+
+TRACEMALLOC_FRAMES = 10
+TRACEMALLOC_TOP = 50
+
+
+class Profiler:
+    """Collect the timings of the stages of a transfer.
+
+    Stages record how long each of their runs (e.g., fetching a chunk,
+    sending a bulk) took. Timings are dropped unless the profiler is
+    enabled, so recording them costs almost nothing otherwise.
+
+    When a dump path is given, the main thread is profiled with
+    cProfile and the memory allocations are traced with tracemalloc.
+    The results are written to `<dump>.prof` and `<dump>.mem`.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.dump = None
+        self.timings = collections.defaultdict(list)
+        self.lock = threading.Lock()
+        self.start_time = None
+        self.end_time = None
+        self.cprofile = None
+
+    def enable(self, dump=None):
+        """Enable the profiler.
+
+        :param dump: path prefix of the cProfile and tracemalloc dumps
+        """
+        self.enabled = True
+        self.dump = dump
+
+    def record(self, stage, seconds):
+        """Record the time spent on a run of `stage`"""
+
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.timings[stage].append(seconds)
+
+    def start(self):
+        self.start_time = time.time()
+
+        if self.dump:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def stop(self):
+        self.end_time = time.time()
+
+        if not self.cprofile:
+            return
+
+        self.cprofile.disable()
+        self.cprofile.dump_stats(self.dump + '.prof')
+
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        with open(self.dump + '.mem', 'w') as fd:
+            fd.write("Peak traced memory: %s\n\n" % _format_bytes(peak))
+            for stat in snapshot.statistics('traceback')[:TRACEMALLOC_TOP]:
+                fd.write("%s\n" % stat)
+                fd.write('\n'.join(stat.traceback.format()) + '\n\n')
+
+    def summary(self, stats):
+        """Build the report of the transfer.
+
+        :param stats: counters of the items processed by the transfer
+
+        :returns: a string with the throughput, the p50/p99 of each
+            stage and the peak memory
+        """
+        elapsed = max(self.end_time - self.start_time, 1e-9)
+
+        lines = ["Transfer finished in %.2f seconds" % elapsed]
+
+        for counter in ('read', 'written', 'skipped', 'failed'):
+            lines.append("  items %-8s %10d (%.1f items/sec)"
+                         % (counter, stats[counter], stats[counter] / elapsed))
+
+        lines.append("  %-12s %8s %10s %10s %10s" % ('stage', 'runs', 'total(s)', 'p50(ms)', 'p99(ms)'))
+        for stage in STAGES:
+            timings = sorted(self.timings.get(stage, []))
+            if not timings:
+                continue
+
+            lines.append("  %-12s %8d %10.2f %10.2f %10.2f"
+                         % (stage, len(timings), sum(timings),
+                            _percentile(timings, 0.5) * 1000,
+                            _percentile(timings, 0.99) * 1000))
+
+        # ru_maxrss is given in kilobytes
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        lines.append("  peak memory %s" % _format_bytes(peak))
+
+        if self.dump:
+            lines.append("  profile written to %s.prof and %s.mem" % (self.dump, self.dump))
+
+        return '\n'.join(lines)
+
+
+PROFILER = Profiler()
+
+
+def _percentile(timings, percentile):
+    return timings[int(round(percentile * (len(timings) - 1)))]
+
+
+def _format_bytes(n_bytes):
+    return "%.1f MB" % (n_bytes / (1024 * 1024))
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import asyncio
+import collections
+import logging
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+
+from kay import metrics
+from kay.connector import Checkpoint
+
+logger = logging.getLogger(__name__)
+
+
+SPILL_MAX_BYTES = 1024 * 1024 * 1024
+SPILL_SEGMENT_BYTES = 64 * 1024 * 1024
+SPILL_READ_CHUNK = 1000
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+
+# Each record starts with its kind and the length of its payload
+RECORD_HEADER = struct.Struct('<BI')
+RECORD_ITEM = 0
+RECORD_MARKER = 1
+
+
+class SpillQueue:
+    """Queue that spills to disk the items exceeding its size.
+
+    The queue keeps up to `maxsize` items in memory. When it is full,
+    new items are appended to a log of segment files on disk instead
+    of blocking the producer, so bursts and outages of the consumer
+    are absorbed at constant memory. Once something is spilled, every
+    new item goes to the log until it is drained, so items are always
+    consumed in the order they were put. Segments are deleted as soon
+    as they are consumed.
+
+    Items are pickled in the log. Checkpoints must be acknowledged on
+    the connector that created them, so they stay in memory and only
+    a reference to them is written.
+
+    The producer is paused when the log reaches `max_bytes`. The log
+    lives in a temporary directory under `path` that is removed when
+    the queue is closed, even if some items were not written (e.g.,
+    when the transfer aborts): items not acknowledged to the source
+    storage are read again by a new transfer.
+
+    The interface is the subset of `asyncio.Queue` used by connectors.
+
+    :param maxsize: max number of items kept in memory
+    :param path: directory where the log is created
+    :param max_bytes: max size of the log
+    :param segment_bytes: size after which a new segment is started
+    """
+    def __init__(self, maxsize, path, max_bytes=SPILL_MAX_BYTES,
+                 segment_bytes=SPILL_SEGMENT_BYTES):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.dir = tempfile.mkdtemp(prefix='kay-spill-', dir=path)
+        self.memory = collections.deque()
+        self.segments = collections.deque()
+        self.markers = {}
+        self.n_segments = 0
+        self.n_markers = 0
+        self.spilled = 0
+        self.spilled_bytes = 0
+        self.unfinished = 0
+        self.changed = asyncio.Condition()
+
+        logger.info("Spilling items to %s", self.dir)
+
+    def qsize(self):
+        return len(self.memory) + self.spilled
+
+    def empty(self):
+        return self.qsize() == 0
+
+    async def put(self, item):
+        """Put an item, spilling it when the memory is full"""
+
+        async with self.changed:
+            if not self.spilled and len(self.memory) < self.maxsize:
+                self.memory.append(item)
+            else:
+                await self.changed.wait_for(lambda: self.spilled_bytes < self.max_bytes)
+                self.__spill(item)
+
+            self.unfinished += 1
+            self.changed.notify_all()
+
+    async def get(self):
+        """Remove and return the oldest item"""
+
+        async with self.changed:
+            await self.changed.wait_for(lambda: not self.empty())
+
+            if not self.memory:
+                self.__load()
+
+            item = self.memory.popleft()
+            self.changed.notify_all()
+
+        return item
+
+    def task_done(self):
+        if self.unfinished <= 0:
+            raise ValueError("task_done() called too many times")
+
+        self.unfinished -= 1
+
+    def close(self):
+        """Remove the log from disk"""
+
+        for segment in self.segments:
+            segment.close()
+        self.segments.clear()
+
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __spill(self, item):
+        """Append an item to the last segment of the log"""
+
+        if isinstance(item, Checkpoint):
+            self.n_markers += 1
+            self.markers[self.n_markers] = item
+            payload = struct.pack('<Q', self.n_markers)
+            kind = RECORD_MARKER
+        else:
+            payload = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+            kind = RECORD_ITEM
+
+        if not self.segments or self.segments[-1].size >= self.segment_bytes:
+            self.n_segments += 1
+            path = os.path.join(self.dir, SEGMENT_PREFIX + '%08d' % self.n_segments + SEGMENT_SUFFIX)
+            self.segments.append(_Segment(path))
+
+        n_bytes = self.segments[-1].append(kind, payload)
+
+        self.spilled += 1
+        self.spilled_bytes += n_bytes
+        metrics.ITEMS_SPILLED.inc()
+        metrics.SPILL_BYTES.set(self.spilled_bytes)
+
+    def __load(self):
+        """Move the oldest items of the log to memory"""
+
+        segment = self.segments[0]
+
+        for kind, payload, n_bytes in segment.read(min(SPILL_READ_CHUNK, self.maxsize)):
+            if kind == RECORD_MARKER:
+                item = self.markers.pop(struct.unpack('<Q', payload)[0])
+            else:
+                item = pickle.loads(payload)
+
+            self.memory.append(item)
+            self.spilled -= 1
+            self.spilled_bytes -= n_bytes
+
+        if segment.consumed:
+            segment.close()
+            os.remove(segment.path)
+            self.segments.popleft()
+
+        metrics.SPILL_BYTES.set(self.spilled_bytes)
+
+
+class _Segment:
+    """Append-only file of records"""
+
+    def __init__(self, path):
+        self.path = path
+        self.writer = open(path, 'wb')
+        self.reader = open(path, 'rb')
+        self.size = 0
+        self.written = 0
+        self.read_records = 0
+
+    @property
+    def consumed(self):
+        return self.read_records == self.written
+
+    def append(self, kind, payload):
+        record = RECORD_HEADER.pack(kind, len(payload)) + payload
+        self.writer.write(record)
+        self.size += len(record)
+        self.written += 1
+
+        return len(record)
+
+    def read(self, n_records):
+        """Read up to `n_records` records not read yet"""
+
+        self.writer.flush()
+
+        records = []
+        while len(records) < n_records and not self.consumed:
+            kind, length = RECORD_HEADER.unpack(self.reader.read(RECORD_HEADER.size))
+            records.append((kind, self.reader.read(length), RECORD_HEADER.size + length))
+            self.read_records += 1
+
+        return records
+
+    def close(self):
+        self.writer.close()
+        self.reader.close()
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import argparse
+import fnmatch
+import logging
+import time
+
+from kay import metrics
+from kay.profiler import (PROFILER,
+                          STAGE_TRANSFORM)
+
+logger = logging.getLogger(__name__)
+
+
+TRANSFORM_BATCH_SIZE = 1000
+
+DATA_FIELD = 'data'
+TRUNCATED_SUFFIX = '...'
+
+
+class Transform:
+    """Abstract class for transforms.
+
+    Transforms modify batches of items between the source and the
+    target storages. They may change the items in place or drop them.
+
+    :param arg: argument of the transform given in the command line
+    """
+    NAME = None
+
+    def __init__(self, arg):
+        self.arg = arg
+
+    def apply(self, items):
+        """Transform a batch of items.
+
+        :param items: list of items
+
+        :returns: the list of transformed items
+        """
+        raise NotImplementedError
+
+
+class Prune(Transform):
+    """Remove fields of the items.
+
+    :param arg: comma-separated dotted paths of the fields to remove
+        (e.g., `data.files,data.message`)
+    """
+    NAME = 'prune'
+
+    def __init__(self, arg):
+        super().__init__(arg)
+        self.paths = _parse_paths(arg)
+
+    def apply(self, items):
+        for item in items:
+            for path in self.paths:
+                _remove(item, path)
+
+        return items
+
+
+class Project(Transform):
+    """Keep only some fields of the items.
+
+    The metadata of the items (every field but `data`) is always kept,
+    since the target storages rely on it.
+
+    :param arg: comma-separated dotted paths of the fields to keep
+        (e.g., `data.hash,data.Author`)
+    """
+    NAME = 'project'
+
+    def __init__(self, arg):
+        super().__init__(arg)
+        self.tree = {}
+
+        for path in _parse_paths(arg):
+            node = self.tree
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+                if node is None:
+                    break
+            else:
+                node[path[-1]] = None
+
+    def apply(self, items):
+        for item in items:
+            if DATA_FIELD not in item:
+                continue
+
+            if DATA_FIELD in self.tree:
+                item[DATA_FIELD] = _project(item[DATA_FIELD], self.tree[DATA_FIELD])
+            else:
+                del item[DATA_FIELD]
+
+        return items
+
+
+class Truncate(Transform):
+    """Cut the strings of the items longer than a given length.
+
+    Only the strings under `data` are cut; the metadata of the items
+    (e.g., `uuid` or `origin`) identifies them, so it is kept whole.
+
+    :param arg: max number of characters of the strings
+    """
+    NAME = 'truncate'
+
+    def __init__(self, arg):
+        super().__init__(arg)
+        self.max_length = int(arg)
+
+        if self.max_length <= len(TRUNCATED_SUFFIX):
+            raise ValueError("max length must be greater than %s" % len(TRUNCATED_SUFFIX))
+
+    def apply(self, items):
+        for item in items:
+            if DATA_FIELD in item:
+                item[DATA_FIELD] = self.__truncate(item[DATA_FIELD])
+
+        return items
+
+    def __truncate(self, value):
+        if isinstance(value, str):
+            if len(value) > self.max_length:
+                return value[:self.max_length - len(TRUNCATED_SUFFIX)] + TRUNCATED_SUFFIX
+        elif isinstance(value, dict):
+            for key, nested in value.items():
+                value[key] = self.__truncate(nested)
+        elif isinstance(value, list):
+            for position, nested in enumerate(value):
+                value[position] = self.__truncate(nested)
+
+        return value
+
+
+class Filter(Transform):
+    """Keep the items whose field matches any of the given patterns.
+
+    :param arg: comma-separated shell-style patterns
+        (e.g., `https://github.com/chaoss/*`)
+    """
+    FIELD = None
+    EXCLUDE = False
+
+    def __init__(self, arg):
+        super().__init__(arg)
+        self.patterns = [pattern for pattern in arg.split(',') if pattern]
+
+        if not self.patterns:
+            raise ValueError("no %s given" % self.FIELD)
+
+    def apply(self, items):
+        return [item for item in items if self.__match(item) != self.EXCLUDE]
+
+    def __match(self, item):
+        value = item.get(self.FIELD)
+
+        if value is None:
+            return False
+
+        return any(fnmatch.fnmatchcase(value, pattern) for pattern in self.patterns)
+
+
+class CategoryFilter(Filter):
+    """Keep the items of the given categories"""
+
+    NAME = 'category'
+    FIELD = 'category'
+
+
+class OriginFilter(Filter):
+    """Keep the items of the given origins"""
+
+    NAME = 'origin'
+    FIELD = 'origin'
+
+
+class CategoryExclude(Filter):
+    """Drop the items of the given categories"""
+
+    NAME = 'exclude-category'
+    FIELD = 'category'
+    EXCLUDE = True
+
+
+class OriginExclude(Filter):
+    """Drop the items of the given origins"""
+
+    NAME = 'exclude-origin'
+    FIELD = 'origin'
+    EXCLUDE = True
+
+
+TRANSFORMS = {
+    transform.NAME: transform
+    for transform in [Prune, Project, Truncate, CategoryFilter,
+                      OriginFilter, CategoryExclude, OriginExclude]
+}
+
+
+class TransformQueue:
+    """Apply transforms to the items put in a data queue.
+
+    Items are buffered and transformed in batches of `batch_size`
+    items. The buffer is also transformed and flushed to the queue
+    before a checkpoint or the end of a reading, so checkpoints keep
+    covering the items preceding them, including the dropped ones.
+
+    :param data_queue: queue where the transformed items are put
+    :param transforms: list of transforms applied in order
+    :param batch_size: max number of items transformed at once
+    """
+    def __init__(self, data_queue, transforms, batch_size=TRANSFORM_BATCH_SIZE):
+        self.data_queue = data_queue
+        self.transforms = transforms
+        self.batch_size = batch_size
+        self.batch = []
+
+    async def put(self, item):
+        if isinstance(item, dict):
+            self.batch.append(item)
+
+            if len(self.batch) >= self.batch_size:
+                await self.__flush()
+            return
+
+        # Checkpoints and the end of a reading
+        await self.__flush()
+        await self.data_queue.put(item)
+
+    async def __flush(self):
+        if not self.batch:
+            return
+
+        start = time.time()
+
+        items = self.batch
+        self.batch = []
+
+        n_items = len(items)
+        for transform in self.transforms:
+            items = transform.apply(items)
+
+        PROFILER.record(STAGE_TRANSFORM, time.time() - start)
+
+        if len(items) < n_items:
+            metrics.ITEMS_FILTERED.inc(n_items - len(items))
+
+        for item in items:
+            await self.data_queue.put(item)
+
+
+def parse_transform(value):
+    """Parse a transform given as `name:arg` (e.g., `truncate:1000`)"""
+
+    name, _, arg = value.partition(':')
+
+    if name not in TRANSFORMS:
+        raise argparse.ArgumentTypeError("unknown transform %s; choose from %s"
+                                         % (name, ', '.join(TRANSFORMS)))
+
+    try:
+        return TRANSFORMS[name](arg)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError("invalid %s transform: %s" % (name, e))
+
+
+def _parse_paths(arg):
+    paths = [tuple(path.split('.')) for path in arg.split(',') if path]
+
+    if not paths:
+        raise ValueError("no fields given")
+
+    return paths
+
+
+def _remove(item, path):
+    """Remove the field at `path`, when it exists"""
+
+    for key in path[:-1]:
+        item = item.get(key) if isinstance(item, dict) else None
+        if item is None:
+            return
+
+    if isinstance(item, dict):
+        item.pop(path[-1], None)
+
+
+def _project(value, tree):
+    """Keep the fields of `value` in `tree`; leaves are set to None"""
+
+    if tree is None or not isinstance(value, dict):
+        return value
+
+    return {key: _project(value[key], subtree)
+            for key, subtree in tree.items() if key in value}
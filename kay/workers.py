@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+import collections
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+from grimoirelab_toolkit.introspect import find_signature_parameters
+
+from kay.errors import WorkerError
+
+logger = logging.getLogger(__name__)
+
+
+STATS_INTERVAL = 10
+REPORT_INTERVAL = 60
+RESTART_DELAY = 5
+RESTART_MAX_DELAY = 300
+MAX_FAILURES = 5
+FAILURES_RESET = 600
+
+
+class WorkerPool:
+    """Run a transfer on a supervised pool of worker processes.
+
+    Each worker runs its own instance of the backend, so the workers
+    consume disjoint chunks of the shared source and write to the
+    target independently. The id of each worker is passed to the
+    backend as `worker_id` when its constructor accepts it.
+
+    Workers that exit with an error are restarted, waiting twice as
+    long after each consecutive failure. A worker that fails more
+    than `MAX_FAILURES` times in a row, without running for at least
+    `FAILURES_RESET` seconds in between, is considered broken (e.g.,
+    by a wrong configuration): the pool is stopped and `WorkerError`
+    is raised. The stats of the workers are periodically collected
+    and logged as a whole.
+
+    :param backend_class: backend class to transfer items
+    :param backend_args: dict of arguments needed to init the backend
+    :param n_workers: number of worker processes
+    """
+    def __init__(self, backend_class, backend_args, n_workers):
+        self.backend_class = backend_class
+        self.backend_args = backend_args
+        self.n_workers = n_workers
+        self.stats_queue = multiprocessing.Queue()
+        self.workers = {}
+        self.started = {}
+        self.failures = collections.Counter()
+        self.restarts = {}
+        self.broken = None
+        self.stats = {}
+        self.finished_stats = collections.Counter()
+        self.stopping = False
+
+    def run(self):
+        """Start the workers and supervise them until all of them finish"""
+
+        for worker_id in range(self.n_workers):
+            self.__start(worker_id)
+
+        signal.signal(signal.SIGTERM, self.__terminate)
+
+        last_report = time.time()
+        try:
+            while self.workers or self.restarts:
+                self.__supervise()
+
+                if time.time() - last_report >= REPORT_INTERVAL:
+                    self.__report()
+                    last_report = time.time()
+        except KeyboardInterrupt:
+            # Workers received the signal too, wait for them to finish
+            self.stopping = True
+            while self.workers:
+                self.__supervise()
+
+        self.__collect_stats()
+        self.__report()
+
+        if self.broken is not None:
+            raise WorkerError(worker_id=self.broken, failures=self.failures[self.broken])
+
+    @property
+    def total_stats(self):
+        """Counters of the items processed by all the workers"""
+
+        total = collections.Counter(self.finished_stats)
+
+        for stats in self.stats.values():
+            total.update(stats)
+
+        return total
+
+    def __start(self, worker_id):
+        process = multiprocessing.Process(target=_work,
+                                          args=(worker_id, self.backend_class,
+                                                self.backend_args, self.stats_queue),
+                                          name="kay-worker-%s" % worker_id)
+        process.start()
+        self.workers[worker_id] = process
+        self.started[worker_id] = time.time()
+
+        logger.info("Worker %s started (pid %s)", worker_id, process.pid)
+
+    def __supervise(self):
+        """Collect stats and restart the workers that failed"""
+
+        self.__collect_stats(timeout=1)
+
+        for worker_id, restart_time in list(self.restarts.items()):
+            if self.stopping:
+                del self.restarts[worker_id]
+            elif time.time() >= restart_time:
+                del self.restarts[worker_id]
+                self.__start(worker_id)
+
+        for worker_id, process in list(self.workers.items()):
+            if process.is_alive():
+                continue
+
+            process.join()
+            del self.workers[worker_id]
+
+            # The stats of a new process start from zero
+            self.__collect_stats()
+            self.finished_stats.update(self.stats.pop(worker_id, {}))
+
+            if process.exitcode == 0 or self.stopping:
+                logger.info("Worker %s finished", worker_id)
+                continue
+
+            if time.time() - self.started[worker_id] >= FAILURES_RESET:
+                self.failures[worker_id] = 0
+            self.failures[worker_id] += 1
+
+            if self.failures[worker_id] > MAX_FAILURES:
+                logger.error("Worker %s exited with code %s, %s failures in a row; stopping",
+                             worker_id, process.exitcode, self.failures[worker_id])
+                self.broken = worker_id
+                self.__terminate(signal.SIGTERM, None)
+                continue
+
+            delay = min(RESTART_DELAY * 2 ** (self.failures[worker_id] - 1), RESTART_MAX_DELAY)
+            logger.warning("Worker %s exited with code %s, restarting it in %s seconds",
+                           worker_id, process.exitcode, delay)
+            self.restarts[worker_id] = time.time() + delay
+
+    def __collect_stats(self, timeout=0):
+        """Store the last stats sent by each worker.
+
+        :param timeout: seconds to wait for the first stats to arrive
+        """
+        block = timeout > 0
+
+        while True:
+            try:
+                worker_id, stats = self.stats_queue.get(block=block, timeout=timeout)
+            except queue.Empty:
+                break
+
+            self.stats[worker_id] = stats
+            block = False
+
+    def __report(self):
+        stats = self.total_stats
+        logger.info("%s workers running, %s items read, %s written, %s failed",
+                    len(self.workers), stats['read'], stats['written'], stats['failed'])
+
+    def __terminate(self, signum, frame):
+        """Ask the workers to stop gracefully"""
+
+        self.stopping = True
+
+        for process in self.workers.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGINT)
+
+
+def _work(worker_id, backend_class, backend_args, stats_queue):
+    """Run the transfer of a worker process"""
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    backend_args = dict(backend_args, worker_id=worker_id)
+
+    # Each worker serves its own metrics
+    if backend_args.get('metrics_port') is not None:
+        backend_args['metrics_port'] += worker_id
+
+    try:
+        init_args = find_signature_parameters(backend_class.__init__,
+                                              backend_args)
+        backend = backend_class(**init_args)
+
+        reporter = threading.Thread(target=_report_stats,
+                                    args=(worker_id, backend, stats_queue),
+                                    daemon=True)
+        reporter.start()
+
+        transfer_args = find_signature_parameters(backend.transfer,
+                                                  backend_args)
+        try:
+            backend.transfer(**transfer_args)
+        finally:
+            stats_queue.put((worker_id, dict(backend.stats)))
+    except KeyboardInterrupt:
+        pass
+
+
+def _report_stats(worker_id, backend, stats_queue):
+    while True:
+        time.sleep(STATS_INTERVAL)
+        stats_queue.put((worker_id, dict(backend.stats)))
@@ -28,6 +28,9 @@ import unittest
 
 if __name__ == '__main__':
 
+    # Run the tests against the sources of this tree
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
     test_suite = unittest.TestLoader().discover(os.path.join(os.path.dirname(os.path.abspath(__file__)), "."),
                                                 pattern='test_*.py')
     result = unittest.TextTestRunner(buffer=True).run(test_suite)
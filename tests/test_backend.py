@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+
+import asyncio
+import os
+import pickle
+import signal
+import threading
+import unittest
+import unittest.mock
+
+import fakeredis
+
+import kay.backend
+from benchmarks.mock_es import MockES
+from kay.backends.redis2es import Redis2Es
+from kay.errors import ElasticError
+
+Q_ITEMS = 'items'
+
+
+def read_item(uuid):
+    return {'uuid': uuid, 'updated_on': 1.0, 'data': {}}
+
+
+class TestTransfer(unittest.TestCase):
+    """Tests of the transfer pipeline, from a fake Redis to a mock ES"""
+
+    def setUp(self):
+        self.server = MockES(record=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.redis = fakeredis.FakeServer()
+        self.conn = fakeredis.FakeStrictRedis(server=self.redis)
+
+        patcher = unittest.mock.patch('redis.StrictRedis.from_url',
+                                      side_effect=lambda url: fakeredis.FakeStrictRedis(server=self.redis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        self.addCleanup(asyncio.set_event_loop, None)
+
+    def backend(self, **kwargs):
+        kwargs.setdefault('es_index', 'items')
+        kwargs.setdefault('es_max_retries', 0)
+        kwargs.setdefault('es_retry_backoff', 0.01)
+        kwargs.setdefault('redis_wait_timeout', 0)
+        kwargs.setdefault('redis_queues', [(Q_ITEMS, 1)])
+
+        return Redis2Es('redis://localhost/8', self.server.url, 'items', **kwargs)
+
+    def push(self, uuids):
+        self.conn.rpush(Q_ITEMS, *[pickle.dumps(read_item(uuid)) for uuid in uuids])
+
+    def interrupt(self, seconds):
+        """Send SIGINT to this process after `seconds`"""
+
+        timer = threading.Timer(seconds, os.kill, args=(os.getpid(), signal.SIGINT))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_transfer(self):
+        """Test whether the items of the source are written to the target"""
+
+        uuids = [str(i) for i in range(100)]
+        self.push(uuids)
+
+        backend = self.backend(redis_chunk_size=10)
+        backend.transfer(keep_alive=False, queue_size=20)
+
+        self.assertEqual(sorted(self.server.docs), sorted(('items', uuid) for uuid in uuids))
+        self.assertEqual(backend.stats['read'], 100)
+        self.assertEqual(backend.stats['written'], 100)
+        self.assertEqual(self.conn.llen(Q_ITEMS), 0)
+
+    def test_reliable(self):
+        """Test whether written items are acknowledged in reliable mode"""
+
+        self.push(['a', 'b', 'c'])
+
+        backend = self.backend(redis_reliable=True, redis_consumer_id='test')
+        backend.transfer(keep_alive=False)
+
+        self.assertEqual(len(self.server.docs), 3)
+        self.assertEqual(self.conn.llen(Q_ITEMS), 0)
+        self.assertEqual(self.conn.llen(Q_ITEMS + ':processing:test'), 0)
+
+    def test_abort(self):
+        """Test whether items are kept in the source when the target fails"""
+
+        self.push(['a', 'b', 'c'])
+        self.server.status = 401
+
+        backend = self.backend(redis_reliable=True, redis_consumer_id='test')
+        with self.assertRaises(ElasticError):
+            backend.transfer(keep_alive=False)
+
+        self.assertEqual(self.server.docs, {})
+        self.assertEqual(self.conn.llen(Q_ITEMS) + self.conn.llen(Q_ITEMS + ':processing:test'), 3)
+
+    def test_sigint(self):
+        """Test whether SIGINT stops reading and writes the items already read"""
+
+        self.push(['a', 'b', 'c'])
+        self.interrupt(0.5)
+
+        backend = self.backend()
+        backend.transfer(keep_alive=True)
+
+        self.assertEqual(len(self.server.docs), 3)
+        self.assertEqual(backend.stats['written'], 3)
+
+    def test_empty_reads(self):
+        """Test whether empty sources are not read in a busy loop"""
+
+        self.interrupt(0.5)
+
+        backend = self.backend()
+        read = unittest.mock.Mock(wraps=backend.source_conn.read)
+        backend.source_conn.read = read
+
+        with unittest.mock.patch.object(kay.backend, 'EMPTY_READ_DELAY', 0.2):
+            backend.transfer(keep_alive=True, delay=0)
+
+        self.assertLessEqual(read.call_count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
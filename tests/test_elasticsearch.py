@@ -0,0 +1,668 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import asyncio
+import json
+import threading
+import unittest
+import unittest.mock
+
+import fakeredis
+from elasticsearch import TransportError
+
+from benchmarks.mock_es import MockES
+from kay.backends.connectors.elasticsearch import (AckTracker,
+                                                   BulkBody,
+                                                   BulkSizer,
+                                                   ESConnector,
+                                                   IndexRouter,
+                                                   Throttler,
+                                                   PARTITION_DAILY,
+                                                   PARTITION_MONTHLY,
+                                                   PARTITION_NONE,
+                                                   PARTITION_WEEKLY,
+                                                   PARTITION_BY_UPDATED_ON,
+                                                   REFRESH_END,
+                                                   REFRESH_INTERVAL,
+                                                   REFRESH_NONE,
+                                                   REFRESH_WAIT_FOR)
+from kay.connector import (Checkpoint,
+                           Connector)
+from kay.dedup import DedupCache
+from kay.errors import ElasticError
+
+# 2025-10-09 08:53:20 UTC
+UPDATED_ON = 1760000000.0
+DAY = 24 * 60 * 60
+
+
+def dumps(obj):
+    return json.dumps(obj).encode('utf-8')
+
+
+def read_item(uuid, updated_on=UPDATED_ON):
+    return {'uuid': uuid, 'updated_on': updated_on, 'data': {}}
+
+
+class TestAckTracker(unittest.TestCase):
+    """AckTracker tests"""
+
+    def test_ordering(self):
+        """Test whether checkpoints wait for every bulk preceding them"""
+
+        acks = []
+        tracker = AckTracker()
+
+        first = tracker.add_bulk()
+        second = tracker.add_bulk()
+        tracker.add_checkpoint(Checkpoint(acks.append, 'A'))
+
+        # The bulk being filled precedes the checkpoint too
+        tracker.add_checkpoint(Checkpoint(acks.append, 'B'), filling=True)
+
+        tracker.bulk_written(second)
+        self.assertEqual(acks, [])
+
+        tracker.bulk_written(first)
+        self.assertEqual(acks, ['A'])
+
+        third = tracker.add_bulk()
+        fourth = tracker.add_bulk()
+        tracker.add_checkpoint(Checkpoint(acks.append, 'C'))
+
+        tracker.bulk_written(fourth)
+        self.assertEqual(acks, ['A'])
+
+        tracker.bulk_written(third)
+        self.assertEqual(acks, ['A', 'B', 'C'])
+
+    def test_nothing_pending(self):
+        """Test whether checkpoints without pending bulks are acknowledged at once"""
+
+        acks = []
+        tracker = AckTracker()
+
+        tracker.add_checkpoint(Checkpoint(acks.append, 'A'))
+        self.assertEqual(acks, ['A'])
+
+
+class TestBulkBody(unittest.TestCase):
+    """BulkBody tests"""
+
+    def test_add(self):
+        """Test whether items are encoded with their version"""
+
+        body = BulkBody(dumps)
+        body.add('items', read_item('a', 1.5))
+        body.add('items', {'uuid': 'b', 'data': {}})
+
+        lines = bytes(body.buffer).decode('utf-8').splitlines()
+        self.assertEqual(len(body), 2)
+        self.assertEqual(len(lines), 4)
+
+        action = json.loads(lines[0])['index']
+        self.assertEqual(action['_id'], 'a')
+        self.assertEqual(action['version'], 1500000)
+        self.assertEqual(action['version_type'], 'external_gte')
+        self.assertEqual(json.loads(lines[1]), read_item('a', 1.5))
+
+        action = json.loads(lines[2])['index']
+        self.assertEqual(action['_id'], 'b')
+        self.assertNotIn('version', action)
+
+    def test_subset(self):
+        """Test whether bodies are built with a subset of the items"""
+
+        body = BulkBody(dumps)
+        for uuid in ['a', 'b', 'c', 'd']:
+            body.add('items', read_item(uuid))
+
+        subset = body.subset([1, 3])
+        self.assertEqual([item['uuid'] for item in subset.items], ['b', 'd'])
+        self.assertEqual(subset.buffer, body.lines(1) + body.lines(3))
+
+        first, second = body.split()
+        self.assertEqual([item['uuid'] for item in first.items], ['a', 'b'])
+        self.assertEqual([item['uuid'] for item in second.items], ['c', 'd'])
+        self.assertEqual(first.buffer + second.buffer, body.buffer)
+
+
+class TestBulkSizer(unittest.TestCase):
+    """BulkSizer tests"""
+
+    def test_is_full(self):
+        """Test whether bulks are full by number of items or size"""
+
+        sizer = BulkSizer(max_items=10, target_bytes=1024 * 1024)
+
+        self.assertFalse(sizer.is_full(9, 1024))
+        self.assertTrue(sizer.is_full(10, 1024))
+        self.assertTrue(sizer.is_full(1, 1024 * 1024))
+
+    def test_update(self):
+        """Test whether the target follows the latency of the bulks"""
+
+        sizer = BulkSizer(target_bytes=1024 * 1024, max_bytes=2 * 1024 * 1024, target_latency=4)
+
+        sizer.update(5)
+        self.assertEqual(sizer.target_bytes, 512 * 1024)
+
+        sizer.update(3)
+        self.assertEqual(sizer.target_bytes, 512 * 1024)
+
+        sizer.update(1)
+        self.assertEqual(sizer.target_bytes, 640 * 1024)
+
+        for _ in range(10):
+            sizer.update(1)
+        self.assertEqual(sizer.target_bytes, 2 * 1024 * 1024)
+
+    def test_throttle(self):
+        """Test whether the target shrinks after rejections, down to a minimum"""
+
+        sizer = BulkSizer(target_bytes=1024 * 1024)
+
+        sizer.throttle()
+        self.assertEqual(sizer.target_bytes, 512 * 1024)
+
+        for _ in range(10):
+            sizer.throttle()
+        self.assertEqual(sizer.target_bytes, sizer.min_bytes)
+
+    def test_reject(self):
+        """Test whether the max size is cut after a too large bulk"""
+
+        sizer = BulkSizer(target_bytes=4 * 1024 * 1024, max_bytes=8 * 1024 * 1024)
+
+        sizer.reject(2 * 1024 * 1024)
+        self.assertEqual(sizer.max_bytes, 1024 * 1024)
+        self.assertEqual(sizer.target_bytes, 1024 * 1024)
+
+        for _ in range(10):
+            sizer.update(0)
+        self.assertEqual(sizer.target_bytes, 1024 * 1024)
+
+
+class TestThrottler(unittest.TestCase):
+    """Throttler tests"""
+
+    def setUp(self):
+        patcher = unittest.mock.patch('kay.backends.connectors.elasticsearch.time')
+        self.mock_time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_acquire(self):
+        """Test whether bulks are paced after a burst of a second"""
+
+        self.mock_time.time.return_value = 1000.0
+
+        throttler = Throttler(max_docs_rate=100)
+        throttler.acquire(100, 1024)
+        throttler.acquire(100, 1024)
+        self.mock_time.sleep.assert_not_called()
+
+        throttler.acquire(100, 1024)
+        self.mock_time.sleep.assert_called_once_with(1.0)
+
+    def test_bytes_rate(self):
+        """Test whether bulks are paced by their size"""
+
+        self.mock_time.time.return_value = 1000.0
+
+        throttler = Throttler(max_bytes_rate=1024)
+        throttler.acquire(10, 2048)
+        throttler.acquire(10, 1024)
+
+        self.mock_time.sleep.assert_called_once_with(1.0)
+
+    def test_not_adaptive(self):
+        """Test whether the rate is fixed when the throttler is not adaptive"""
+
+        self.mock_time.time.return_value = 1000.0
+
+        throttler = Throttler(max_docs_rate=100)
+        throttler.update(100, 1, rejected=True)
+
+        self.assertEqual(throttler.docs_rate, 100)
+
+    def test_adaptive(self):
+        """Test whether the rate is cut under pressure and recovers later"""
+
+        throttler = Throttler(adaptive=True, target_latency=5)
+
+        self.mock_time.time.return_value = 1000.0
+        throttler.update(100, 1, rejected=True)
+        self.assertAlmostEqual(throttler.docs_rate, 70)
+
+        self.mock_time.time.return_value = 1002.0
+        throttler.update(100, 0.1)
+        self.assertAlmostEqual(throttler.docs_rate, 84)
+
+        # Bulks sent before the cut do not cut the rate again
+        self.mock_time.time.return_value = 1003.0
+        throttler.update(100, 10)
+        self.assertAlmostEqual(throttler.docs_rate, 84)
+
+        self.mock_time.time.return_value = 1020.0
+        throttler.update(100, 6)
+        self.assertLess(throttler.docs_rate, 84)
+
+
+class TestIndexRouter(unittest.TestCase):
+    """IndexRouter tests"""
+
+    def setUp(self):
+        self.opened = []
+        self.n_docs = {}
+
+    def open_index(self, index):
+        self.opened.append(index)
+        return self.n_docs.get(index, 0)
+
+    def test_periods(self):
+        """Test whether items are routed to the partition of their field"""
+
+        expected = [
+            (PARTITION_NONE, 'items'),
+            (PARTITION_DAILY, 'items_20251009'),
+            (PARTITION_WEEKLY, 'items_2025w41'),
+            (PARTITION_MONTHLY, 'items_202510')
+        ]
+
+        for partition, index in expected:
+            router = IndexRouter('items', self.open_index, partition=partition,
+                                 field=PARTITION_BY_UPDATED_ON)
+            self.assertEqual(router.route(read_item('a')), index)
+
+        router = IndexRouter('items', self.open_index, partition=PARTITION_DAILY,
+                             field=PARTITION_BY_UPDATED_ON)
+
+        indexes = [router.route(read_item('a', UPDATED_ON + days * DAY)) for days in [0, 1, 0, 30]]
+        self.assertEqual(indexes, ['items_20251009', 'items_20251010',
+                                   'items_20251009', 'items_20251108'])
+
+    def test_open_once(self):
+        """Test whether indexes are opened only the first time"""
+
+        router = IndexRouter('items', self.open_index, partition=PARTITION_MONTHLY,
+                             field=PARTITION_BY_UPDATED_ON)
+
+        self.assertTrue(router.opens_index(read_item('a')))
+        router.route(read_item('a'))
+
+        self.assertFalse(router.opens_index(read_item('b')))
+        router.route(read_item('b'))
+
+        self.assertEqual(self.opened, ['items_202510'])
+
+    def test_rollover(self):
+        """Test whether partitions roll over when they are full"""
+
+        self.n_docs = {'items_202510': 1}
+
+        router = IndexRouter('items', self.open_index, partition=PARTITION_MONTHLY,
+                             field=PARTITION_BY_UPDATED_ON, max_docs=2)
+
+        indexes = []
+        for uuid in ['a', 'b', 'c']:
+            indexes.append(router.route(read_item(uuid)))
+        self.assertEqual(indexes, ['items_202510', 'items_202510-000002', 'items_202510-000002'])
+
+        self.assertTrue(router.opens_index(read_item('d')))
+        self.assertEqual(router.route(read_item('d')), 'items_202510-000003')
+
+    def test_rollover_full(self):
+        """Test whether full indexes are skipped when a partition is opened"""
+
+        self.n_docs = {'items_202510': 2, 'items_202510-000002': 2}
+
+        router = IndexRouter('items', self.open_index, partition=PARTITION_MONTHLY,
+                             field=PARTITION_BY_UPDATED_ON, max_docs=2)
+
+        self.assertEqual(router.route(read_item('a')), 'items_202510-000003')
+        self.assertEqual(self.opened, ['items_202510', 'items_202510-000002', 'items_202510-000003'])
+
+
+class ESConnectorTestCase(unittest.TestCase):
+    """Base class of the tests writing to a mock ES server"""
+
+    def setUp(self):
+        self.server = MockES(record=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def connector(self, **kwargs):
+        kwargs.setdefault('es_index', 'items')
+        kwargs.setdefault('es_max_retries', 0)
+        kwargs.setdefault('es_retry_backoff', 0.01)
+
+        conn = ESConnector(self.server.url, 'items', **kwargs)
+        self.addCleanup(conn.executor.shutdown)
+
+        return conn
+
+    def write(self, conn, items):
+        """Write `items` and the end of the reading with `conn`"""
+
+        async def write():
+            data_queue = asyncio.Queue()
+            for item in items + [Connector.READ_DONE]:
+                await data_queue.put(item)
+            await conn.write(data_queue)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(write())
+        finally:
+            loop.close()
+
+    def bulks(self):
+        return [path for method, path in self.server.requests if path.endswith('_bulk')]
+
+    def refreshes(self):
+        return [path for method, path in self.server.requests if path.endswith('_refresh')]
+
+
+class TestESConnectorWrite(ESConnectorTestCase):
+    """Tests of the retries and failures of ESConnector writes"""
+
+    def test_write(self):
+        """Test whether items are written and acknowledged"""
+
+        acks = []
+        conn = self.connector()
+
+        items = [read_item('a'), read_item('b'), Checkpoint(acks.append, 'items')]
+        self.write(conn, items)
+
+        self.assertEqual(sorted(self.server.docs), [('items', 'a'), ('items', 'b')])
+        self.assertEqual(conn.stats['written'], 2)
+        self.assertEqual(acks, ['items'])
+
+    def test_retry(self):
+        """Test whether items rejected temporarily are written again"""
+
+        self.server.item_status = {'b': [429, 503]}
+        conn = self.connector()
+
+        self.write(conn, [read_item('a'), read_item('b')])
+
+        self.assertEqual(sorted(self.server.docs), [('items', 'a'), ('items', 'b')])
+        self.assertEqual(conn.stats['written'], 2)
+        self.assertEqual(len(self.bulks()), 3)
+
+    def test_dead_letter(self):
+        """Test whether items rejected permanently go to the dead letter"""
+
+        dead = []
+        acks = []
+        self.server.item_status = {'b': [400], 'c': [503, 503, 503]}
+        conn = self.connector(dead_letter=dead.extend, es_item_max_retries=2)
+
+        items = [read_item('a'), read_item('b'), read_item('c'), Checkpoint(acks.append, 'items')]
+        self.write(conn, items)
+
+        self.assertEqual([item['uuid'] for item, _ in dead], ['b', 'c'])
+        self.assertEqual([error['status'] for _, error in dead], [400, 503])
+        self.assertEqual(conn.stats['written'], 1)
+        self.assertEqual(conn.stats['failed'], 2)
+        self.assertEqual(acks, ['items'])
+
+    def test_item_too_large(self):
+        """Test whether an item too large for a bulk goes to the dead letter"""
+
+        dead = []
+        self.server.max_bytes = 1024
+        conn = self.connector(dead_letter=dead.extend)
+
+        items = [read_item(str(i)) for i in range(10)]
+        items[3]['data'] = {'message': 'x' * 2048}
+        self.write(conn, items)
+
+        self.assertEqual([item['uuid'] for item, _ in dead], ['3'])
+        self.assertEqual(dead[0][1]['status'], 413)
+        self.assertEqual(len(self.server.docs), 9)
+
+    def test_bulk_error(self):
+        """Test whether a failed bulk is raised instead of dead-lettered"""
+
+        for status in [401, 503]:
+            dead = []
+            acks = []
+            self.server.status = status
+            conn = self.connector(dead_letter=dead.extend, es_item_max_retries=2)
+
+            items = [read_item('a'), read_item('b'), Checkpoint(acks.append, 'items')]
+
+            with self.assertRaises(ElasticError):
+                self.write(conn, items)
+
+            self.assertEqual(dead, [])
+            self.assertEqual(acks, [])
+            self.assertEqual(conn.stats['failed'], 0)
+
+    def test_connection_error(self):
+        """Test whether connection errors are retried and then raised"""
+
+        self.server.shutdown()
+        self.server.server_close()
+
+        conn = self.connector(es_item_max_retries=2)
+        conn.routers['items'] = IndexRouter('items', lambda index: 0,
+                                            partition=PARTITION_NONE)
+
+        with self.assertRaises(ElasticError):
+            self.write(conn, [read_item('a')])
+
+
+
+class TestESConnectorRefresh(ESConnectorTestCase):
+    """Tests of the refreshes of ESConnector"""
+
+    def test_refresh_end(self):
+        """Test whether indexes are refreshed once at the end of each cycle"""
+
+        conn = self.connector(es_refresh=REFRESH_END, es_bulk_size=1)
+
+        self.write(conn, [read_item('a'), read_item('b'), read_item('c')])
+        self.assertEqual(len(self.bulks()), 3)
+        self.assertEqual(self.refreshes(), ['items/_refresh'])
+
+        # Cycles without items do not refresh
+        self.write(conn, [])
+        self.assertEqual(len(self.refreshes()), 1)
+
+    def test_refresh_none(self):
+        """Test whether indexes are never refreshed"""
+
+        conn = self.connector(es_refresh=REFRESH_NONE)
+
+        self.write(conn, [read_item('a'), read_item('b')])
+        self.assertEqual(self.refreshes(), [])
+
+    def test_refresh_interval(self):
+        """Test whether indexes are refreshed at most once every interval"""
+
+        conn = self.connector(es_refresh=REFRESH_INTERVAL, es_refresh_interval=3600,
+                              es_bulk_size=1)
+        self.write(conn, [read_item('a'), read_item('b')])
+        self.assertEqual(self.refreshes(), [])
+
+        conn = self.connector(es_refresh=REFRESH_INTERVAL, es_refresh_interval=0,
+                              es_bulk_size=1, es_bulk_concurrency=1)
+        self.write(conn, [read_item('a'), read_item('b')])
+        self.assertEqual(self.refreshes(), ['items/_refresh', 'items/_refresh'])
+
+    def test_refresh_wait_for(self):
+        """Test whether the last bulk of each cycle waits for the refresh"""
+
+        conn = self.connector(es_refresh=REFRESH_WAIT_FOR, es_bulk_size=2)
+
+        with unittest.mock.patch.object(conn.conn, 'bulk', wraps=conn.conn.bulk) as bulk:
+            self.write(conn, [read_item('a'), read_item('b'), read_item('c')])
+
+        refreshes = [call.kwargs.get('refresh') for call in bulk.call_args_list]
+        self.assertEqual(refreshes, [None, REFRESH_WAIT_FOR])
+        self.assertEqual(self.refreshes(), [])
+
+        # A cycle ending with a full bulk is refreshed afterwards
+        self.write(conn, [read_item('d'), read_item('e')])
+        self.assertEqual(self.refreshes(), ['items/_refresh'])
+
+    def test_refresh_written(self):
+        """Test whether only the indexes written since the last refresh are refreshed"""
+
+        conn = self.connector(es_index=None, es_partition=PARTITION_DAILY,
+                              es_partition_field=PARTITION_BY_UPDATED_ON)
+
+        self.write(conn, [read_item('a'), read_item('b', UPDATED_ON + DAY)])
+        self.write(conn, [read_item('c', UPDATED_ON + DAY)])
+        self.write(conn, [])
+
+        self.assertEqual(self.refreshes(), ['enrich-items_20251009,enrich-items_20251010/_refresh',
+                                            'enrich-items_20251010/_refresh'])
+
+    def test_refresh_failed(self):
+        """Test whether indexes are not taken as refreshed when the refresh fails"""
+
+        conn = self.connector(es_refresh=REFRESH_NONE)
+        self.write(conn, [read_item('a')])
+
+        with unittest.mock.patch.object(conn.conn.indices, 'refresh', side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                conn.refresh()
+
+        self.assertEqual(conn.unrefreshed, {'items'})
+
+
+class TestESConnectorDedup(ESConnectorTestCase):
+    """Tests of the items skipped by ESConnector"""
+
+    def test_skip_written(self):
+        """Test whether the versions already written are skipped"""
+
+        conn = self.connector(dedup=DedupCache())
+
+        self.write(conn, [read_item('a'), read_item('b'), read_item('a')])
+        self.write(conn, [read_item('a'), read_item('b', UPDATED_ON + 1)])
+
+        self.assertEqual(len(self.bulks()), 2)
+        self.assertEqual(conn.stats['written'], 3)
+        self.assertEqual(conn.stats['skipped'], 2)
+
+    def test_new_index(self):
+        """Test whether versions are kept when new indexes are created"""
+
+        conn = self.connector(dedup=DedupCache(), es_index=None, es_partition=PARTITION_DAILY,
+                              es_partition_field=PARTITION_BY_UPDATED_ON)
+
+        self.write(conn, [read_item('a')])
+        self.write(conn, [read_item('b', UPDATED_ON + DAY), read_item('a')])
+
+        self.assertEqual(conn.stats['written'], 2)
+        self.assertEqual(conn.stats['skipped'], 1)
+
+    def test_recreated_index(self):
+        """Test whether the versions of a deleted index do not apply to its new one"""
+
+        redis = fakeredis.FakeStrictRedis()
+
+        conn = self.connector(dedup=DedupCache(conn=redis, key='written'))
+        self.write(conn, [read_item('a')])
+
+        # The index is kept by the next transfer
+        conn = self.connector(dedup=DedupCache(conn=redis, key='written'))
+        self.write(conn, [read_item('a')])
+        self.assertEqual(conn.stats['skipped'], 1)
+
+        self.server.indices.clear()
+        self.server.docs.clear()
+
+        conn = self.connector(dedup=DedupCache(conn=redis, key='written'))
+        self.write(conn, [read_item('a')])
+
+        self.assertEqual(conn.stats['written'], 1)
+        self.assertEqual(list(self.server.docs), [('items', 'a')])
+
+
+
+class TestESConnectorBackfill(ESConnectorTestCase):
+    """Tests of the backfill mode of ESConnector"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.server.indices.add('items')
+        self.server.settings['items'] = {'number_of_replicas': '1', 'refresh_interval': '1s'}
+
+    def test_restore(self):
+        """Test whether the settings are tuned while writing and restored on close"""
+
+        conn = self.connector(es_backfill=True)
+        self.write(conn, [read_item('a'), read_item('b')])
+
+        self.assertEqual(self.server.settings['items'], {'number_of_replicas': 0,
+                                                         'refresh_interval': '-1',
+                                                         'translog.durability': 'async'})
+        self.assertEqual(self.refreshes(), [])
+
+        conn.close()
+
+        self.assertEqual(self.server.settings['items'], {'number_of_replicas': '1',
+                                                         'refresh_interval': '1s',
+                                                         'translog.durability': None})
+        self.assertEqual(conn.backfill_settings, {})
+        self.assertEqual(self.refreshes(), ['items/_refresh'])
+
+    def test_already_tuned(self):
+        """Test whether indexes tuned by another transfer are not restored"""
+
+        self.server.settings['items'] = {'number_of_replicas': '0', 'refresh_interval': '-1',
+                                         'translog': {'durability': 'async'}}
+
+        conn = self.connector(es_backfill=True)
+        with self.assertLogs('kay.backends.connectors.elasticsearch', level='WARNING'):
+            self.write(conn, [read_item('a')])
+        conn.close()
+
+        self.assertEqual(self.server.settings['items']['refresh_interval'], '-1')
+        self.assertEqual(conn.backfill_settings, {})
+
+    def test_restore_failed(self):
+        """Test whether the settings not restored are logged and kept"""
+
+        conn = self.connector(es_backfill=True)
+        self.write(conn, [read_item('a')])
+
+        with unittest.mock.patch.object(conn.conn.indices, 'put_settings',
+                                        side_effect=TransportError(500, 'error')):
+            with self.assertLogs('kay.backends.connectors.elasticsearch', level='ERROR'):
+                conn.close()
+
+        self.assertEqual(conn.backfill_settings['items']['refresh_interval'], '1s')
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
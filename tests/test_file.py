@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from kay.backends.connectors.file import (FileConnector,
+                                          COMPRESSION_GZIP,
+                                          COMPRESSION_NONE)
+from kay.connector import (Checkpoint,
+                           Connector)
+
+
+def read_item(uuid):
+    return {'uuid': uuid, 'updated_on': 1.0, 'data': {}}
+
+
+def lines(uuids):
+    return ''.join(json.dumps(read_item(uuid)) + '\n' for uuid in uuids).encode('utf-8')
+
+
+def loads(data):
+    return [json.loads(line) for line in data.splitlines()]
+
+
+class FileConnectorTestCase(unittest.TestCase):
+    """Base class of the tests reading and writing temporary files"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='kay_')
+        self.addCleanup(shutil.rmtree, self.tmp_path)
+
+    def connector(self, name, **kwargs):
+        conn = FileConnector(os.path.join(self.tmp_path, name), **kwargs)
+        self.addCleanup(conn.close)
+
+        return conn
+
+    def read(self, conn):
+        """Read once with `conn`, returning the items and checkpoints read"""
+
+        async def read():
+            data_queue = asyncio.Queue()
+            await conn.read(data_queue)
+
+            read = []
+            while not data_queue.empty():
+                read.append(data_queue.get_nowait())
+
+            return read
+
+        return self.run_loop(read())
+
+    def write(self, conn, items):
+        """Write `items` and the end of the reading with `conn`"""
+
+        async def write():
+            data_queue = asyncio.Queue()
+            for item in items + [Connector.READ_DONE]:
+                await data_queue.put(item)
+            await conn.write(data_queue)
+
+        self.run_loop(write())
+
+    @staticmethod
+    def run_loop(coro):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+
+class TestFileConnectorRead(FileConnectorTestCase):
+    """Tests of the readings of FileConnector"""
+
+    def test_read(self):
+        """Test whether the items of the file are read in chunks"""
+
+        with open(os.path.join(self.tmp_path, 'items.json'), 'wb') as fd:
+            fd.write(lines(['a', 'b', 'c']) + b'\n')
+
+        conn = self.connector('items.json', chunk_size=2)
+
+        read = self.read(conn)
+        self.assertEqual(read, [read_item('a'), read_item('b'), read_item('c'), Connector.READ_DONE])
+        self.assertEqual(conn.stats['read'], 3)
+
+    def test_read_gzip(self):
+        """Test whether gzip files with several members are read"""
+
+        path = os.path.join(self.tmp_path, 'items.json.gz')
+        for uuids in (['a'], ['b', 'c']):
+            with gzip.open(path, 'ab') as fd:
+                fd.write(lines(uuids))
+
+        conn = self.connector('items.json.gz')
+        self.assertEqual(conn.compression, COMPRESSION_GZIP)
+
+        read = self.read(conn)
+        self.assertEqual(read, [read_item('a'), read_item('b'), read_item('c'), Connector.READ_DONE])
+
+    def test_follow(self):
+        """Test whether lines appended to a followed file are read"""
+
+        path = os.path.join(self.tmp_path, 'items.json')
+        with open(path, 'wb') as fd:
+            fd.write(lines(['a']) + b'{"uuid": "b"')
+
+        conn = self.connector('items.json')
+        conn.follow = True
+
+        # The last line is still being written
+        self.assertEqual(self.read(conn), [read_item('a'), Connector.READ_DONE])
+
+        with open(path, 'ab') as fd:
+            fd.write(b', "updated_on": 1.0, "data": {}}\n' + lines(['c']))
+
+        self.assertEqual(self.read(conn), [read_item('b'), read_item('c'), Connector.READ_DONE])
+
+    def test_last_line(self):
+        """Test whether a last line without end of line is read when the file is not followed"""
+
+        path = os.path.join(self.tmp_path, 'items.json')
+        with open(path, 'wb') as fd:
+            fd.write(lines(['a']) + json.dumps(read_item('b')).encode('utf-8'))
+
+        conn = self.connector('items.json')
+
+        self.assertEqual(self.read(conn), [read_item('a'), read_item('b'), Connector.READ_DONE])
+        self.assertEqual(conn.offset, os.path.getsize(path))
+
+    def test_resume(self):
+        """Test whether the reading resumes from the last offset acknowledged"""
+
+        with open(os.path.join(self.tmp_path, 'items.json'), 'wb') as fd:
+            fd.write(lines(['a', 'b', 'c']))
+
+        conn = self.connector('items.json', chunk_size=2, resume=True)
+        read = self.read(conn)
+
+        self.assertEqual(read[:3], [read_item('a'), read_item('b'), read[2]])
+        self.assertIsInstance(read[2], Checkpoint)
+        read[2].ack()
+        conn.close()
+
+        conn = self.connector('items.json', chunk_size=2, resume=True)
+        read = self.read(conn)
+
+        self.assertEqual(read[0], read_item('c'))
+        self.assertEqual(read[-1], Connector.READ_DONE)
+
+
+class TestFileConnectorWrite(FileConnectorTestCase):
+    """Tests of the writings of FileConnector"""
+
+    def test_write(self):
+        """Test whether items are appended and checkpoints acknowledged"""
+
+        acks = []
+        conn = self.connector('items.json', chunk_size=1)
+
+        self.write(conn, [read_item('a'), Checkpoint(acks.append, 1), read_item('b')])
+        self.write(conn, [read_item('c')])
+
+        with open(os.path.join(self.tmp_path, 'items.json'), 'rb') as fd:
+            self.assertEqual(loads(fd.read()), [read_item('a'), read_item('b'), read_item('c')])
+
+        self.assertEqual(acks, [1])
+        self.assertEqual(conn.stats['written'], 3)
+
+    def test_write_gzip(self):
+        """Test whether each writing appends a complete gzip member"""
+
+        conn = self.connector('items.json.gz')
+
+        self.write(conn, [read_item('a')])
+        self.write(conn, [read_item('b')])
+
+        with gzip.open(os.path.join(self.tmp_path, 'items.json.gz'), 'rb') as fd:
+            self.assertEqual(loads(fd.read()), [read_item('a'), read_item('b')])
+
+    def test_write_nothing(self):
+        """Test whether readings without items do not touch the file"""
+
+        acks = []
+        conn = self.connector('items.json.gz', compression=COMPRESSION_NONE)
+
+        self.write(conn, [Checkpoint(acks.append, 1)])
+
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_path, 'items.json.gz')))
+        self.assertEqual(acks, [1])
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
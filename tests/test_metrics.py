@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+
+import unittest
+import urllib.request
+
+from kay.metrics import (Counter,
+                         Gauge,
+                         Histogram,
+                         MetricsServer,
+                         Registry,
+                         CONTENT_TYPE)
+
+
+class TestMetrics(unittest.TestCase):
+    """Tests of the exposition of the metrics"""
+
+    def test_counter(self):
+        """Test whether counters are exposed with their help and type"""
+
+        counter = Counter('kay_items_total', "Items processed")
+        counter.inc()
+        counter.inc(9)
+
+        self.assertEqual(counter.expose(), "# HELP kay_items_total Items processed\n"
+                                           "# TYPE kay_items_total counter\n"
+                                           "kay_items_total 10")
+
+    def test_gauge(self):
+        """Test whether gauges are exposed with their value or function"""
+
+        gauge = Gauge('kay_depth', "Depth")
+        gauge.set(2.5)
+        self.assertEqual(gauge.samples(), [('kay_depth', 2.5)])
+
+        gauge.set_function(lambda: 7)
+        self.assertEqual(gauge.samples(), [('kay_depth', 7)])
+
+        # Gauges whose function fails are left out
+        gauge.set_function(lambda: 1 / 0)
+        self.assertEqual(gauge.samples(), [])
+        self.assertEqual(gauge.expose(), "# HELP kay_depth Depth\n# TYPE kay_depth gauge")
+
+    def test_histogram(self):
+        """Test whether histograms are exposed with cumulative buckets"""
+
+        histogram = Histogram('kay_latency_seconds', "Latency", buckets=(0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.samples(), [
+            ('kay_latency_seconds_bucket{le="0.1"}', 2),
+            ('kay_latency_seconds_bucket{le="1"}', 3),
+            ('kay_latency_seconds_bucket{le="+Inf"}', 4),
+            ('kay_latency_seconds_sum', 3.65),
+            ('kay_latency_seconds_count', 4)
+        ])
+
+    def test_server(self):
+        """Test whether the metrics of the registry are served"""
+
+        registry = Registry()
+        registry.register(Counter('kay_items_total', "Items processed")).inc(3)
+        registry.register(Gauge('kay_depth', "Depth")).set(1)
+
+        server = MetricsServer(0, registry=registry)
+        server.start()
+        self.addCleanup(server.stop)
+
+        url = 'http://%s:%s/metrics' % server.httpd.server_address
+        with urllib.request.urlopen(url) as response:
+            self.assertEqual(response.headers['Content-Type'], CONTENT_TYPE)
+            body = response.read().decode('utf-8')
+
+        self.assertEqual(body, registry.expose())
+        self.assertIn("\nkay_items_total 3\n", body)
+        self.assertTrue(body.endswith("kay_depth 1\n"))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+
+import collections
+import os
+import shutil
+import tempfile
+import unittest
+
+from kay.profiler import (Profiler,
+                          STAGE_ES_REQUEST,
+                          STAGE_REDIS_FETCH,
+                          STAGE_REFRESH)
+
+
+class TestProfiler(unittest.TestCase):
+    """Profiler tests"""
+
+    def test_disabled(self):
+        """Test whether timings are dropped when the profiler is disabled"""
+
+        profiler = Profiler()
+        profiler.record(STAGE_REDIS_FETCH, 1)
+
+        self.assertEqual(profiler.timings, {})
+
+    def test_summary(self):
+        """Test whether the summary reports the throughput and the stages run"""
+
+        profiler = Profiler()
+        profiler.enable()
+
+        for ms in range(1, 101):
+            profiler.record(STAGE_ES_REQUEST, ms / 1000)
+        profiler.record(STAGE_REDIS_FETCH, 0.5)
+
+        profiler.start_time = 100
+        profiler.end_time = 110
+
+        stats = collections.Counter(read=1000, written=900, failed=100)
+        lines = profiler.summary(stats).splitlines()
+
+        self.assertEqual(lines[0], "Transfer finished in 10.00 seconds")
+        self.assertEqual(lines[1].split(), ['items', 'read', '1000', '(100.0', 'items/sec)'])
+        self.assertEqual(lines[2].split(), ['items', 'written', '900', '(90.0', 'items/sec)'])
+        self.assertEqual(lines[3].split(), ['items', 'skipped', '0', '(0.0', 'items/sec)'])
+
+        # Stages are listed in order, leaving out the ones not run
+        stages = [line.strip() for line in lines[6:-1]]
+        self.assertEqual(stages[0].split(), ['redis', 'fetch', '1', '0.50', '500.00', '500.00'])
+        self.assertEqual(stages[1].split(), ['es', 'request', '100', '5.05', '51.00', '99.00'])
+        self.assertEqual(len(stages), 2)
+        self.assertNotIn(STAGE_REFRESH, '\n'.join(lines))
+
+        self.assertTrue(lines[-1].startswith("  peak memory"))
+
+    def test_dump(self):
+        """Test whether the cProfile and tracemalloc dumps are written"""
+
+        tmp_path = tempfile.mkdtemp(prefix='kay_')
+        self.addCleanup(shutil.rmtree, tmp_path)
+        dump = os.path.join(tmp_path, 'transfer')
+
+        profiler = Profiler()
+        profiler.enable(dump=dump)
+        profiler.start()
+        sorted(str(n) for n in range(1000))
+        profiler.stop()
+
+        self.assertTrue(os.path.getsize(dump + '.prof') > 0)
+        with open(dump + '.mem') as fd:
+            self.assertTrue(fd.readline().startswith("Peak traced memory"))
+
+        self.assertIn("profile written to %s.prof" % dump, profiler.summary(collections.Counter()))
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
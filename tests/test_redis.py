@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import argparse
+import asyncio
+import os
+import pickle
+import threading
+import time
+import unittest
+import unittest.mock
+
+import fakeredis
+import redis
+
+import kay.backends.connectors.redis
+from kay.backends.connectors.redis import (RedisConnector,
+                                           parse_queue,
+                                           Q_CONSUMER)
+from kay.connector import (Checkpoint,
+                           Connector)
+
+Q_ITEMS = 'items'
+
+
+def read_item(uuid):
+    return {'uuid': uuid, 'updated_on': 1.0, 'data': {}}
+
+
+class FakeRedis(fakeredis.FakeStrictRedis):
+    """Fake client whose BLMOVE blocks like the real one does"""
+
+    def blmove(self, first_list, second_list, timeout, src='LEFT', dest='RIGHT'):
+        start = time.time()
+        while True:
+            item = self.lmove(first_list, second_list, src, dest)
+            if item or time.time() - start >= timeout:
+                return item
+            time.sleep(0.05)
+
+
+class RedisConnectorTestCase(unittest.TestCase):
+    """Base class of the tests reading from a fake Redis server"""
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.conn = fakeredis.FakeStrictRedis(server=self.server)
+
+        patcher = unittest.mock.patch('redis.StrictRedis.from_url',
+                                      side_effect=lambda url: FakeRedis(server=self.server))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connector(self, **kwargs):
+        kwargs.setdefault('wait_timeout', 0)
+
+        conn = RedisConnector('redis://localhost/8', queues=[(Q_ITEMS, 1)], **kwargs)
+        self.addCleanup(conn.close)
+
+        return conn
+
+    def push(self, uuids, queue=Q_ITEMS):
+        self.conn.rpush(queue, *[pickle.dumps(read_item(uuid)) for uuid in uuids])
+
+    def read(self, conn, loop=None):
+        """Read once with `conn`, returning the items and checkpoints read"""
+
+        async def read():
+            data_queue = asyncio.Queue()
+            await conn.read(data_queue)
+
+            read = []
+            while not data_queue.empty():
+                read.append(data_queue.get_nowait())
+
+            return read
+
+        loop = loop or asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(read())
+        finally:
+            loop.close()
+
+    def wait_for(self, condition, timeout=5):
+        start = time.time()
+        while not condition():
+            if time.time() - start > timeout:
+                self.fail("condition not met after %s seconds" % timeout)
+            time.sleep(0.05)
+
+
+class TestParseQueue(unittest.TestCase):
+    """parse_queue tests"""
+
+    def test_parse(self):
+        """Test whether queues are parsed with their weights"""
+
+        self.assertEqual(parse_queue('items'), ('items', 1))
+        self.assertEqual(parse_queue('items=3'), ('items', 3))
+        self.assertEqual(parse_queue('items:git=2'), ('items:git', 2))
+
+    def test_invalid_weight(self):
+        """Test whether an error is raised for invalid weights"""
+
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_queue('items=0')
+
+        with self.assertRaisesRegex(argparse.ArgumentTypeError, 'invalid weight high'):
+            parse_queue('items=high')
+
+
+class TestWeightedRoundRobin(unittest.TestCase):
+    """Tests of the order the queues are read"""
+
+    def next_queues(self, conn, n_queues, skip=None):
+        return [conn._RedisConnector__next_queue(skip or set()) for _ in range(n_queues)]
+
+    def test_weights(self):
+        """Test whether queues are chosen following their weights, smoothly"""
+
+        conn = RedisConnector('redis://localhost', queues=[('a', 3), ('b', 1)])
+
+        self.assertEqual(self.next_queues(conn, 8), ['a', 'a', 'b', 'a'] * 2)
+
+    def test_skip(self):
+        """Test whether skipped queues are not chosen"""
+
+        conn = RedisConnector('redis://localhost', queues=[('a', 3), ('b', 1), ('c', 1)])
+
+        queues = self.next_queues(conn, 10, skip={'a'})
+        self.assertEqual(queues.count('b'), 5)
+        self.assertEqual(queues.count('c'), 5)
+
+
+class TestReliableRead(RedisConnectorTestCase):
+    """Tests of the readings in reliable mode"""
+
+    def processing(self, consumer_id):
+        key = Q_ITEMS + ':processing:' + consumer_id
+        return [pickle.loads(item)['uuid'] for item in self.conn.lrange(key, 0, -1)]
+
+    def queue(self):
+        return [pickle.loads(item)['uuid'] for item in self.conn.lrange(Q_ITEMS, 0, -1)]
+
+    def test_ack(self):
+        """Test whether items are kept until their checkpoint is acknowledged"""
+
+        self.push(['a', 'b', 'c'])
+
+        conn = self.connector(reliable=True, consumer_id='test', chunk_size=2)
+        read = self.read(conn)
+
+        self.assertEqual([item for item in read if isinstance(item, dict)],
+                         [read_item('a'), read_item('b'), read_item('c')])
+        self.assertEqual(self.processing('test'), ['a', 'b', 'c'])
+
+        checkpoints = [item for item in read if isinstance(item, Checkpoint)]
+        self.assertEqual(len(checkpoints), 2)
+
+        checkpoints[0].ack()
+        self.assertEqual(self.processing('test'), ['c'])
+
+        checkpoints[1].ack()
+        self.assertEqual(self.processing('test'), [])
+        self.assertEqual(self.queue(), [])
+
+    def test_recover(self):
+        """Test whether the lists of this consumer and of failed ones are recovered"""
+
+        self.push(['a'])
+        self.push(['b'], Q_ITEMS + ':processing:test')
+        self.push(['c'], Q_ITEMS + ':processing:failed')
+        self.push(['d'], Q_ITEMS + ':processing:alive')
+        self.conn.set(Q_CONSUMER + 'alive', 1)
+
+        self.connector(reliable=True, consumer_id='test')
+
+        self.assertEqual(sorted(self.queue()), ['a', 'b', 'c'])
+        self.assertEqual(self.processing('alive'), ['d'])
+        self.assertTrue(self.conn.exists(Q_CONSUMER + 'test'))
+
+    def test_recover_periodically(self):
+        """Test whether the lists of consumers failed after the start are recovered"""
+
+        with unittest.mock.patch.object(kay.backends.connectors.redis,
+                                        'REDIS_HEARTBEAT_INTERVAL', 0.1):
+            conn = self.connector(reliable=True, consumer_id='test')
+
+            self.push(['a'], Q_ITEMS + ':processing:failed')
+            self.push(['b'], Q_ITEMS + ':processing:test')
+            self.wait_for(lambda: self.queue() == ['a'])
+
+        # The list of the consumer itself is never taken
+        self.assertEqual(self.processing('test'), ['b'])
+        conn.close()
+
+    def test_consumer_id(self):
+        """Test whether consumers of the same host get their own ids"""
+
+        conn = self.connector(reliable=True)
+        self.assertTrue(conn.consumer_id.endswith('-%s' % os.getpid()))
+
+        conn = self.connector(reliable=True, consumer_id='test', worker_id=2)
+        self.assertEqual(conn.consumer_id, 'test-2')
+
+
+class TestWaitItems(RedisConnectorTestCase):
+    """Tests of the blocking reads of empty queues"""
+
+    def test_wait(self):
+        """Test whether a reading waits for the items pushed to an empty queue"""
+
+        for reliable in [False, True]:
+            conn = self.connector(wait_timeout=5, reliable=reliable)
+            threading.Timer(0.3, self.push, args=(['a'],)).start()
+
+            read = self.read(conn)
+            self.assertEqual(read[0], read_item('a'))
+            self.assertEqual(read[-1], Connector.READ_DONE)
+
+    def test_timeout(self):
+        """Test whether a reading ends when the wait times out"""
+
+        conn = self.connector(wait_timeout=1)
+
+        start = time.time()
+        self.assertEqual(self.read(conn), [Connector.READ_DONE])
+        self.assertGreaterEqual(time.time() - start, 1)
+
+    def test_cancel(self):
+        """Test whether the item popped by a cancelled wait is pushed back"""
+
+        for reliable in [False, True]:
+            conn = self.connector(wait_timeout=3, reliable=reliable)
+
+            async def cancel():
+                task = asyncio.ensure_future(conn.read(asyncio.Queue()))
+                await asyncio.sleep(0.2)
+                task.cancel()
+                await asyncio.wait({task})
+
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(cancel())
+            loop.close()
+
+            # The blocked thread pops the item after the cancellation
+            self.push(['a'])
+            self.wait_for(lambda: self.conn.llen(Q_ITEMS) == 1)
+            self.assertEqual(pickle.loads(self.conn.lindex(Q_ITEMS, 0)), read_item('a'))
+            self.assertEqual(self.conn.llen(Q_ITEMS + ':processing:' + conn.consumer_id), 0)
+
+            self.conn.delete(Q_ITEMS)
+
+    def test_no_blocking_move(self):
+        """Test whether servers without BLMOVE are polled in reliable mode"""
+
+        conn = self.connector(wait_timeout=1, reliable=True)
+        conn.conn.blmove = unittest.mock.Mock(side_effect=redis.ResponseError("unknown command"))
+
+        self.assertEqual(self.read(conn), [Connector.READ_DONE])
+        self.assertFalse(conn.blocking_move)
+
+        self.push(['a'])
+        start = time.time()
+        conn.conn.lpop(Q_ITEMS)
+        threading.Timer(0.2, self.push, args=(['b'],)).start()
+
+        read = self.read(conn)
+        self.assertEqual(read[0], read_item('b'))
+        self.assertIsInstance(read[1], Checkpoint)
+        self.assertGreaterEqual(time.time() - start, 1)
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
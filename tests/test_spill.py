@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from kay.connector import Checkpoint
+from kay.spill import SpillQueue
+
+
+class TestSpillQueue(unittest.TestCase):
+    """SpillQueue tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='kay_')
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        shutil.rmtree(self.tmp_path)
+
+    def put(self, data_queue, items):
+        async def put():
+            for item in items:
+                await data_queue.put(item)
+
+        self.loop.run_until_complete(put())
+
+    def get(self, data_queue, n_items):
+        async def get():
+            items = []
+            for _ in range(n_items):
+                items.append(await data_queue.get())
+                data_queue.task_done()
+            return items
+
+        return self.loop.run_until_complete(get())
+
+    def segments(self, data_queue):
+        return sorted(os.listdir(data_queue.dir))
+
+    def test_memory(self):
+        """Test whether items fitting in memory are not spilled"""
+
+        data_queue = SpillQueue(10, self.tmp_path)
+        self.put(data_queue, [{'uuid': str(i)} for i in range(10)])
+
+        self.assertEqual(data_queue.qsize(), 10)
+        self.assertEqual(self.segments(data_queue), [])
+        self.assertEqual(self.get(data_queue, 10), [{'uuid': str(i)} for i in range(10)])
+
+        data_queue.close()
+
+    def test_replay(self):
+        """Test whether spilled items are read back in order across segments"""
+
+        data_queue = SpillQueue(5, self.tmp_path, segment_bytes=100)
+        items = [{'uuid': str(i), 'data': 'x' * 20} for i in range(50)]
+        self.put(data_queue, items)
+
+        self.assertEqual(data_queue.qsize(), 50)
+        self.assertGreater(len(self.segments(data_queue)), 1)
+
+        self.assertEqual(self.get(data_queue, 50), items)
+        self.assertTrue(data_queue.empty())
+
+        # Segments are deleted once consumed
+        self.assertEqual(self.segments(data_queue), [])
+
+        data_queue.close()
+
+    def test_spilled_order(self):
+        """Test whether new items wait for the spilled ones"""
+
+        data_queue = SpillQueue(2, self.tmp_path)
+        self.put(data_queue, [{'uuid': str(i)} for i in range(4)])
+
+        # Room in memory does not let new items overtake spilled ones
+        self.assertEqual(self.get(data_queue, 1), [{'uuid': '0'}])
+        self.put(data_queue, [{'uuid': '4'}])
+
+        items = self.get(data_queue, 4)
+        self.assertEqual([item['uuid'] for item in items], ['1', '2', '3', '4'])
+
+        data_queue.close()
+
+    def test_checkpoint(self):
+        """Test whether spilled checkpoints are the same objects"""
+
+        acks = []
+        checkpoint = Checkpoint(acks.append, 'items')
+
+        data_queue = SpillQueue(1, self.tmp_path)
+        self.put(data_queue, [{'uuid': '0'}, {'uuid': '1'}, checkpoint])
+
+        items = self.get(data_queue, 3)
+        self.assertIs(items[2], checkpoint)
+
+        items[2].ack()
+        self.assertEqual(acks, ['items'])
+
+        data_queue.close()
+
+    def test_close(self):
+        """Test whether the log is removed, even with items not consumed"""
+
+        data_queue = SpillQueue(1, self.tmp_path)
+        self.put(data_queue, [{'uuid': '0'}, {'uuid': '1'}])
+        data_queue.close()
+        self.assertFalse(os.path.exists(data_queue.dir))
+
+    def test_task_done(self):
+        """Test whether an error is raised when task_done is called too many times"""
+
+        data_queue = SpillQueue(1, self.tmp_path)
+
+        with self.assertRaises(ValueError):
+            data_queue.task_done()
+
+        data_queue.close()
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
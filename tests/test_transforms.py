@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+import argparse
+import asyncio
+import unittest
+import unittest.mock
+
+from kay.connector import Checkpoint
+from kay.transforms import (CategoryExclude,
+                            CategoryFilter,
+                            OriginFilter,
+                            Project,
+                            Prune,
+                            Truncate,
+                            TransformQueue,
+                            parse_transform)
+
+
+def read_item(uuid, category='commit', origin='https://github.com/chaoss/grimoirelab-perceval'):
+    return {
+        'uuid': uuid,
+        'origin': origin,
+        'category': category,
+        'backend_name': 'Git',
+        'data': {
+            'commit': uuid,
+            'message': 'Update README',
+            'files': [{'file': 'README.md', 'added': '10'}],
+            'Author': {'name': 'John Smith', 'email': 'jsmith@example.com'}
+        }
+    }
+
+
+class TestPrune(unittest.TestCase):
+    """Prune transform tests"""
+
+    def test_apply(self):
+        """Test whether the given fields are removed"""
+
+        prune = Prune('data.files,data.Author.email,data.missing.field')
+        items = prune.apply([read_item('a')])
+
+        self.assertEqual(len(items), 1)
+        self.assertNotIn('files', items[0]['data'])
+        self.assertEqual(items[0]['data']['Author'], {'name': 'John Smith'})
+        self.assertEqual(items[0]['data']['message'], 'Update README')
+
+    def test_no_fields(self):
+        """Test whether an error is raised when no fields are given"""
+
+        with self.assertRaises(ValueError):
+            Prune(',')
+
+
+class TestProject(unittest.TestCase):
+    """Project transform tests"""
+
+    def test_apply(self):
+        """Test whether only the given fields of data are kept"""
+
+        project = Project('data.commit,data.Author.name')
+        items = project.apply([read_item('a')])
+
+        self.assertEqual(items[0]['data'], {'commit': 'a', 'Author': {'name': 'John Smith'}})
+
+    def test_metadata(self):
+        """Test whether the metadata of the items is always kept"""
+
+        project = Project('data.commit')
+        item = project.apply([read_item('a')])[0]
+
+        self.assertEqual(item['uuid'], 'a')
+        self.assertEqual(item['origin'], 'https://github.com/chaoss/grimoirelab-perceval')
+        self.assertEqual(item['category'], 'commit')
+        self.assertEqual(item['backend_name'], 'Git')
+
+
+class TestTruncate(unittest.TestCase):
+    """Truncate transform tests"""
+
+    def test_apply(self):
+        """Test whether the long strings of data are cut"""
+
+        truncate = Truncate('10')
+        item = truncate.apply([read_item('a')])[0]
+
+        self.assertEqual(item['data']['message'], 'Update ...')
+        self.assertEqual(item['data']['files'][0]['file'], 'README.md')
+        self.assertEqual(item['data']['Author']['email'], 'jsmith@...')
+
+    def test_metadata(self):
+        """Test whether the metadata of the items is not cut"""
+
+        uuids = ['0fa16dc4edab9130a14914a8d797f634d13b4ff4',
+                 '0fa16dc4edab9130a14914a8d797f634d13b4ff5']
+
+        truncate = Truncate('10')
+        items = truncate.apply([read_item(uuid) for uuid in uuids])
+
+        self.assertEqual([item['uuid'] for item in items], uuids)
+        self.assertEqual(items[0]['origin'], 'https://github.com/chaoss/grimoirelab-perceval')
+
+    def test_invalid_length(self):
+        """Test whether an error is raised when the length is too short"""
+
+        with self.assertRaises(ValueError):
+            Truncate('3')
+
+
+class TestFilter(unittest.TestCase):
+    """Filter transforms tests"""
+
+    def test_category(self):
+        """Test whether only the items of the given categories are kept"""
+
+        items = [read_item('a', category='commit'),
+                 read_item('b', category='issue'),
+                 read_item('c', category='pull_request')]
+
+        items = CategoryFilter('commit,pull_*').apply(items)
+        self.assertEqual([item['uuid'] for item in items], ['a', 'c'])
+
+    def test_origin(self):
+        """Test whether only the items of the given origins are kept"""
+
+        items = [read_item('a', origin='https://github.com/chaoss/grimoirelab-perceval'),
+                 read_item('b', origin='https://gitlab.com/chaoss/kay'),
+                 read_item('c', origin=None)]
+
+        items = OriginFilter('https://github.com/chaoss/*').apply(items)
+        self.assertEqual([item['uuid'] for item in items], ['a'])
+
+    def test_exclude(self):
+        """Test whether the items of the given categories are dropped"""
+
+        items = [read_item('a', category='commit'),
+                 read_item('b', category='issue')]
+
+        items = CategoryExclude('issue').apply(items)
+        self.assertEqual([item['uuid'] for item in items], ['a'])
+
+    def test_no_patterns(self):
+        """Test whether an error is raised when no patterns are given"""
+
+        with self.assertRaises(ValueError):
+            CategoryFilter('')
+
+
+class TestParseTransform(unittest.TestCase):
+    """parse_transform tests"""
+
+    def test_parse(self):
+        """Test whether transforms are built from their name and argument"""
+
+        transform = parse_transform('truncate:1000')
+        self.assertIsInstance(transform, Truncate)
+        self.assertEqual(transform.max_length, 1000)
+
+        transform = parse_transform('exclude-category:issue,pull_request')
+        self.assertIsInstance(transform, CategoryExclude)
+        self.assertEqual(transform.patterns, ['issue', 'pull_request'])
+
+    def test_unknown(self):
+        """Test whether an error is raised for unknown transforms"""
+
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_transform('rename:data.commit')
+
+    def test_invalid_arg(self):
+        """Test whether an error is raised for invalid arguments"""
+
+        with self.assertRaisesRegex(argparse.ArgumentTypeError, 'invalid truncate transform'):
+            parse_transform('truncate:1')
+
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_transform('truncate:many')
+
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_transform('prune:')
+
+    def test_parser_message(self):
+        """Test whether argparse shows the error of the transform"""
+
+        parser = argparse.ArgumentParser()
+        parser.add_argument('--transform', type=parse_transform)
+
+        with unittest.mock.patch.object(parser, 'error', side_effect=SystemExit) as error:
+            with self.assertRaises(SystemExit):
+                parser.parse_args(['--transform', 'truncate:1'])
+
+        self.assertIn('max length must be greater than', error.call_args[0][0])
+
+
+class TestTransformQueue(unittest.TestCase):
+    """TransformQueue tests"""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_put(self):
+        """Test whether items are transformed in batches"""
+
+        async def put(transform_queue, items):
+            for item in items:
+                await transform_queue.put(item)
+
+        data_queue = asyncio.Queue()
+        transform_queue = TransformQueue(data_queue, [CategoryFilter('commit')], batch_size=2)
+
+        items = [read_item('a'), read_item('b', category='issue'), read_item('c')]
+        self.loop.run_until_complete(put(transform_queue, items))
+
+        # The last item waits for its batch to be full
+        self.assertEqual(data_queue.qsize(), 1)
+        self.assertEqual(data_queue.get_nowait()['uuid'], 'a')
+
+    def test_checkpoint(self):
+        """Test whether the batch is flushed before a checkpoint"""
+
+        async def put(transform_queue, items):
+            for item in items:
+                await transform_queue.put(item)
+
+        data_queue = asyncio.Queue()
+        transform_queue = TransformQueue(data_queue, [CategoryFilter('commit')])
+
+        checkpoint = Checkpoint(lambda: None)
+        items = [read_item('a'), read_item('b', category='issue'), checkpoint, read_item('c')]
+        self.loop.run_until_complete(put(transform_queue, items))
+
+        self.assertEqual(data_queue.get_nowait()['uuid'], 'a')
+        self.assertIs(data_queue.get_nowait(), checkpoint)
+        self.assertTrue(data_queue.empty())
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')
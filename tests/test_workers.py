@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015-2018 Bitergia
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, 51 Franklin Street, Fifth Floor, Boston, MA 02110-1335, USA.
+#
+# Authors:
+#     Valerio Cosentino <valcos@bitergia.com>
+#
+
+
+
+import os
+import shutil
+import signal
+import tempfile
+import unittest
+import unittest.mock
+
+import kay.workers
+from kay.errors import WorkerError
+from kay.workers import WorkerPool
+
+
+class CountBackend:
+    """Backend reading and writing `n_items` in each worker"""
+
+    def __init__(self, n_items, worker_id=None):
+        self.n_items = n_items
+        self.worker_id = worker_id
+        self.stats = {}
+
+    def transfer(self):
+        self.stats = {'read': self.n_items, 'written': self.n_items,
+                      'worker_%s' % self.worker_id: 1}
+
+
+class FlakyBackend(CountBackend):
+    """Backend failing the first transfer of each worker"""
+
+    def __init__(self, n_items, tmp_path, worker_id=None):
+        super().__init__(n_items, worker_id=worker_id)
+        self.marker = os.path.join(tmp_path, str(worker_id))
+
+    def transfer(self):
+        if not os.path.exists(self.marker):
+            open(self.marker, 'w').close()
+            raise RuntimeError("first transfer")
+
+        super().transfer()
+
+
+class BrokenBackend(CountBackend):
+    """Backend failing every transfer"""
+
+    def transfer(self):
+        raise RuntimeError("broken")
+
+
+class TestWorkerPool(unittest.TestCase):
+    """WorkerPool tests"""
+
+    def setUp(self):
+        self.tmp_path = tempfile.mkdtemp(prefix='kay_')
+        self.addCleanup(shutil.rmtree, self.tmp_path)
+
+        # The pool handles SIGTERM while it runs
+        self.addCleanup(signal.signal, signal.SIGTERM, signal.getsignal(signal.SIGTERM))
+
+        for name, value in [('RESTART_DELAY', 0.1), ('MAX_FAILURES', 2)]:
+            patcher = unittest.mock.patch.object(kay.workers, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_run(self):
+        """Test whether the stats of every worker are collected"""
+
+        pool = WorkerPool(CountBackend, {'n_items': 10}, 3)
+        pool.run()
+
+        stats = pool.total_stats
+        self.assertEqual(stats['read'], 30)
+        self.assertEqual(stats['written'], 30)
+        self.assertEqual([stats['worker_%s' % worker_id] for worker_id in range(3)], [1, 1, 1])
+
+    def test_restart(self):
+        """Test whether failed workers are restarted"""
+
+        pool = WorkerPool(FlakyBackend, {'n_items': 10, 'tmp_path': self.tmp_path}, 2)
+        pool.run()
+
+        self.assertEqual(pool.failures, {0: 1, 1: 1})
+        self.assertEqual(pool.total_stats['written'], 20)
+
+    def test_broken(self):
+        """Test whether the pool stops when a worker fails too many times in a row"""
+
+        pool = WorkerPool(BrokenBackend, {'n_items': 10}, 1)
+
+        with self.assertRaisesRegex(WorkerError, "worker 0 failed 3 times in a row"):
+            pool.run()
+
+        self.assertEqual(pool.workers, {})
+        self.assertEqual(pool.restarts, {})
+
+
+if __name__ == "__main__":
+    unittest.main(warnings='ignore')